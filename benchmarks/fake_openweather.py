@@ -0,0 +1,191 @@
+"""Local OpenWeather stand-in for load tests.
+
+    uv run python benchmarks/fake_openweather.py --port 9000 --latency-ms 80 --jitter-ms 40 --error-rate 0.01
+
+Serves /data/2.5/weather, /forecast and /group with realistic payloads, a
+configurable response delay and error rate, and counts every call at /stats.
+"""
+import argparse
+import asyncio
+import csv
+import random
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+CITY_LIST = Path(__file__).parent.parent / "mcp_server" / "data" / "cities.csv"
+CONDITIONS = [
+    (800, "Clear", "céu limpo", "01d"),
+    (801, "Clouds", "algumas nuvens", "02d"),
+    (803, "Clouds", "nublado", "04d"),
+    (500, "Rain", "chuva leve", "10d"),
+    (211, "Thunderstorm", "trovoada", "11d"),
+]
+
+
+def load_cities() -> dict[int, dict]:
+    with CITY_LIST.open(encoding="utf-8", newline="") as handle:
+        return {
+            int(row["id"]): {
+                "id": int(row["id"]),
+                "name": row["name"],
+                "country": row["country"],
+                "lat": float(row["lat"]),
+                "lon": float(row["lon"]),
+            }
+            for row in csv.DictReader(handle)
+        }
+
+
+class FakeOpenWeather:
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, seed: int):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.cities = load_cities()
+        self.calls = Counter()
+
+    def _city(self, params) -> dict | None:
+        if "id" in params:
+            return self.cities.get(int(params["id"]))
+        if "lat" in params and "lon" in params:
+            # Like OpenWeather: the nearest known city, at the requested coordinates
+            lat, lon = float(params["lat"]), float(params["lon"])
+            nearest = min(self.cities.values(), key=lambda city: (city["lat"] - lat) ** 2 + (city["lon"] - lon) ** 2)
+            return {**nearest, "lat": lat, "lon": lon}
+        name = params.get("q", "").split(",")[0].strip()
+        if not name or name.lower() == "atlantis":
+            return None
+        city_id = zlib.crc32(name.lower().encode()) % 9_000_000 + 1_000_000
+        return {"id": city_id, "name": name, "country": "XX", "lat": 0.0, "lon": 0.0}
+
+    def _weather(self, city: dict, dt: int) -> dict:
+        seed = zlib.crc32(f"{city['id']}:{dt // 3600}".encode())
+        temp = round(5 + seed % 250 / 10, 2)
+        condition_id, main, description, icon = CONDITIONS[seed % len(CONDITIONS)]
+        return {
+            "coord": {"lon": city["lon"], "lat": city["lat"]},
+            "weather": [{"id": condition_id, "main": main, "description": description, "icon": icon}],
+            "base": "stations",
+            "main": {
+                "temp": temp,
+                "feels_like": temp - 1,
+                "temp_min": temp - 2,
+                "temp_max": temp + 2,
+                "pressure": 1000 + seed % 30,
+                "humidity": 40 + seed % 55,
+            },
+            "visibility": 10000,
+            "wind": {"speed": seed % 90 / 10, "deg": seed % 360},
+            "clouds": {"all": seed % 100},
+            "dt": dt,
+            "sys": {"country": city["country"], "sunrise": dt - 21600, "sunset": dt + 21600},
+            "timezone": 0,
+            "id": city["id"],
+            "name": city["name"],
+            "cod": 200,
+        }
+
+    def _forecast_slot(self, city: dict, dt: int) -> dict:
+        current = self._weather(city, dt)
+        return {
+            "dt": dt,
+            "main": current["main"],
+            "weather": current["weather"],
+            "clouds": current["clouds"],
+            "wind": current["wind"],
+            "visibility": 10000,
+            "pop": (dt // 10800) % 10 / 10,
+            "sys": {"pod": "d"},
+            "dt_txt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(dt)),
+        }
+
+    async def _respond(self, request: Request, endpoint: str, build):
+        self.calls[endpoint] += 1
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        await asyncio.sleep(max(0.0, delay))
+        if self.random.random() < self.error_rate:
+            return JSONResponse({"cod": 500, "message": "fake upstream error"}, status_code=500)
+        return build(request.query_params)
+
+    async def weather(self, request: Request):
+        def build(params):
+            city = self._city(params)
+            if city is None:
+                return JSONResponse({"cod": "404", "message": "city not found"}, status_code=404)
+            return JSONResponse(self._weather(city, int(time.time())))
+        return await self._respond(request, "weather", build)
+
+    async def forecast(self, request: Request):
+        def build(params):
+            city = self._city(params)
+            if city is None:
+                return JSONResponse({"cod": "404", "message": "city not found"}, status_code=404)
+            start = int(time.time()) // 10800 * 10800 + 10800
+            return JSONResponse({
+                "cod": "200",
+                "message": 0,
+                "cnt": 40,
+                "list": [self._forecast_slot(city, start + slot * 10800) for slot in range(40)],
+                "city": {
+                    "id": city["id"],
+                    "name": city["name"],
+                    "coord": {"lat": city["lat"], "lon": city["lon"]},
+                    "country": city["country"],
+                    "population": 0,
+                    "timezone": 0,
+                    "sunrise": start - 21600,
+                    "sunset": start + 21600,
+                },
+            })
+        return await self._respond(request, "forecast", build)
+
+    async def group(self, request: Request):
+        def build(params):
+            now = int(time.time())
+            items = []
+            for city_id in params.get("id", "").split(","):
+                city = self.cities.get(int(city_id)) if city_id.isdigit() else None
+                if city is not None:
+                    item = self._weather(city, now)
+                    del item["cod"]
+                    items.append(item)
+            return JSONResponse({"cnt": len(items), "list": items})
+        return await self._respond(request, "group", build)
+
+    async def stats(self, request: Request):
+        return JSONResponse({"calls": dict(self.calls), "total": sum(self.calls.values())})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/data/2.5/weather", self.weather),
+            Route("/data/2.5/forecast", self.forecast),
+            Route("/data/2.5/group", self.group),
+            Route("/stats", self.stats),
+        ])
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Local OpenWeather stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    fake = FakeOpenWeather(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    uvicorn.run(fake.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
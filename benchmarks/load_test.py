@@ -0,0 +1,405 @@
+"""Load test the MCP server against the local OpenWeather stand-in.
+
+    uv run python benchmarks/load_test.py --transport http --sessions 16 --duration 20
+    uv run python benchmarks/load_test.py --transport stdio --sessions 4 --compare benchmarks/results/previous.json
+
+Starts benchmarks/fake_openweather.py and the server (one HTTP server shared
+by all sessions, or one stdio server per session, as the clients do), drives
+a mixed get_current_temperature / get_weather_forecast workload from N
+concurrent MCP sessions and writes a JSON report with throughput, latency
+percentiles, upstream calls per tool call, the server's peak RSS and, over
+HTTP, the server's CPU time per tool call.
+
+With --record the server also writes every upstream response to an archive;
+--replay serves a recorded archive instead, so two builds can be compared on
+exactly the same upstream responses and latencies, offline. Record with the
+same --cities and --forecast-mode, for long enough that every city is fetched;
+calls the archive cannot answer are counted as errors:
+
+    uv run python benchmarks/load_test.py --record benchmarks/results/run.archive --seed 1
+    uv run python benchmarks/load_test.py --replay benchmarks/results/run.archive --seed 1 --replay-speed 0
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import httpx
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+ROOT = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / "results"
+CITY_LIST = ROOT / "mcp_server" / "data" / "cities.csv"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port} after {timeout:.0f}s")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def server_peak_rss_mb() -> float | None:
+    """Highest VmHWM among our child processes running mcp_server (Linux only)."""
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+    peak_kb = 0
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            status = (entry / "status").read_text()
+            cmdline = (entry / "cmdline").read_bytes()
+        except OSError:
+            continue
+        fields = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+        if int(fields.get("PPid", "0")) != os.getpid() or b"mcp_server" not in cmdline:
+            continue
+        peak_kb = max(peak_kb, int(fields.get("VmHWM", "0 kB").split()[0]))
+    return round(peak_kb / 1024, 1) if peak_kb else None
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "p50": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99": round(percentile(ordered, 0.99) * 1000, 2),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "max": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+class Workload:
+    def __init__(self, cities: list[str], forecast_ratio: float, forecast_mode: str, seed: int):
+        self.cities = cities
+        self.forecast_ratio = forecast_ratio
+        self.forecast_mode = forecast_mode
+        self.random = random.Random(seed)
+
+    def next_call(self) -> tuple[str, dict]:
+        city = self.random.choice(self.cities)
+        if self.random.random() < self.forecast_ratio:
+            return "get_weather_forecast", {"city": city, "mode": self.forecast_mode}
+        return "get_current_temperature", {"city": city}
+
+
+def benchmark_cities(count: int) -> list[str]:
+    with CITY_LIST.open(encoding="utf-8", newline="") as handle:
+        return [row["name"] for row in csv.DictReader(handle)][:count]
+
+
+def failed_call(result) -> bool:
+    if result.isError:
+        return True
+    # Upstream errors come back as OpenWeather error bodies, e.g. {"cod": "404", ...}
+    data = json.loads(result.content[0].text) if result.content else {}
+    return "cod" in data and str(data["cod"]) != "200"
+
+
+@asynccontextmanager
+async def http_session(url: str):
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
+
+
+@asynccontextmanager
+async def stdio_session(env: dict):
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=["-m", "mcp_server", "--transport", "stdio"],
+        env=env,
+        cwd=str(ROOT),
+    )
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            yield session
+
+
+async def drive_session(open_session, workload: Workload, start: asyncio.Event, deadline: list[float], samples: list):
+    async with open_session() as session:
+        await start.wait()
+        while time.perf_counter() < deadline[0]:
+            tool, arguments = workload.next_call()
+            started = time.perf_counter()
+            try:
+                failed = failed_call(await session.call_tool(tool, arguments))
+            except Exception:
+                failed = True
+            samples.append((tool, time.perf_counter() - started, failed))
+        # Sample while the servers are still alive
+        samples.append(("__rss__", server_peak_rss_mb(), False))
+
+
+async def upstream_calls(client: httpx.AsyncClient) -> int:
+    return (await client.get("/stats")).json()["total"]
+
+
+async def server_metric(url: str, name: str) -> float | None:
+    """Sum of every sample of ``name`` on the server's /metrics page."""
+    async with httpx.AsyncClient() as client:
+        text = (await client.get(url)).text
+    total = None
+    for line in text.splitlines():
+        if line.startswith((name + " ", name + "{")):
+            total = (total or 0.0) + float(line.rsplit(" ", 1)[1])
+    return total
+
+
+async def run_load(args, fake_port: int, server_env: dict) -> dict:
+    cities = benchmark_cities(args.cities)
+    samples = []
+    start = asyncio.Event()
+    deadline = [0.0]
+
+    metrics_url = None
+    if args.transport == "http":
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "mcp_server", "--transport", "http",
+             "--host", "127.0.0.1", "--port", str(port), "--no-aliases"],
+            cwd=ROOT,
+            env=server_env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        wait_for_port(port)
+        url = f"http://127.0.0.1:{port}/mcp"
+        metrics_url = f"http://127.0.0.1:{port}/metrics"
+        open_session = lambda: http_session(url)  # noqa: E731
+    else:
+        server = None
+        open_session = lambda: stdio_session(server_env)  # noqa: E731
+
+    async def count_upstream(fake: httpx.AsyncClient) -> int | None:
+        if args.replay is None:
+            return await upstream_calls(fake)
+        # Replayed responses never reach the stand-in; only the HTTP server can tell
+        if metrics_url is None:
+            return None
+        return int(await server_metric(metrics_url, "openweather_upstream_responses_total") or 0)
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{fake_port}") as fake:
+            sessions = [
+                asyncio.create_task(drive_session(
+                    open_session,
+                    Workload(cities, args.forecast_ratio, args.forecast_mode, args.seed + index),
+                    start,
+                    deadline,
+                    samples,
+                ))
+                for index in range(args.sessions)
+            ]
+            # Give every session time to connect before the clock starts
+            await asyncio.sleep(args.connect_grace)
+            calls_before = await count_upstream(fake)
+            cpu_before = await server_metric(metrics_url, "process_cpu_seconds_total") if metrics_url else None
+            started = time.perf_counter()
+            deadline[0] = started + args.duration
+            start.set()
+            await asyncio.gather(*sessions)
+            elapsed = time.perf_counter() - started
+            calls_after = await count_upstream(fake)
+            cpu_after = await server_metric(metrics_url, "process_cpu_seconds_total") if metrics_url else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    rss = [value for tool, value, _ in samples if tool == "__rss__" and value is not None]
+    calls = [(tool, latency, failed) for tool, latency, failed in samples if tool != "__rss__"]
+    per_tool = {}
+    for tool in sorted({tool for tool, _, _ in calls}):
+        latencies = [latency for name, latency, _ in calls if name == tool]
+        per_tool[tool] = {"count": len(latencies), "latency_ms": latency_summary(latencies)}
+
+    upstream = calls_after - calls_before if calls_before is not None else None
+    # One shared server over HTTP; stdio spreads the work over one process per session
+    cpu_ms = None
+    if cpu_before is not None and cpu_after is not None and calls:
+        cpu_ms = round((cpu_after - cpu_before) * 1000 / len(calls), 3)
+    return {
+        "tool_calls": len(calls),
+        "errors": sum(1 for _, _, failed in calls if failed),
+        "duration_s": round(elapsed, 2),
+        "requests_per_sec": round(len(calls) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": latency_summary([latency for _, latency, _ in calls]),
+        "per_tool": per_tool,
+        "upstream_calls": upstream,
+        "upstream_calls_per_tool_call": round(upstream / len(calls), 3) if calls and upstream is not None else None,
+        "server_peak_rss_mb": max(rss) if rss else None,
+        "server_cpu_ms_per_call": cpu_ms,
+    }
+
+
+def compare(current: dict, previous: dict):
+    print(f"\nCompared with {previous.get('git_commit') or 'previous run'}:")
+    rows = [
+        ("requests/sec", ("requests_per_sec",)),
+        ("p50 ms", ("latency_ms", "p50")),
+        ("p95 ms", ("latency_ms", "p95")),
+        ("p99 ms", ("latency_ms", "p99")),
+        ("upstream/call", ("upstream_calls_per_tool_call",)),
+        ("peak RSS MB", ("server_peak_rss_mb",)),
+        ("CPU ms/call", ("server_cpu_ms_per_call",)),
+    ]
+    for label, path in rows:
+        before, after = previous["results"], current["results"]
+        for key in path:
+            before, after = before.get(key) if before else None, after.get(key) if after else None
+        if before is None or after is None:
+            continue
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"  {label:<14} {before:>10} -> {after:<10} ({change})")
+
+
+def print_results(report: dict):
+    results = report["results"]
+    config = report["config"]
+    print(f"{config['transport']} transport, {config['sessions']} sessions, {results['duration_s']}s")
+    print("=" * 60)
+    print(f"tool calls          {results['tool_calls']} ({results['errors']} errors)")
+    print(f"requests/sec        {results['requests_per_sec']}")
+    latency = results["latency_ms"]
+    print(f"latency ms          p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    for tool, stats in results["per_tool"].items():
+        tool_latency = stats["latency_ms"]
+        print(f"  {tool:<26} n={stats['count']:<6} p50 {tool_latency['p50']}  p99 {tool_latency['p99']}")
+    if results["upstream_calls"] is not None:
+        print(f"upstream calls      {results['upstream_calls']} ({results['upstream_calls_per_tool_call']} per tool call)")
+    print(f"server peak RSS     {results['server_peak_rss_mb']} MB")
+    if results.get("server_cpu_ms_per_call") is not None:
+        print(f"server CPU          {results['server_cpu_ms_per_call']} ms per tool call")
+
+
+def parse_args(argv: list[str] | None):
+    parser = argparse.ArgumentParser(description="Load test the OpenWeather MCP server")
+    parser.add_argument("--transport", choices=["http", "stdio"], default="http")
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent MCP client sessions")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds")
+    parser.add_argument("--connect-grace", type=float, default=3, help="Seconds allowed for sessions to connect")
+    parser.add_argument("--cities", type=int, default=40, help="Number of distinct cities in the workload")
+    parser.add_argument("--forecast-ratio", type=float, default=0.3)
+    parser.add_argument("--forecast-mode", choices=["raw", "compact", "daily"], default="raw")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=80, help="Fake upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=40, help="Fake upstream latency jitter")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake upstream error rate")
+    parser.add_argument("--record", type=Path, metavar="ARCHIVE",
+                        help="Record the server's upstream responses to an archive")
+    parser.add_argument("--replay", type=Path, metavar="ARCHIVE",
+                        help="Serve upstream responses from an archive instead of the stand-in")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="Replay pacing: 1 = recorded latencies, 10 = ten times faster, 0 = none")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the server (repeatable)")
+    parser.add_argument("--output", type=Path, help="JSON report path (default: benchmarks/results/<transport>-<time>.json)")
+    parser.add_argument("--compare", type=Path, help="Previous JSON report to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    fake_port = free_port()
+    fake = subprocess.Popen(
+        [sys.executable, str(Path(__file__).parent / "fake_openweather.py"),
+         "--port", str(fake_port),
+         "--latency-ms", str(args.latency_ms),
+         "--jitter-ms", str(args.jitter_ms),
+         "--error-rate", str(args.error_rate),
+         "--seed", str(args.seed)],
+        cwd=ROOT,
+    )
+    server_env = {
+        **os.environ,
+        "OPENWEATHER_URL": f"http://127.0.0.1:{fake_port}/data/2.5/",
+        "OPENWEATHER_KEY": "benchmark",
+        # The stand-in has no quota; measure the server, not the rate limiter
+        "OPENWEATHER_RATE_PER_MINUTE": "0",
+        "OPENWEATHER_RATE_PER_DAY": "0",
+    }
+    if args.record:
+        server_env.update(OPENWEATHER_PROVIDER="record", OPENWEATHER_ARCHIVE=str(args.record.resolve()))
+    if args.replay:
+        server_env.update(
+            OPENWEATHER_PROVIDER="replay",
+            OPENWEATHER_ARCHIVE=str(args.replay.resolve()),
+            OPENWEATHER_REPLAY_SPEED=str(args.replay_speed),
+            # A hedge would take the next recording of its key out of turn
+            OPENWEATHER_HEDGE_QUANTILE="0",
+        )
+    for item in args.server_env:
+        key, _, value = item.partition("=")
+        server_env[key] = value
+
+    try:
+        wait_for_port(fake_port)
+        results = asyncio.run(run_load(args, fake_port, server_env))
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "python": sys.version.split()[0],
+        "config": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items() if key not in ("output", "compare")
+        },
+        "results": results,
+    }
+    print_results(report)
+
+    output = args.output or RESULTS_DIR / f"{args.transport}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nReport written to {output}")
+
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,125 +1,100 @@
 import asyncio
+import sys
 from pathlib import Path
+
 import dotenv
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 from langchain_mcp_adapters.tools import load_mcp_tools
 from langgraph.prebuilt import create_react_agent
 from langchain_anthropic import ChatAnthropic
 
+# The shared helpers sit next to this script, whether it is run directly or imported as clients.weather_client_anthropic
+sys.path.append(str(Path(__file__).parent))
+from weather_client_sessions import (
+    AGENT_PROMPT, EXAMPLES, ToolMemo, ask, configure_tracing, memoize_tools, open_sessions, parse_args,
+    print_tool_stats, run_examples_concurrently
+)
+
 dotenv.load_dotenv()
 
-async def main():
-    server_script_path = str(Path(__file__).parent.parent / "mcp_server" / "weather_mcp_server_stdio.py")
-    
-    server_params = StdioServerParameters(
-        command="uv",
-        args=["run", "python", server_script_path],
-    )
-    
+DESCRIPTION = "LangChain Anthropic client for the OpenWeather MCP server"
+
+async def main(args):
     print("Starting LangChain client for OpenWeather MCP...")
     print("=" * 60)
-    
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            print("Connected to OpenWeather MCP server")
-            
-            tools = await load_mcp_tools(session)
-            print(f"Loaded {len(tools)} tools:")
-            for tool in tools:
-                print(f"  - {tool.name}: {tool.description}")
-            
-            llm = ChatAnthropic(model="claude-3-5-sonnet-20241022", temperature=0)
-            agent = create_react_agent(llm, tools)
-            
-            print("\nLangChain agent created successfully!")
-            print("Enter your weather questions (or 'exit' to quit):")
-            print("-" * 60)
-            
-            while True:
-                try:
-                    user_input = input("\nQuestion: ").strip()
-                    
-                    if user_input.lower() in ['sair', 'exit', 'quit']:
-                        print("Shutting down client...")
-                        break
-                    
-                    if not user_input:
-                        continue
-                    
-                    print("Processing...")
-                    
-                    response = await agent.ainvoke({
-                        "messages": [{"role": "user", "content": user_input}]
-                    })
-                    
-                    last_message = response["messages"][-1]
-                    print(f"\nResponse: {last_message.content}")
-                    
-                except KeyboardInterrupt:
-                    print("\nShutting down client...")
+
+    async with open_sessions(args.url) as sessions:
+        session = sessions[0]
+        print("Connected to OpenWeather MCP server")
+
+        # The whole interactive session is one conversation
+        memo = ToolMemo(args.memo_ttl)
+        tools = memoize_tools(await load_mcp_tools(session), memo)
+        print(f"Loaded {len(tools)} tools:")
+        for tool in tools:
+            print(f"  - {tool.name}: {tool.description}")
+
+        llm = ChatAnthropic(model="claude-3-5-sonnet-20241022", temperature=0)
+        agent = create_react_agent(llm, tools, prompt=AGENT_PROMPT)
+
+        print("\nLangChain agent created successfully!")
+        print("Enter your weather questions (or 'exit' to quit):")
+        print("-" * 60)
+
+        while True:
+            try:
+                user_input = input("\nQuestion: ").strip()
+
+                if user_input.lower() in ['sair', 'exit', 'quit']:
+                    print("Shutting down client...")
                     break
-                except Exception as e:
-                    print(f"\nError: {e}")
 
+                if not user_input:
+                    continue
+
+                print("Processing...")
+
+                response = await ask(agent, user_input)
+
+                last_message = response["messages"][-1]
+                print(f"\nResponse: {last_message.content}")
+
+            except KeyboardInterrupt:
+                print("\nShutting down client...")
+                break
+            except Exception as e:
+                print(f"\nError: {e}")
+
+        print_tool_stats(memo)
+
+
+def run_examples(args=None):
+    # Called without arguments by the clients_tests scripts
+    if args is None:
+        args = parse_args(DESCRIPTION, [])
 
-def run_examples():
-    
     async def run_example_queries():
-        server_script_path = str(Path(__file__).parent.parent / "mcp_server" / "weather_mcp_server_stdio.py")
-        
-        server_params = StdioServerParameters(
-            command="uv",
-            args=["run", "python", server_script_path],
-        )
-        
         print("Running examples with LangChain client...")
         print("=" * 60)
-        
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                tools = await load_mcp_tools(session)
-                
-                llm = ChatAnthropic(model="claude-3-5-sonnet-20241022", temperature=0)
-                agent = create_react_agent(llm, tools)
-                
-                examples = [
-                    "What is the current temperature in Prague?",
-                    "Give me the weather forecast for London in the coming days",
-                    "¿Cuál es la temperatura actual en Madrid?",
-                    "¿Cómo estará el clima en Barcelona mañana?",
-                    "Qual è la temperatura corrente a Roma?",
-                    "Che tempo farà a Milano nei prossimi giorni?",
-                    "Qual é a temperatura atual em São Paulo?",
-                    "Como estará o tempo no Rio de Janeiro amanhã?"
-                ]
-                
-                for i, question in enumerate(examples, 1):
-                    print(f"\nExample {i}: {question}")
-                    print("-" * 40)
-                    
-                    try:
-                        response = await agent.ainvoke({
-                            "messages": [{"role": "user", "content": question}]
-                        })
-                        
-                        last_message = response["messages"][-1]
-                        print(f"Response: {last_message.content}")
-                        
-                    except Exception as e:
-                        print(f"Error: {e}")
-                    
-                    print()
-    
+
+        async with open_sessions(args.url, args.sessions) as sessions:
+            llm = ChatAnthropic(model="claude-3-5-sonnet-20241022", temperature=0)
+            memo = ToolMemo(args.memo_ttl)
+            # One agent per pooled session; the examples are spread across them and share the memo
+            agents = [
+                create_react_agent(llm, memoize_tools(await load_mcp_tools(session), memo), prompt=AGENT_PROMPT)
+                for session in sessions
+            ]
+
+            await run_examples_concurrently(agents, EXAMPLES, args.concurrency, memo)
+
     asyncio.run(run_example_queries())
 
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1 and sys.argv[1] == "--examples":
-        run_examples()
+    configure_tracing("weather-client-anthropic")
+    args = parse_args(DESCRIPTION)
+
+    if args.examples:
+        run_examples(args)
     else:
-        asyncio.run(main())
\ No newline at end of file
+        asyncio.run(main(args))
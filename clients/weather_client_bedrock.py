@@ -2,17 +2,25 @@ import asyncio
 import os
 import sys
 from pathlib import Path
+
 import dotenv
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 from langchain_mcp_adapters.tools import load_mcp_tools
 from langgraph.prebuilt import create_react_agent
 from langchain_aws import ChatBedrock
 import boto3
 from botocore.exceptions import ClientError
 
+# The shared helpers sit next to this script, whether it is run directly or imported as clients.weather_client_bedrock
+sys.path.append(str(Path(__file__).parent))
+from weather_client_sessions import (
+    AGENT_PROMPT, EXAMPLES, SERVER_SCRIPT, ToolMemo, ask, configure_tracing, memoize_tools, open_sessions, parse_args,
+    print_tool_stats, run_examples_concurrently
+)
+
 dotenv.load_dotenv()
 
+DESCRIPTION = "LangChain Amazon Bedrock client for the OpenWeather MCP server"
+
 def validate_aws_credentials():
     try:
         region = os.getenv('AWS_DEFAULT_REGION') or os.getenv('AWS_REGION')
@@ -58,200 +66,151 @@ async def create_bedrock_llm():
         print(f"Error creating Bedrock LLM: {e}")
         raise
 
-async def main():
+async def main(args):
     if not validate_aws_credentials():
         print("\nAWS configuration validation failed. Please fix the issues above and try again.")
         sys.exit(1)
-    
-    server_script_path = str(Path(__file__).parent.parent / "mcp_server" / "weather_mcp_server_stdio.py")
-    
-    if not Path(server_script_path).exists():
-        print(f"Error: Weather MCP server script not found at {server_script_path}")
+
+    if args.url is None and not SERVER_SCRIPT.exists():
+        print(f"Error: Weather MCP server script not found at {SERVER_SCRIPT}")
         sys.exit(1)
-    
-    server_params = StdioServerParameters(
-        command="uv",
-        args=["run", "python", server_script_path],
-    )
-    
+
     print("Starting LangChain client with Amazon Bedrock for OpenWeather MCP...")
     print("=" * 60)
-    
+
     try:
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
+        async with open_sessions(args.url) as sessions:
+            session = sessions[0]
+            print("Connected to OpenWeather MCP server")
+
+            # The whole interactive session is one conversation
+            memo = ToolMemo(args.memo_ttl)
+            try:
+                tools = memoize_tools(await load_mcp_tools(session), memo)
+                print(f"Loaded {len(tools)} tools:")
+                for tool in tools:
+                    print(f"  - {tool.name}: {tool.description}")
+            except Exception as e:
+                print(f"Error loading MCP tools: {e}")
+                return
+
+            try:
+                llm = await create_bedrock_llm()
+                print("Bedrock LLM created successfully")
+            except Exception as e:
+                print(f"Failed to create Bedrock LLM: {e}")
+                return
+
+            try:
+                agent = create_react_agent(llm, tools, prompt=AGENT_PROMPT)
+                print("LangChain agent created successfully")
+            except Exception as e:
+                print(f"Error creating agent: {e}")
+                return
+
+            print("\nLangChain agent with Amazon Bedrock created successfully!")
+            print("Enter your weather questions (or 'exit' to quit):")
+            print("-" * 60)
+
+            while True:
                 try:
-                    await session.initialize()
-                    print("Connected to OpenWeather MCP server")
-                    
-                    try:
-                        tools = await load_mcp_tools(session)
-                        print(f"Loaded {len(tools)} tools:")
-                        for tool in tools:
-                            print(f"  - {tool.name}: {tool.description}")
-                    except Exception as e:
-                        print(f"Error loading MCP tools: {e}")
-                        return
-                    
-                    try:
-                        llm = await create_bedrock_llm()
-                        print("Bedrock LLM created successfully")
-                    except Exception as e:
-                        print(f"Failed to create Bedrock LLM: {e}")
-                        return
-                    
+                    user_input = input("\nQuestion: ").strip()
+
+                    if user_input.lower() in ['sair', 'exit', 'quit']:
+                        print("Shutting down client...")
+                        break
+
+                    if not user_input:
+                        continue
+
+                    print("Processing...")
+
                     try:
-                        agent = create_react_agent(llm, tools)
-                        print("LangChain agent created successfully")
+                        response = await ask(agent, user_input)
+
+                        last_message = response["messages"][-1]
+                        print(f"\nResponse: {last_message.content}")
                     except Exception as e:
-                        print(f"Error creating agent: {e}")
-                        return
-                    
-                    print("\nLangChain agent with Amazon Bedrock created successfully!")
-                    print("Enter your weather questions (or 'exit' to quit):")
-                    print("-" * 60)
-                    
-                    while True:
-                        try:
-                            user_input = input("\nQuestion: ").strip()
-                            
-                            if user_input.lower() in ['sair', 'exit', 'quit']:
-                                print("Shutting down client...")
-                                break
-                            
-                            if not user_input:
-                                continue
-                            
-                            print("Processing...")
-                            
-                            try:
-                                response = await agent.ainvoke({
-                                    "messages": [{"role": "user", "content": user_input}]
-                                })
-                                
-                                last_message = response["messages"][-1]
-                                print(f"\nResponse: {last_message.content}")
-                            except Exception as e:
-                                print(f"\nError processing query: {e}")
-                                print("Please try again with a different question.")
-                            
-                        except KeyboardInterrupt:
-                            print("\nShutting down client...")
-                            break
-                        except EOFError:
-                            print("\nShutting down client...")
-                            break
-                        except Exception as e:
-                            print(f"\nUnexpected error: {e}")
-                            
+                        print(f"\nError processing query: {e}")
+                        print("Please try again with a different question.")
+
+                except KeyboardInterrupt:
+                    print("\nShutting down client...")
+                    break
+                except EOFError:
+                    print("\nShutting down client...")
+                    break
                 except Exception as e:
-                    print(f"Error initializing MCP session: {e}")
-                    return
-                    
+                    print(f"\nUnexpected error: {e}")
+
+            print_tool_stats(memo)
+
     except Exception as e:
         print(f"Error connecting to MCP server: {e}")
         print("Please make sure:")
-        print("1. The weather_mcp_server_stdio.py script exists")
+        if args.url is None:
+            print("1. The weather_mcp_server_stdio.py script exists")
+        else:
+            print(f"1. The HTTP server is running at {args.url}")
         print("2. All required dependencies are installed")
         print("3. The OpenWeather API key is configured")
         return
 
 
-def run_examples():
-    
+def run_examples(args=None):
+    # Called without arguments by the clients_tests scripts
+    if args is None:
+        args = parse_args(DESCRIPTION, [])
+
     async def run_example_queries():
         if not validate_aws_credentials():
             print("\nAWS configuration validation failed. Please fix the issues above and try again.")
             return
-            
-        server_script_path = str(Path(__file__).parent.parent / "mcp_server" / "weather_mcp_server_stdio.py")
-        
-        if not Path(server_script_path).exists():
-            print(f"Error: Weather MCP server script not found at {server_script_path}")
+
+        if args.url is None and not SERVER_SCRIPT.exists():
+            print(f"Error: Weather MCP server script not found at {SERVER_SCRIPT}")
             return
-        
-        server_params = StdioServerParameters(
-            command="uv",
-            args=["run", "python", server_script_path],
-        )
-        
+
         print("Running examples with LangChain Bedrock client...")
         print("=" * 60)
-        
+
         try:
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    try:
-                        await session.initialize()
-                        print("Connected to OpenWeather MCP server")
-                        
-                        try:
-                            tools = await load_mcp_tools(session)
-                            print(f"Loaded {len(tools)} tools")
-                        except Exception as e:
-                            print(f"Error loading MCP tools: {e}")
-                            return
-                        
-                        try:
-                            llm = await create_bedrock_llm()
-                            print("Bedrock LLM created successfully")
-                        except Exception as e:
-                            print(f"Failed to create Bedrock LLM: {e}")
-                            return
-                            
-                        try:
-                            agent = create_react_agent(llm, tools)
-                            print("LangChain agent created successfully")
-                        except Exception as e:
-                            print(f"Error creating agent: {e}")
-                            return
-                        
-                        examples = [
-                            "What is the current temperature in Prague?",
-                            "Give me the weather forecast for London in the coming days",
-                            "¿Cuál es la temperatura actual en Madrid?",
-                            "¿Cómo estará el clima en Barcelona mañana?",
-                            "Qual è la temperatura corrente a Roma?",
-                            "Che tempo farà a Milano nei prossimi giorni?",
-                            "Qual é a temperatura atual em São Paulo?",
-                            "Como estará o tempo no Rio de Janeiro amanhã?"
-                        ]
-                        
-                        print(f"\nRunning {len(examples)} example queries...")
-                        print("-" * 60)
-                        
-                        for i, question in enumerate(examples, 1):
-                            print(f"\nExample {i}: {question}")
-                            print("-" * 40)
-                            
-                            try:
-                                response = await agent.ainvoke({
-                                    "messages": [{"role": "user", "content": question}]
-                                })
-                                
-                                last_message = response["messages"][-1]
-                                print(f"Response: {last_message.content}")
-                                
-                            except Exception as e:
-                                print(f"Error processing example {i}: {e}")
-                            
-                            print()
-                            
-                    except Exception as e:
-                        print(f"Error initializing MCP session: {e}")
-                        return
-                        
+            async with open_sessions(args.url, args.sessions) as sessions:
+                print(f"Connected to OpenWeather MCP server ({len(sessions)} sessions)")
+
+                try:
+                    llm = await create_bedrock_llm()
+                    print("Bedrock LLM created successfully")
+                except Exception as e:
+                    print(f"Failed to create Bedrock LLM: {e}")
+                    return
+
+                memo = ToolMemo(args.memo_ttl)
+                try:
+                    # One agent per pooled session; the examples are spread across them and share the memo
+                    agents = [
+                        create_react_agent(llm, memoize_tools(await load_mcp_tools(session), memo), prompt=AGENT_PROMPT)
+                        for session in sessions
+                    ]
+                    print("LangChain agents created successfully")
+                except Exception as e:
+                    print(f"Error creating agent: {e}")
+                    return
+
+                await run_examples_concurrently(agents, EXAMPLES, args.concurrency, memo)
+
         except Exception as e:
             print(f"Error connecting to MCP server: {e}")
             return
-    
+
     asyncio.run(run_example_queries())
 
 
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1 and sys.argv[1] == "--examples":
-        run_examples()
+    configure_tracing("weather-client-bedrock")
+    args = parse_args(DESCRIPTION)
+
+    if args.examples:
+        run_examples(args)
     else:
-        asyncio.run(main())
\ No newline at end of file
+        asyncio.run(main(args))
@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from mcp import ClientSession, StdioServerParameters, types
+from mcp.client.stdio import get_default_environment, stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+sys.path.append(str(Path(__file__).parent.parent))
+from mcp_server.weather_tracing import TRACEPARENT_KEY, configure as configure_tracing, span, start_span
+
+SERVER_SCRIPT = Path(__file__).parent.parent / "mcp_server" / "weather_mcp_server_stdio.py"
+
+EXAMPLES = [
+    "What is the current temperature in Prague?",
+    "Give me the weather forecast for London in the coming days",
+    "¿Cuál es la temperatura actual en Madrid?",
+    "¿Cómo estará el clima en Barcelona mañana?",
+    "Qual è la temperatura corrente a Roma?",
+    "Che tempo farà a Milano nei prossimi giorni?",
+    "Qual é a temperatura atual em São Paulo?",
+    "Como estará o tempo no Rio de Janeiro amanhã?"
+]
+
+# The tool node runs the calls of one model turn concurrently; this gets the model to batch them
+AGENT_PROMPT = (
+    "You answer weather questions with the available tools. When a question needs several "
+    "independent lookups, such as comparing cities, request all of them in the same turn "
+    "instead of one after another."
+)
+
+
+def parse_args(description: str, argv: list[str] | None = None) -> argparse.Namespace:
+    """Command-line options; ``argv`` defaults to sys.argv."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--examples", action="store_true", help="Run the example questions instead of prompting")
+    parser.add_argument(
+        "--url",
+        help="MCP endpoint of a running HTTP server, e.g. http://localhost:8000/mcp (default: spawn a stdio server)",
+    )
+    parser.add_argument("--sessions", type=int, default=4, help="MCP sessions pooled over HTTP (default: %(default)s)")
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Example questions answered at once (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--memo-ttl",
+        type=float,
+        default=60,
+        help="Seconds an identical tool call is answered from the client-side memo (0 disables; default: %(default)s)",
+    )
+    return parser.parse_args(argv)
+
+
+class TracedClientSession(ClientSession):
+    """A ClientSession that traces each tool call and passes the trace on in the request's _meta."""
+
+    async def call_tool(self, name, arguments=None, read_timeout_seconds=None, progress_callback=None):
+        with span(f"mcp.call_tool {name}", "client", **{"mcp.tool": name}) as call:
+            if call.traceparent is None:
+                return await super().call_tool(name, arguments, read_timeout_seconds, progress_callback)
+            meta = types.RequestParams.Meta(**{TRACEPARENT_KEY: call.traceparent})
+            result = await self.send_request(
+                types.ClientRequest(
+                    types.CallToolRequest(params=types.CallToolRequestParams(name=name, arguments=arguments, _meta=meta))
+                ),
+                types.CallToolResult,
+                request_read_timeout_seconds=read_timeout_seconds,
+                progress_callback=progress_callback,
+            )
+            call.set("mcp.is_error", result.isError)
+            if not result.isError:
+                await self._validate_tool_result(name, result)
+            return result
+
+
+class LlmSpans(AsyncCallbackHandler):
+    """Trace every model call of an agent turn as an llm span under the turn."""
+
+    def __init__(self, traceparent: str):
+        self.traceparent = traceparent
+        self._spans = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_id") or params.get("_type", "")
+        self._spans[run_id] = start_span("llm", "client", self.traceparent, **{"llm.model": model})
+
+    async def on_llm_end(self, response, *, run_id, **kwargs):
+        llm_span = self._spans.pop(run_id, None)
+        if llm_span is not None:
+            llm_span.finish()
+
+    async def on_llm_error(self, error, *, run_id, **kwargs):
+        llm_span = self._spans.pop(run_id, None)
+        if llm_span is not None:
+            llm_span.finish(error)
+
+
+def _reusable(output) -> bool:
+    """False for OpenWeather errors (429 quota, 503 circuit, 404 unknown city, ...) and stale fallbacks."""
+    # Tools loaded with load_mcp_tools return (content, artifact); content is one text or a list of them
+    content = output[0] if isinstance(output, tuple) else output
+    for text in [content] if isinstance(content, str) else content:
+        try:
+            body = json.loads(text)
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(body, dict):
+            continue
+        if str(body.get("cod", 200)) != "200" or body.get("stale") or body.get("errors"):
+            return False
+    return True
+
+
+class ToolMemo:
+    """Tool results of one conversation, keyed by tool name and arguments and reused for ``ttl`` seconds.
+
+    Identical calls made while the first is still running wait for its
+    result instead of sending their own. Counters record the calls answered
+    without MCP and the wall time that saved (the duration of the call that
+    produced the result), and how much tool time overlapped with other calls.
+    Error answers are only shared with the calls that waited for them, so a
+    later call retries instead of repeating a transient 429 or 503.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries = {}
+        self.calls = 0
+        self.saved_calls = 0
+        self.saved_seconds = 0.0
+        self.tool_seconds = 0.0
+        self.busy_seconds = 0.0
+        self._in_flight = 0
+        self._busy_since = 0.0
+
+    async def _run(self, call, args, kwargs):
+        started = time.perf_counter()
+        if self._in_flight == 0:
+            self._busy_since = started
+        self._in_flight += 1
+        try:
+            return await call(*args, **kwargs), time.perf_counter() - started
+        finally:
+            finished = time.perf_counter()
+            self.tool_seconds += finished - started
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self.busy_seconds += finished - self._busy_since
+
+    def wrap(self, name: str, call, arguments: set):
+        """Memoize ``call``, a tool coroutine; only the tool's own ``arguments`` make up the key."""
+
+        @functools.wraps(call)
+        async def memoized(*args, **kwargs):
+            self.calls += 1
+            if self.ttl <= 0:
+                return (await self._run(call, args, kwargs))[0]
+            key = (name, json.dumps({k: v for k, v in kwargs.items() if k in arguments}, sort_keys=True, default=str))
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                try:
+                    result, seconds = await asyncio.shield(entry[1])
+                except Exception:
+                    pass  # the shared call failed; make this one itself
+                else:
+                    self.saved_calls += 1
+                    self.saved_seconds += seconds
+                    return result
+            now = time.monotonic()
+            self._entries = {key: entry for key, entry in self._entries.items() if entry[0] > now}
+
+            async def produce():
+                result = await self._run(call, args, kwargs)
+                # Forgotten before the task completes, so no later call can pick it up
+                if not _reusable(result[0]):
+                    if self._entries.get(key, (None, None))[1] is task:
+                        del self._entries[key]
+                return result
+
+            task = asyncio.ensure_future(produce())
+            self._entries[key] = (now + self.ttl, task)
+            try:
+                return (await task)[0]
+            except Exception:
+                # Failures are not remembered
+                if self._entries.get(key, (None, None))[1] is task:
+                    del self._entries[key]
+                raise
+
+        return memoized
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "saved_calls": self.saved_calls,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "tool_seconds": round(self.tool_seconds, 3),
+            "overlap_seconds": round(max(0.0, self.tool_seconds - self.busy_seconds), 3),
+        }
+
+
+def memoize_tools(tools: list, memo: ToolMemo) -> list:
+    """Copies of the tools returned by ``load_mcp_tools`` whose calls go through ``memo``."""
+    return [
+        tool.model_copy(update={"coroutine": memo.wrap(tool.name, tool.coroutine, set(tool.args))})
+        for tool in tools
+    ]
+
+
+def print_tool_stats(memo: ToolMemo):
+    stats = memo.stats()
+    print(
+        f"Tool calls: {stats['calls']}, {stats['saved_calls']} answered from the memo "
+        f"({stats['saved_seconds']:.2f}s saved); {stats['tool_seconds']:.2f}s of tool time, "
+        f"{stats['overlap_seconds']:.2f}s of it run in parallel"
+    )
+
+
+async def ask(agent, question: str):
+    """One agent turn, traced as agent.turn with llm and mcp.call_tool spans under it."""
+    with span("agent.turn", question=question) as turn:
+        config = {"callbacks": [LlmSpans(turn.traceparent)]} if turn.traceparent else None
+        return await agent.ainvoke({
+            "messages": [{"role": "user", "content": question}]
+        }, config=config)
+
+
+def _server_env() -> dict | None:
+    # The spawned server gets a minimal environment; pass tracing on so both sides share the trace
+    tracing = {key: value for key, value in os.environ.items() if key.startswith("OPENWEATHER_TRACE_")}
+    return {**get_default_environment(), **tracing} if tracing else None
+
+
+@asynccontextmanager
+async def open_sessions(url: str | None, size: int = 1):
+    """Yield initialized MCP sessions: ``size`` to the HTTP server at ``url``, or one to a spawned stdio server.
+
+    Requests on one session are multiplexed, so a single stdio session can
+    still serve concurrent agent runs. Over HTTP, a pool spreads them across
+    sessions, each with its own per-client limits on the server, and no
+    server process is spawned.
+    """
+    async with AsyncExitStack() as stack:
+        if url is None:
+            server_params = StdioServerParameters(
+                command="uv", args=["run", "python", str(SERVER_SCRIPT)], env=_server_env()
+            )
+            transports = [await stack.enter_async_context(stdio_client(server_params))]
+        else:
+            # Opened one after another: each transport's task group must be closed by the task that opened it
+            transports = [await stack.enter_async_context(streamablehttp_client(url)) for _ in range(max(1, size))]
+
+        sessions = []
+        for read, write, *_ in transports:
+            session = await stack.enter_async_context(TracedClientSession(read, write))
+            await session.initialize()
+            sessions.append(session)
+        yield sessions
+
+
+async def run_examples_concurrently(agents: list, questions: list[str], concurrency: int, memo: ToolMemo | None = None):
+    """Ask every question with at most ``concurrency`` in flight, spread round-robin over ``agents``.
+
+    Answers are printed as they complete, each with its wall time, followed
+    by a summary comparing the total wall time with the sum of the queries,
+    and the counters of ``memo`` when the agents' tools go through one.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    timings = {}
+
+    async def run_one(index: int, question: str):
+        agent = agents[index % len(agents)]
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await ask(agent, question)
+                answer = f"Response: {response['messages'][-1].content}"
+            except Exception as e:
+                answer = f"Error: {e}"
+            timings[index] = time.perf_counter() - started
+        print(f"\nExample {index + 1} ({timings[index]:.2f}s): {question}")
+        print("-" * 40)
+        print(answer)
+
+    print(f"\nRunning {len(questions)} example queries, {max(1, concurrency)} at a time...")
+    print("-" * 60)
+    started = time.perf_counter()
+    await asyncio.gather(*(run_one(index, question) for index, question in enumerate(questions)))
+    total = time.perf_counter() - started
+
+    print("\n" + "=" * 60)
+    for index, question in enumerate(questions):
+        print(f"{timings[index]:8.2f}s  Example {index + 1}: {question}")
+    print("-" * 60)
+    print(f"{total:8.2f}s  total wall time")
+    print(f"{sum(timings.values()):8.2f}s  sum of query times (sequential estimate)")
+    if memo is not None:
+        print_tool_stats(memo)
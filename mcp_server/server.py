@@ -0,0 +1,484 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from urllib.parse import unquote
+
+import dotenv
+from fastmcp import FastMCP
+from fastmcp.tools.tool import ToolResult
+from mcp.types import TextContent
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .weather_codec import Payload, dumps_text
+from .weather_history import history_root_from_env
+from .weather_localization import CANONICAL_LANG, CANONICAL_UNITS, check_variant, localize_payload, upstream_lang
+from .weather_metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    WORKER_DUMP_SECONDS,
+    ToolMetricsMiddleware,
+    dump_periodically,
+    metrics_dump_from_env,
+    render_workers,
+)
+from .weather_shaping import check_forecast_shape, shape_forecast
+from .weather_spatial import check_coordinates, check_radius
+from .weather_subscriptions import get_hub
+from .weather_tracing import TracingMiddleware
+from .weather_warmer import warmer_from_env
+
+SERVICE_MODULE = f"{__package__}.weather_service"
+CURRENT_WEATHER_PREFIX = "weather://current/"
+# Tells multi-process HTTP workers whether to register the Portuguese aliases
+WORKER_ALIASES_ENV = "MCP_SERVER_WORKER_ALIASES"
+WORKER_METRICS_ENV = "MCP_SERVER_WORKER_METRICS"
+INPUT_SCHEMA_DIALECT = "http://json-schema.org/draft-07/schema#"
+
+# English tool name -> Portuguese alias served by the original HTTP server
+PORTUGUESE_ALIASES = {
+    "get_current_temperature": "buscar_temperatura_atual",
+    "get_weather_forecast": "buscar_previsao_tempo",
+    "get_current_temperature_many": "buscar_temperatura_atual_varias",
+    "get_weather_forecast_many": "buscar_previsao_tempo_varias",
+    "find_city": "buscar_cidade",
+    "get_current_weather_at": "buscar_tempo_coordenadas",
+    "get_weather_nearby": "buscar_tempo_proximo",
+    "get_temperature_history": "buscar_historico_temperatura",
+}
+
+
+def _service():
+    # Imported on first use: httpx, sqlite3 and the city index are not needed
+    # to answer initialize, and a spawned stdio server should get there fast
+    from . import weather_service
+    return weather_service
+
+
+_metrics_dumper: asyncio.Task | None = None
+# Event loop the process-wide work runs on; None while it is stopped
+_process_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _start_process_work():
+    """Start the metrics dumper and the cache warmer, once per event loop."""
+    global _metrics_dumper, _process_loop
+    loop = asyncio.get_running_loop()
+    if _process_loop is loop:
+        return
+    _process_loop = loop
+    interval, path = metrics_dump_from_env()
+    if interval > 0:
+        _metrics_dumper = asyncio.create_task(dump_periodically(interval, path))
+    warmer = warmer_from_env()
+    if warmer is not None:
+        _service().start_warmer(warmer, _params)
+
+
+async def _stop_process_work():
+    global _metrics_dumper, _process_loop
+    if _process_loop is None:
+        return
+    _process_loop = None
+    if _metrics_dumper is not None:
+        _metrics_dumper.cancel()
+        _metrics_dumper = None
+    get_hub().close()
+    if SERVICE_MODULE in sys.modules:
+        await _service().shutdown()
+
+
+@asynccontextmanager
+async def _process_scope():
+    # Held by whoever runs the server for as long as it serves; sessions come and go
+    # underneath without closing the HTTP client, provider, caches or history store
+    _start_process_work()
+    try:
+        yield
+    finally:
+        # Ctrl-C reaches here as a cancellation once uvicorn has drained; finish closing anyway
+        stopping = asyncio.ensure_future(_stop_process_work())
+        try:
+            await asyncio.shield(stopping)
+        except asyncio.CancelledError:
+            await stopping
+            raise
+
+
+@asynccontextmanager
+async def lifespan(server):
+    # Entered once per MCP session: per client connection over HTTP, per request when stateless.
+    # Yields the list a subscribing session adds itself to, so its pollers stop when it closes.
+    # Only starts the process-wide work (in-memory clients have no runner holding _process_scope).
+    _start_process_work()
+    subscribers = []
+    try:
+        yield subscribers
+    finally:
+        for session in subscribers:
+            get_hub().drop_session(session)
+
+
+mcp = FastMCP("OpenWeatherMCP", lifespan=lifespan)
+# Outermost, so a tool call's span covers the metrics, admission and the tool itself
+mcp.add_middleware(TracingMiddleware())
+mcp.add_middleware(ToolMetricsMiddleware())
+
+dotenv.load_dotenv()
+
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_KEY")
+
+
+def _params(lang: str = CANONICAL_LANG, **location) -> dict:
+    # One canonical upstream variant per location; units and translations are derived locally
+    return {
+        **location,
+        "appid": OPENWEATHER_API_KEY,
+        "units": CANONICAL_UNITS,
+        "lang": upstream_lang(lang)
+    }
+
+
+def _text_result(text: str) -> ToolResult:
+    # JSON text only: structuredContent would carry the same payload a second
+    # time, validated against the output schema and re-serialized on every call
+    return ToolResult(content=[TextContent(type="text", text=text)])
+
+
+def _batch_result(batch: dict, variant) -> ToolResult:
+    # Per-city payloads are spliced in as already encoded
+    results = ",".join(f"{dumps_text(city)}:{variant(payload).text}" for city, payload in batch["results"].items())
+    return _text_result(f'{{"results":{{{results}}},"errors":{dumps_text(batch["errors"])}}}')
+
+
+async def _current_weather(city: str, units: str, lang: str) -> Payload:
+    check_variant(units, lang)
+    payload = await _service().get_weather_data("weather", _params(lang, q=city))
+    return localize_payload(payload, units, lang)
+
+
+async def get_current_temperature(city: str, units: str = "metric", lang: str = "pt_br") -> ToolResult:
+    """Get current weather temperature and conditions for a specific city.
+
+    units: "metric" (°C, m/s; default), "imperial" (°F, mph) or "standard" (K, m/s).
+    lang: language of the condition descriptions, e.g. "pt_br" (default), "en", "es", "it".
+    """
+    return _text_result((await _current_weather(city, units, lang)).text)
+
+
+async def get_weather_forecast(
+    city: str,
+    mode: str = "raw",
+    fields: list[str] | None = None,
+    units: str = "metric",
+    lang: str = "pt_br",
+) -> ToolResult:
+    """Get 5-day weather forecast with 3-hour intervals for a specific city.
+
+    mode: "raw" (full OpenWeather payload, default), "compact" (columnar dt/temp/humidity/condition arrays)
+    or "daily" (per-day min/max/mean/precipitation). fields: dotted paths to keep from each 3-hour slot
+    in raw mode, e.g. ["dt_txt", "main.temp", "weather.0.description"]. units and lang as in
+    get_current_temperature.
+    """
+    # Rejected before the fetch, so a bad mode costs no quota or upstream call
+    check_forecast_shape(mode, fields)
+    check_variant(units, lang)
+    payload = await _service().get_weather_data("forecast", _params(lang, q=city))
+    return _text_result(shape_forecast(localize_payload(payload, units, lang), mode, fields).text)
+
+
+async def get_current_temperature_many(cities: list[str], units: str = "metric", lang: str = "pt_br") -> ToolResult:
+    """Get current weather for several cities in one call; returns per-city results and errors.
+
+    units and lang as in get_current_temperature.
+    """
+    check_variant(units, lang)
+    batch = await _service().get_weather_data_many("weather", cities, _params(lang))
+    return _batch_result(batch, lambda payload: localize_payload(payload, units, lang))
+
+
+async def get_weather_forecast_many(
+    cities: list[str],
+    mode: str = "raw",
+    fields: list[str] | None = None,
+    units: str = "metric",
+    lang: str = "pt_br",
+) -> ToolResult:
+    """Get 5-day weather forecasts for several cities in one call; returns per-city results and errors.
+
+    mode, fields, units and lang as in get_weather_forecast.
+    """
+    check_forecast_shape(mode, fields)
+    check_variant(units, lang)
+    batch = await _service().get_weather_data_many("forecast", cities, _params(lang))
+    return _batch_result(batch, lambda payload: shape_forecast(localize_payload(payload, units, lang), mode, fields))
+
+
+async def get_current_weather_at(lat: float, lon: float, units: str = "metric", lang: str = "pt_br") -> ToolResult:
+    """Get current weather at a coordinate (decimal degrees).
+
+    A fresh cached observation within a couple of km answers without an API call.
+    units and lang as in get_current_temperature.
+    """
+    check_variant(units, lang)
+    check_coordinates(lat, lon)
+    payload = await _service().get_weather_at(lat, lon, _params(lang))
+    return _text_result(localize_payload(payload, units, lang).text)
+
+
+async def get_weather_nearby(
+    lat: float,
+    lon: float,
+    radius_km: float = 25,
+    limit: int = 10,
+    units: str = "metric",
+    lang: str = "pt_br",
+) -> ToolResult:
+    """Get current weather of already known locations within radius_km (at most 200) of a coordinate, nearest first.
+
+    Answered from cached observations; only when none is in range is the weather at the point itself fetched.
+    Each result carries its distance_km. units and lang as in get_current_temperature.
+    """
+    check_variant(units, lang)
+    check_coordinates(lat, lon)
+    check_radius(radius_km)
+    nearby = await _service().get_weather_nearby(lat, lon, radius_km, max(1, limit), _params(lang))
+    if len(nearby) == 1 and not _service().is_success(nearby[0][1].data):
+        return _text_result(nearby[0][1].text)
+    results = ",".join(
+        f'{{"distance_km":{round(distance, 2)},"weather":{localize_payload(payload, units, lang).text}}}'
+        for distance, payload in nearby
+    )
+    return _text_result(f'{{"results":[{results}]}}')
+
+
+async def get_temperature_history(city: str, hours: float = 24, units: str = "metric") -> ToolResult:
+    """Get how a city's temperature developed over the last hours, from observations recorded by this server.
+
+    Returns hourly (or coarser, for long spans) buckets as columnar arrays: dt, temp_min/mean/max,
+    humidity_mean, observations and forecast_temp (what the latest forecast expected), plus
+    trend_per_hour. Buckets without observations are null. units as in get_current_temperature.
+    """
+    check_variant(units, CANONICAL_LANG)
+    payload = await _service().get_temperature_history(_params(q=city), hours, units)
+    return _text_result(payload.text)
+
+
+async def find_city(query: str, limit: int = 5) -> list[dict]:
+    """Find cities matching a (possibly partial or misspelled) name in the local city index; no API call is made"""
+    return _service().find_cities(query, limit)
+
+
+TOOLS = [
+    get_current_temperature,
+    get_weather_forecast,
+    get_current_temperature_many,
+    get_weather_forecast_many,
+    find_city,
+    get_current_weather_at,
+    get_weather_nearby,
+]
+# Only offered with a store to answer from; otherwise every call would fail
+if history_root_from_env() is not None:
+    TOOLS.append(get_temperature_history)
+
+
+def _add_tool(tool, name: str | None = None):
+    registered = mcp.tool(tool, name=name)
+    # The SDK validates every call's arguments with jsonschema, which first checks the
+    # schema itself against its metaschema; draft 7's is checked several times faster
+    # than the default 2020-12 one, and these schemas use nothing newer
+    registered.parameters = {"$schema": INPUT_SCHEMA_DIALECT, **registered.parameters}
+
+
+for tool in TOOLS:
+    _add_tool(tool)
+
+
+def register_aliases():
+    for tool in TOOLS:
+        _add_tool(tool, PORTUGUESE_ALIASES[tool.__name__])
+
+
+def register_admission():
+    """Bound concurrent tool calls per process and per client; HTTP only, where many clients share a server."""
+    # Imported here to keep the stdio startup path free of it
+    from .weather_admission import AdmissionMiddleware, admission_from_env
+
+    controller = admission_from_env()
+    if controller is not None:
+        mcp.add_middleware(AdmissionMiddleware(controller))
+
+
+@mcp.resource("weather://stats/cache", mime_type="application/json")
+async def get_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the memory and disk weather caches"""
+    return await _service().cache_stats()
+
+
+@mcp.resource("weather://stats/quota", mime_type="application/json")
+async def get_quota_stats() -> dict:
+    """Token-bucket and queue counters of the OpenWeather call scheduler"""
+    return _service().quota_stats()
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> Response:
+    """Prometheus text exposition, served next to the MCP endpoint in HTTP mode"""
+    directory = os.getenv(WORKER_METRICS_ENV)
+    text = render_workers(directory) if directory else REGISTRY.render()
+    return Response(text, media_type=CONTENT_TYPE)
+
+
+@mcp.resource(CURRENT_WEATHER_PREFIX + "{city}", mime_type="application/json")
+async def get_current_weather_resource(city: str) -> str:
+    """Current weather for a city; subscribe to be notified when it changes instead of polling"""
+    return (await _current_weather(unquote(city), CANONICAL_UNITS, CANONICAL_LANG)).text
+
+
+async def _fresh_current_weather(params: dict) -> bytes | None:
+    payload = await _service().get_fresh_weather_data("weather", params)
+    return payload.body if _service().is_success(payload.data) else None
+
+
+def _subscription_params(uri) -> dict:
+    uri = str(uri)
+    if not uri.startswith(CURRENT_WEATHER_PREFIX):
+        raise ValueError(f"Subscriptions are only supported for {CURRENT_WEATHER_PREFIX}{{city}}")
+    return _params(q=unquote(uri[len(CURRENT_WEATHER_PREFIX):]))
+
+
+def register_subscriptions():
+    """Serve resources/subscribe for weather://current/{city} through one shared poller per location."""
+    low_level = mcp._mcp_server
+
+    @low_level.subscribe_resource()
+    async def subscribe(uri):
+        params = _subscription_params(uri)
+        location = _service().resolved_key("weather", params)
+        context = low_level.request_context
+        if context.session not in context.lifespan_context:
+            context.lifespan_context.append(context.session)
+        get_hub().subscribe(
+            location,
+            context.session,
+            uri,
+            fetch=lambda: _fresh_current_weather(params),
+            expires_in=lambda: _service().expires_in(location),
+        )
+
+    @low_level.unsubscribe_resource()
+    async def unsubscribe(uri):
+        location = _service().resolved_key("weather", _subscription_params(uri))
+        get_hub().unsubscribe(location, low_level.request_context.session, uri)
+
+    # The low-level server always advertises subscribe=False
+    get_capabilities = low_level.get_capabilities
+
+    def get_capabilities_with_subscribe(notification_options, experimental_capabilities):
+        capabilities = get_capabilities(notification_options, experimental_capabilities)
+        if capabilities.resources is not None:
+            capabilities.resources.subscribe = True
+        return capabilities
+
+    low_level.get_capabilities = get_capabilities_with_subscribe
+
+
+
+def http_app():
+    """ASGI app for one worker of the multi-process HTTP mode (a uvicorn factory)."""
+    if os.getenv(WORKER_ALIASES_ENV) == "1":
+        register_aliases()
+    register_admission()
+    # Stateless: any worker can answer any request, so no session affinity is needed
+    app = mcp.http_app(stateless_http=True)
+    sessions_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def worker_lifespan(app):
+        # Any worker may answer /metrics, so each leaves its own metrics where the others can merge them
+        directory = os.environ[WORKER_METRICS_ENV]
+        os.makedirs(directory, exist_ok=True)
+        dump = os.path.join(directory, f"{os.getpid()}.prom")
+        dumper = asyncio.create_task(dump_periodically(WORKER_DUMP_SECONDS, dump))
+        try:
+            async with _process_scope(), sessions_lifespan(app):
+                yield
+        finally:
+            dumper.cancel()
+            try:
+                os.remove(dump)
+            except FileNotFoundError:
+                pass
+
+    app.router.lifespan_context = worker_lifespan
+    return app
+
+
+def run_workers(host: str, port: int, workers: int, aliases: bool, graceful_timeout: float):
+    import uvicorn
+
+    # Workers share the response cache, fetch leases and quota through one SQLite file
+    os.environ.setdefault("OPENWEATHER_DISK_CACHE", os.path.join(tempfile.gettempdir(), f"openweather-mcp-{port}.db"))
+    os.environ.setdefault("OPENWEATHER_QUOTA_DB", os.environ["OPENWEATHER_DISK_CACHE"])
+    os.environ[WORKER_ALIASES_ENV] = "1" if aliases else "0"
+    os.environ[WORKER_METRICS_ENV] = os.path.join(tempfile.gettempdir(), f"openweather-mcp-{port}-metrics")
+    # SIGHUP replaces workers one at a time; SIGTERM drains in-flight requests
+    uvicorn.run(
+        f"{__name__}:http_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=graceful_timeout,
+    )
+
+
+async def _serve(transport: str, **kwargs):
+    async with _process_scope():
+        await mcp.run_async(transport, **kwargs)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="mcp_server", description="OpenWeather MCP server")
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--host", default="0.0.0.0", help="HTTP bind address (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8000, help="HTTP port (default: %(default)s)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("OPENWEATHER_WORKERS", "1")),
+        help="HTTP worker processes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=float,
+        default=30,
+        help="Seconds a stopping HTTP worker waits for in-flight requests (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--aliases",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Also register the Portuguese tool names (default: on for http, off for stdio)",
+    )
+    args = parser.parse_args(argv)
+
+    aliases = args.aliases if args.aliases is not None else args.transport == "http"
+    if args.transport == "http" and args.workers > 1:
+        run_workers(args.host, args.port, args.workers, aliases, args.graceful_timeout)
+        return
+    if aliases:
+        register_aliases()
+    # Not for --workers: stateless sessions end with each request, so nobody would be notified
+    register_subscriptions()
+
+    if args.transport == "http":
+        register_admission()
+        asyncio.run(_serve("http", port=args.port, host=args.host))
+    else:
+        # The banner is rendered on every spawn and only delays the first response
+        asyncio.run(_serve("stdio", show_banner=False))
@@ -0,0 +1,182 @@
+"""Measure how long a freshly spawned stdio server takes before it can answer.
+
+    uv run python -m mcp_server.startup_report [--runs 5] [--top 15] [--json report.json]
+
+Reports the import-time breakdown of ``mcp_server.server`` (from ``python -X
+importtime``) and the wall time from spawning the stdio server until its
+``initialize`` and ``tools/list`` responses arrive, next to a bare
+interpreter start for reference.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+SERVER_COMMAND = [sys.executable, "-m", "mcp_server", "--transport", "stdio"]
+PROTOCOL_VERSION = "2025-06-18"
+
+
+def import_breakdown(top: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import mcp_server.server"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    children = []
+    server_imports = []
+    # -X importtime prints children before their parent, two spaces deeper
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        module = {
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        }
+        modules.append(module)
+        if depth == 1:
+            children.append(module)
+        elif depth == 0:
+            if module["module"] == "mcp_server.server":
+                server_imports = children
+            children = []
+
+    return {
+        "total_ms": round(sum(module["self_ms"] for module in modules), 1),
+        "server_imports": sorted(server_imports, key=lambda m: -m["cumulative_ms"])[:top],
+        "heaviest_self": sorted(modules, key=lambda m: -m["self_ms"])[:top],
+    }
+
+
+def _send(process: subprocess.Popen, message: dict):
+    process.stdin.write(json.dumps(message) + "\n")
+    process.stdin.flush()
+
+
+def _receive(process: subprocess.Popen, request_id: int) -> dict:
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError("server exited before answering")
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            return message
+
+
+def spawn_timings() -> dict:
+    env = {**os.environ, "OPENWEATHER_KEY": os.getenv("OPENWEATHER_KEY", "startup-report")}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        SERVER_COMMAND,
+        cwd=ROOT,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        _send(process, {
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "initialize",
+            "params": {
+                "protocolVersion": PROTOCOL_VERSION,
+                "capabilities": {},
+                "clientInfo": {"name": "startup-report", "version": "0"},
+            },
+        })
+        _receive(process, 1)
+        initialized = time.perf_counter()
+        _send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        _receive(process, 2)
+        listed = time.perf_counter()
+    finally:
+        process.stdin.close()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {
+        "initialize_ms": (initialized - started) * 1000,
+        "tools_list_ms": (listed - started) * 1000,
+    }
+
+
+def interpreter_baseline() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "min_ms": round(min(samples), 1),
+        "median_ms": round(statistics.median(samples), 1),
+        "max_ms": round(max(samples), 1),
+    }
+
+
+def build_report(runs: int, top: int) -> dict:
+    # One untimed spawn first so every measured run sees warm bytecode caches
+    spawn_timings()
+    timings = [spawn_timings() for _ in range(runs)]
+    return {
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "interpreter_ms": _summary([interpreter_baseline() for _ in range(runs)]),
+        "initialize_ms": _summary([timing["initialize_ms"] for timing in timings]),
+        "tools_list_ms": _summary([timing["tools_list_ms"] for timing in timings]),
+        "imports": import_breakdown(top),
+    }
+
+
+def print_report(report: dict):
+    print(f"Startup report ({report['runs']} runs, Python {report['python']})")
+    print("=" * 60)
+    for label, key in [
+        ("Bare interpreter", "interpreter_ms"),
+        ("Spawn -> initialize", "initialize_ms"),
+        ("Spawn -> tools/list", "tools_list_ms"),
+    ]:
+        timing = report[key]
+        print(f"{label:<22} median {timing['median_ms']:>7.1f} ms  "
+              f"(min {timing['min_ms']:.1f}, max {timing['max_ms']:.1f})")
+
+    imports = report["imports"]
+    print(f"\nImport time of mcp_server.server: {imports['total_ms']:.1f} ms")
+    print("-" * 60)
+    print(f"{'cumulative ms':>14}  imported by mcp_server.server")
+    for module in imports["server_imports"]:
+        print(f"{module['cumulative_ms']:>14.1f}  {module['module']}")
+    print(f"\n{'self ms':>14}  heaviest modules")
+    for module in imports["heaviest_self"]:
+        print(f"{module['self_ms']:>14.1f}  {module['module']}")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", type=Path, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    report = build_report(args.runs, args.top)
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
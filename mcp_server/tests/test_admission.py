@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from mcp_server.weather_admission import AdmissionController, Overloaded, admission_from_env
+
+
+def controller(max_in_flight: int = 1, max_queue: int = 2, max_wait: float = 1.0,
+               client_max_in_flight: int = 0) -> AdmissionController:
+    return AdmissionController(max_in_flight, max_queue, max_wait, client_max_in_flight, client_rate=0, client_burst=0)
+
+
+def test_released_slot_is_handed_to_the_next_waiter():
+    async def scenario():
+        admission = controller()
+        await admission.acquire("a")
+        first = asyncio.create_task(admission.acquire("b"))
+        second = asyncio.create_task(admission.acquire("c"))
+        await asyncio.sleep(0)
+        assert admission.stats()["waiting"] == 2
+
+        admission.release("a", 0.01)
+        await first
+        # Handed over, not freed: the slot never went back to the pool
+        assert admission.in_flight == 1
+        assert not second.done()
+
+        admission.release("b", 0.01)
+        await second
+        admission.release("c", 0.01)
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["in_flight"], stats["waiting"], stats["clients"]) == (0, 0, 0)
+    assert (stats["admitted"], stats["queued"]) == (3, 2)
+
+
+def test_abandoned_waiter_is_skipped():
+    async def scenario():
+        admission = controller()
+        await admission.acquire("a")
+        gone = asyncio.create_task(admission.acquire("b"))
+        waiting = asyncio.create_task(admission.acquire("c"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.sleep(0)
+        admission.release("a", 0.01)
+        await waiting
+        return admission.in_flight, gone.cancelled()
+
+    assert asyncio.run(scenario()) == (1, True)
+
+
+def test_full_queue_is_shed():
+    async def scenario():
+        admission = controller(max_queue=1)
+        await admission.acquire("a")
+        queued = asyncio.create_task(admission.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as raised:
+            await admission.acquire("c")
+        queued.cancel()
+        return raised.value
+
+    error = asyncio.run(scenario())
+    assert (error.cod, error.reason) == (503, "queue_full")
+    assert error.retry_after >= 1
+
+
+def test_waiter_times_out_without_leaking_the_slot():
+    async def scenario():
+        admission = controller(max_wait=0.01)
+        await admission.acquire("a")
+        with pytest.raises(Overloaded) as raised:
+            await admission.acquire("b")
+        admission.release("a", 0.01)
+        return raised.value.reason, admission.stats()
+
+    reason, stats = asyncio.run(scenario())
+    assert reason == "deadline"
+    assert (stats["in_flight"], stats["clients"]) == (0, 0)
+
+
+def test_client_over_its_concurrency_cap_is_rejected():
+    async def scenario():
+        admission = controller(max_in_flight=4, client_max_in_flight=1)
+        await admission.acquire("a")
+        with pytest.raises(Overloaded) as raised:
+            await admission.acquire("a")
+        await admission.acquire("b")
+        return raised.value
+
+    error = asyncio.run(scenario())
+    assert (error.cod, error.reason) == (429, "client_concurrency")
+
+
+def test_client_over_its_rate_is_rejected():
+    async def scenario():
+        admission = AdmissionController(4, 2, 1.0, 0, client_rate=1, client_burst=2)
+        for _ in range(2):
+            await admission.acquire("a")
+            admission.release("a", 0.01)
+        with pytest.raises(Overloaded) as raised:
+            await admission.acquire("a")
+        await admission.acquire("b")
+        return raised.value
+
+    error = asyncio.run(scenario())
+    assert (error.cod, error.reason) == (429, "client_rate")
+    assert error.retry_after > 0
+
+
+def test_rate_without_burst_is_rejected_at_startup(monkeypatch):
+    monkeypatch.setenv("OPENWEATHER_CLIENT_RATE_PER_SECOND", "5")
+    monkeypatch.setenv("OPENWEATHER_CLIENT_BURST", "0")
+    with pytest.raises(ValueError, match="OPENWEATHER_CLIENT_BURST"):
+        admission_from_env()
+    # Without a rate the burst is unused
+    monkeypatch.setenv("OPENWEATHER_CLIENT_RATE_PER_SECOND", "0")
+    assert admission_from_env().client_burst == 0
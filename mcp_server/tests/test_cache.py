@@ -0,0 +1,73 @@
+import pytest
+
+from mcp_server import weather_cache
+from mcp_server.weather_cache import TTLCache, cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(weather_cache.time, "monotonic", clock)
+    return clock
+
+
+def cache(maxsize: int = 8) -> TTLCache:
+    return TTLCache(maxsize, ttls={"weather": 60, "forecast": 600}, default_ttl=60, stale_ttl=30)
+
+
+def test_fresh_then_stale_then_gone(clock):
+    entries = cache()
+    key = ("weather", "london", "metric", "en")
+    entries.set(key, {"temp": 12})
+
+    clock.now += 59
+    assert entries.get(key) == ({"temp": 12}, True)
+    # Past the TTL but inside the stale window: served, marked for revalidation
+    clock.now += 2
+    assert entries.get(key) == ({"temp": 12}, False)
+    clock.now += 30
+    assert entries.get(key) is None
+    assert (entries.hits, entries.stale_hits, entries.misses) == (1, 1, 1)
+
+
+def test_ttl_is_per_endpoint(clock):
+    entries = cache()
+    entries.set(("weather", "london", "metric", "en"), 1)
+    entries.set(("forecast", "london", "metric", "en"), 2)
+    clock.now += 120
+    assert entries.get(("weather", "london", "metric", "en")) is None
+    assert entries.get(("forecast", "london", "metric", "en")) == (2, True)
+
+
+def test_refresh_restarts_the_ttl(clock):
+    entries = cache()
+    key = ("weather", "london", "metric", "en")
+    entries.set(key, 1)
+    clock.now += 70
+    entries.set(key, 2)
+    assert entries.get(key) == (2, True)
+
+
+def test_least_recently_used_is_evicted(clock):
+    entries = cache(maxsize=2)
+    entries.set(("weather", "a", "metric", "en"), 1)
+    entries.set(("weather", "b", "metric", "en"), 2)
+    entries.get(("weather", "a", "metric", "en"))
+    entries.set(("weather", "c", "metric", "en"), 3)
+    assert entries.get(("weather", "b", "metric", "en")) is None
+    assert entries.get(("weather", "a", "metric", "en")) == (1, True)
+    assert entries.evictions == 1
+
+
+def test_key_ignores_spelling_and_api_key():
+    first = cache_key("weather", {"q": "São  Paulo", "units": "metric", "appid": "one"})
+    second = cache_key("weather", {"q": "são paulo", "units": "metric", "appid": "two"})
+    assert first == second
@@ -0,0 +1,28 @@
+from mcp_server.weather_codec import Payload, dumps
+
+
+def test_payload_decodes_lazily_and_keeps_its_bytes():
+    body = dumps({"name": "São Paulo", "main": {"temp": 21.5}})
+    payload = Payload(body)
+    assert payload.body is body
+    assert payload.data == {"name": "São Paulo", "main": {"temp": 21.5}}
+    assert payload.text == body.decode()
+
+
+def test_payload_encodes_data_once():
+    payload = Payload.from_data({"conditions": {800: "clear sky"}})
+    assert payload.body is payload.body
+    assert payload.text == '{"conditions":{"800":"clear sky"}}'
+
+
+def test_derived_values_are_memoized():
+    calls = []
+
+    def temp(payload: Payload, scale: float) -> float:
+        calls.append(scale)
+        return payload.data["temp"] * scale
+
+    payload = Payload.from_data({"temp": 10})
+    assert payload.derived(temp, 2) == payload.derived(temp, 2) == 20
+    assert payload.derived(temp, 3) == 30
+    assert calls == [2, 3]
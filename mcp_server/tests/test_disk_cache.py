@@ -0,0 +1,120 @@
+import sqlite3
+
+import pytest
+
+from mcp_server import weather_disk_cache
+from mcp_server.weather_codec import dumps, loads
+from mcp_server.weather_disk_cache import DiskCache
+
+KEY = ("weather", "london", "metric", "en")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(weather_disk_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path) -> str:
+    return str(tmp_path / "cache.db")
+
+
+def disk_cache(path: str, max_bytes: int = 1 << 20) -> DiskCache:
+    return DiskCache(path, max_bytes, ttls={"weather": 60}, default_ttl=60, stale_ttl=30)
+
+
+def store(cache: DiskCache, key: tuple, value: dict):
+    cache.set(key, dumps(value))
+
+
+def lookup(cache: DiskCache, key: tuple):
+    """(value, is_fresh), or None."""
+    found = cache.get(key)
+    return None if found is None else (loads(found[0]), found[1])
+
+
+def test_fresh_then_stale_then_gone(clock, path):
+    cache = disk_cache(path)
+    store(cache, KEY, {"temp": 12})
+    clock.now += 59
+    assert lookup(cache, KEY) == ({"temp": 12}, True)
+    clock.now += 2
+    assert lookup(cache, KEY) == ({"temp": 12}, False)
+    clock.now += 30
+    assert lookup(cache, KEY) is None
+    assert (cache.hits, cache.stale_hits, cache.misses) == (1, 1, 1)
+
+
+def test_entries_are_shared_between_processes(clock, path):
+    store(disk_cache(path), KEY, {"temp": 12})
+    assert lookup(disk_cache(path), KEY) == ({"temp": 12}, True)
+
+
+def test_compact_drops_unservable_entries(clock, path):
+    cache = disk_cache(path)
+    store(cache, KEY, {"temp": 12})
+    clock.now += 100
+    assert cache.compact() == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_compact_returns_freed_pages_to_the_filesystem(clock, path):
+    cache = disk_cache(path)
+    for city in range(50):
+        store(cache, ("weather", str(city), "metric", "en"), {"padding": "x" * 4000})
+    clock.now += 100
+    cache.compact()
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+
+def test_compact_evicts_oldest_writes_over_the_size_limit(clock, path):
+    cache = disk_cache(path, max_bytes=70)
+    for city in ("a", "b", "c"):
+        clock.now += 1
+        store(cache, ("weather", city, "metric", "en"), {"name": city, "padding": "x" * 10})
+    assert cache.compact() == 1
+    assert lookup(cache, ("weather", "a", "metric", "en")) is None
+    assert lookup(cache, ("weather", "c", "metric", "en")) is not None
+
+
+def test_lease_keeps_other_fetchers_waiting(clock, path):
+    cache, other = disk_cache(path), disk_cache(path)
+    assert cache.claim(KEY, 10)
+    assert not other.claim(KEY, 10)
+    assert other.leased(KEY)
+    cache.release(KEY)
+    assert not other.leased(KEY)
+    assert other.claim(KEY, 10)
+
+
+def test_expired_lease_is_taken_over(clock, path, monkeypatch):
+    cache = disk_cache(path)
+    assert cache.claim(KEY, 10)
+    # The holder died mid-fetch; once its lease runs out another process takes over
+    monkeypatch.setattr(weather_disk_cache.os, "getpid", lambda: 1)
+    clock.now += 11
+    assert not cache.leased(KEY)
+    assert cache.claim(KEY, 10)
+    assert cache.leased(KEY)
+
+
+def test_release_only_drops_the_own_lease(clock, path, monkeypatch):
+    cache = disk_cache(path)
+    assert cache.claim(KEY, 10)
+    monkeypatch.setattr(weather_disk_cache.os, "getpid", lambda: 1)
+    cache.release(KEY)
+    assert cache.leased(KEY)
@@ -0,0 +1,51 @@
+from mcp_server.weather_geocoding import CityIndex, normalize_name, split_country
+
+
+def city(id: int, name: str, country: str, population: int = 0, alt_names=()) -> dict:
+    return {"id": id, "name": name, "country": country, "lat": 0.0, "lon": 0.0,
+            "population": population, "alt_names": list(alt_names)}
+
+
+INDEX = CityIndex([
+    city(1, "São Paulo", "BR", 12_000_000),
+    city(2, "London", "GB", 9_000_000, alt_names=["Londres"]),
+    city(3, "London", "CA", 400_000),
+    city(4, "Londrina", "BR", 500_000),
+    city(5, "Porto", "PT", 230_000),
+])
+
+
+def test_names_are_accent_and_case_folded():
+    assert normalize_name("  São  Paulo ") == "sao paulo"
+    assert split_country("London, ca") == ("London", "CA")
+    assert split_country("Washington, D.C.") == ("Washington, D.C.", None)
+
+
+def test_lookup_matches_folded_names_and_alternates():
+    assert INDEX.lookup("SAO PAULO")["id"] == 1
+    assert INDEX.lookup("Londres")["id"] == 2
+    assert INDEX.lookup("Atlantis") is None
+
+
+def test_most_populous_wins_unless_a_country_is_given():
+    assert INDEX.lookup("London")["id"] == 2
+    assert INDEX.lookup("London,CA")["id"] == 3
+
+
+def test_equally_ranked_duplicates_are_left_unresolved():
+    # OpenWeather's bulk list has no population, so nothing tells these apart
+    index = CityIndex([city(10, "Springfield", "US"), city(11, "Springfield", "US")])
+    assert index.lookup("Springfield") is None
+    assert index.lookup("Springfield,US") is None
+
+
+def test_search_tiers_exact_prefix_then_fuzzy():
+    assert [found["id"] for found in INDEX.search("Lond", limit=5)] == [2, 4, 3]
+    assert [found["id"] for found in INDEX.search("Londn")] == [2, 3, 4]
+    assert INDEX.search("") == []
+
+
+def test_fuzzy_search_keeps_to_the_first_letter():
+    # Only names sharing the first letter are scored, so big city lists stay fast
+    assert [found["id"] for found in INDEX.search("Sao Paolo")] == [1]
+    assert INDEX.search("Ondon") == []
@@ -0,0 +1,56 @@
+import pytest
+
+from mcp_server.weather_history import HistoryStore
+
+# Top of an hour, so the hourly buckets below line up with it
+NOW = 1_699_999_200.0
+HOUR = 3600
+
+
+def observation(dt: float, temp: float) -> dict:
+    return {"dt": dt, "main": {"temp": temp, "humidity": 50, "pressure": 1012}, "wind": {"speed": 3}}
+
+
+def snapshot(*slots: tuple[float, float]) -> dict:
+    return {"cod": "200", "list": [{"dt": dt, "main": {"temp": temp}, "pop": 0.1} for dt, temp in slots]}
+
+
+@pytest.fixture
+def store(tmp_path) -> HistoryStore:
+    return HistoryStore(str(tmp_path / "history"), retention_days=30)
+
+
+def test_observations_are_bucketed_with_the_latest_forecast(store):
+    store.record("weather", "london", observation(NOW - 2.5 * HOUR, 10), now=NOW - 2.5 * HOUR)
+    store.record("weather", "london", observation(NOW - 2.4 * HOUR, 12), now=NOW - 2.4 * HOUR)
+    store.record("weather", "london", observation(NOW - 0.5 * HOUR, 15), now=NOW - 0.5 * HOUR)
+    store.record("forecast", "london", snapshot((NOW - 1.5 * HOUR, 13)), now=NOW - 3 * HOUR)
+    # A newer snapshot supersedes the older one for the hours it covers
+    store.record("forecast", "london", snapshot((NOW - 1.5 * HOUR, 14)), now=NOW - 2 * HOUR)
+
+    history = store.temperature_history("london", hours=3, now=NOW)
+    assert history["dt"] == [NOW - 3 * HOUR, NOW - 2 * HOUR, NOW - HOUR]
+    assert history["temp_mean"] == [11, None, 15]
+    assert (history["temp_min"][0], history["temp_max"][0]) == (10, 12)
+    assert history["observations"] == [2, 0, 1]
+    assert history["forecast_temp"] == [None, 14, None]
+    assert history["trend_per_hour"] > 0
+
+
+def test_repeated_observations_are_stored_once(store):
+    for _ in range(3):
+        store.record("weather", "london", observation(NOW - HOUR, 10), now=NOW)
+    assert (store.stats()["rows"], store.stats()["duplicates"]) == (1, 2)
+    assert store.temperature_history("london", hours=2, now=NOW)["observed"] == 1
+
+
+def test_history_is_converted_to_the_requested_units(store):
+    store.record("weather", "london", observation(NOW - HOUR, 10), now=NOW)
+    assert store.temperature_history("london", hours=2, units="imperial", now=NOW)["temp_mean"] == [50.0]
+
+
+def test_partitions_past_retention_are_swept(store, tmp_path):
+    store.record("weather", "london", observation(NOW - 40 * 24 * HOUR, 10), now=NOW - 40 * 24 * HOUR)
+    store.record("weather", "paris", observation(NOW, 12), now=NOW)
+    assert store.temperature_history("london", hours=24 * 41, now=NOW)["observed"] == 0
+    assert sorted(path.name for path in (tmp_path / "history").iterdir()) == ["paris"]
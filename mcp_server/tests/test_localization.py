@@ -0,0 +1,50 @@
+import pytest
+
+from mcp_server.weather_localization import check_variant, localize, upstream_lang
+
+CURRENT = {
+    "cod": 200,
+    "name": "Lisboa",
+    "main": {"temp": 20, "feels_like": 19.5, "humidity": 60},
+    "wind": {"speed": 10, "deg": 90},
+    "weather": [{"id": 500, "main": "Rain", "description": "chuva leve"}],
+}
+
+
+def test_canonical_variant_is_returned_as_is():
+    assert localize(CURRENT, "metric", "pt_br") is CURRENT
+
+
+def test_imperial_converts_temperatures_and_wind():
+    converted = localize(CURRENT, "imperial", "pt_br")
+    assert converted["main"] == {"temp": 68.0, "feels_like": 67.1, "humidity": 60}
+    assert converted["wind"] == {"speed": 22.37, "deg": 90}
+    # The canonical response is left untouched
+    assert CURRENT["main"]["temp"] == 20
+
+
+def test_standard_is_kelvin_with_wind_unchanged():
+    converted = localize(CURRENT, "standard", "pt_br")
+    assert converted["main"]["temp"] == 293.15
+    assert converted["wind"] is CURRENT["wind"]
+
+
+def test_descriptions_are_translated_from_the_condition_code():
+    assert localize(CURRENT, "metric", "en")["weather"][0]["description"] == "light rain"
+    forecast = {"cod": "200", "list": [CURRENT, CURRENT]}
+    assert [item["weather"][0]["description"] for item in localize(forecast, "metric", "es")["list"]] == [
+        "lluvia ligera",
+        "lluvia ligera",
+    ]
+
+
+def test_languages_outside_the_table_are_requested_upstream():
+    assert upstream_lang("en") == "pt_br"
+    assert upstream_lang("de") == "de"
+    assert localize(CURRENT, "metric", "de") is CURRENT
+
+
+@pytest.mark.parametrize("units, lang", [("kelvin", "en"), ("metric", "EN"), ("metric", "en-us")])
+def test_invalid_variants_are_rejected(units, lang):
+    with pytest.raises(ValueError):
+        check_variant(units, lang)
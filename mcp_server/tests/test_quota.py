@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from mcp_server.weather_quota import (
+    BACKGROUND,
+    INTERACTIVE,
+    LocalQuota,
+    QuotaExceeded,
+    SharedQuota,
+    TokenBucket,
+    UpstreamScheduler,
+)
+
+
+def scheduler(capacity: float, per_seconds: float, max_queue: int = 10, max_wait: float = 2.0) -> UpstreamScheduler:
+    return UpstreamScheduler(LocalQuota([TokenBucket(capacity, per_seconds)]), max_queue, max_wait)
+
+
+def test_background_is_served_after_interactive():
+    async def scenario():
+        quota = scheduler(1, 0.05)
+        await quota.acquire()
+        order = []
+
+        async def call(name, priority):
+            await quota.acquire(priority)
+            order.append(name)
+
+        background = asyncio.create_task(call("background", BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call("interactive", INTERACTIVE))
+        await asyncio.gather(background, interactive)
+        return order, quota.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["interactive", "background"]
+    assert (stats["granted"], stats["queued"], stats["rejected"]) == (3, 2, 0)
+
+
+def test_fails_fast_when_the_wait_is_too_long():
+    async def scenario():
+        quota = scheduler(1, 60, max_wait=1)
+        await quota.acquire()
+        with pytest.raises(QuotaExceeded) as raised:
+            await quota.acquire()
+        return raised.value, quota.stats()
+
+    error, stats = asyncio.run(scenario())
+    assert error.retry_after > 1
+    assert (stats["granted"], stats["queued"], stats["rejected"]) == (1, 0, 1)
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        quota = scheduler(1, 0.5, max_queue=1)
+        await quota.acquire()
+        queued = asyncio.create_task(quota.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(QuotaExceeded):
+            await quota.acquire()
+        await queued
+        return quota.stats()
+
+    stats = asyncio.run(scenario())
+    assert (stats["granted"], stats["queued"], stats["rejected"]) == (2, 1, 1)
+
+
+def test_optional_calls_give_way_to_queued_ones():
+    async def scenario():
+        quota = scheduler(2, 2)
+        await quota.acquire()
+        await quota.acquire()
+        queued = asyncio.create_task(quota.acquire(BACKGROUND))
+        await asyncio.sleep(0)
+        optional = await quota.try_acquire()
+        await queued
+        # The queue is empty again, but the refilled token went to the queued call
+        return optional, await quota.try_acquire()
+
+    assert asyncio.run(scenario()) == (False, False)
+
+
+def test_throttle_empties_the_buckets():
+    async def scenario():
+        quota = scheduler(5, 60)
+        await quota.throttle()
+        return await quota.try_acquire()
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_shared_quota_is_taken_once_across_processes(tmp_path):
+    path = str(tmp_path / "quota.db")
+    first = SharedQuota(path, [TokenBucket(3, 3600)])
+    second = SharedQuota(path, [TokenBucket(3, 3600)])
+    granted = [quota.try_take() == 0 for quota in (first, second, first, second, first)]
+    assert granted == [True, True, True, False, False]
+    assert second.wait_time() > 0
@@ -0,0 +1,62 @@
+import asyncio
+
+from mcp_server.weather_replay import RecordingProvider, ReplayProvider, read_archive, request_key
+
+
+class StubProvider:
+    """Answers each request with its call number."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def fetch(self, endpoint: str, params: dict) -> tuple[int, bytes]:
+        self.calls += 1
+        return 200, b'{"cod":200,"call":%d}' % self.calls
+
+    async def close(self):
+        pass
+
+
+def test_key_ignores_the_api_key_and_parameter_order():
+    assert request_key("weather", {"q": "Lisbon", "units": "metric", "appid": "secret"}) == (
+        request_key("weather", {"units": "metric", "q": "Lisbon"})
+    )
+
+
+def test_recorded_responses_replay_in_order(tmp_path):
+    path = str(tmp_path / "upstream.owr")
+
+    async def record():
+        recorder = RecordingProvider(StubProvider(), path)
+        for city in ("Lisbon", "Lisbon", "Porto"):
+            await recorder.fetch("weather", {"q": city, "appid": "secret"})
+        await recorder.close()
+
+    async def replay():
+        replayer = ReplayProvider(path, speed=0)
+        answers = [await replayer.fetch("weather", {"q": city}) for city in ("Lisbon", "Lisbon", "Lisbon", "Porto")]
+        status, _ = await replayer.fetch("weather", {"q": "Faro"})
+        return answers, status, replayer.unmatched
+
+    asyncio.run(record())
+    assert all(b"secret" not in meta["key"].encode() + body for meta, body in read_archive(path))
+    answers, missing, unmatched = asyncio.run(replay())
+    # Repeated keys come back in recorded order, then start over
+    assert [body for _, body in answers] == [
+        b'{"cod":200,"call":1}', b'{"cod":200,"call":2}', b'{"cod":200,"call":1}', b'{"cod":200,"call":3}'
+    ]
+    assert (missing, unmatched) == (404, 1)
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    path = tmp_path / "upstream.owr"
+
+    async def record():
+        recorder = RecordingProvider(StubProvider(), str(path))
+        await recorder.fetch("weather", {"q": "Lisbon"})
+        await recorder.fetch("weather", {"q": "Porto"})
+        await recorder.close()
+
+    asyncio.run(record())
+    path.write_bytes(path.read_bytes()[:-3])
+    assert [meta["key"] for meta, _ in read_archive(str(path))] == ["weather?q=Lisbon"]
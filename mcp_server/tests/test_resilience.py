@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from mcp_server import weather_resilience
+from mcp_server.weather_codec import Payload
+from mcp_server.weather_quota import LocalQuota, QuotaExceeded, TokenBucket, UpstreamScheduler
+from mcp_server.weather_resilience import CircuitBreaker, ResilientFetcher, UpstreamUnavailable
+
+
+def open_breaker(cooldown: float) -> CircuitBreaker:
+    breaker = CircuitBreaker(failures=1, cooldown=cooldown)
+    breaker.failure()
+    return breaker
+
+
+def test_open_breaker_fails_fast():
+    breaker = open_breaker(60)
+    assert breaker.state() == "open"
+    with pytest.raises(UpstreamUnavailable):
+        breaker.check()
+
+
+def test_half_open_lets_exactly_one_probe_through():
+    breaker = open_breaker(0.01)
+    time.sleep(0.02)
+    assert breaker.state() == "half_open"
+    breaker.check()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.check()
+    breaker.success()
+    assert breaker.state() == "closed"
+    breaker.check()
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = open_breaker(0.01)
+    time.sleep(0.02)
+    breaker.check()
+    breaker.failure()
+    assert breaker.state() == "open"
+    assert breaker.opened == 2
+
+
+def test_abandoned_probe_frees_the_slot():
+    breaker = open_breaker(0.01)
+    time.sleep(0.02)
+    breaker.check()
+    breaker.abandon()
+    breaker.check()
+
+
+class StubUpstream:
+    """Stands in for fetch_response: fails with a connection error ``failures`` times, then answers 200."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = 0
+
+    async def __call__(self, endpoint: str, params: dict):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise httpx.ConnectError("connection refused")
+        return 200, Payload.from_data({"cod": 200, "name": params["q"]})
+
+
+def fetcher(breaker: CircuitBreaker, retries: int = 5) -> ResilientFetcher:
+    # No hedging, and a deadline far beyond the backoff of five retries
+    return ResilientFetcher(attempt_timeout=1, deadline=30, retries=retries, hedge_quantile=1.0, breaker=breaker)
+
+
+def scheduler(tokens: int) -> UpstreamScheduler:
+    return UpstreamScheduler(LocalQuota([TokenBucket(tokens, 3600)]), max_queue=10, max_wait=0.1)
+
+
+def test_transport_errors_are_retried(monkeypatch):
+    upstream = StubUpstream(failures=2)
+    monkeypatch.setattr(weather_resilience, "fetch_response", upstream)
+    monkeypatch.setattr(weather_resilience, "BACKOFF_BASE", 0.001)
+
+    payload = asyncio.run(fetcher(CircuitBreaker(100, 60)).fetch("weather", {"q": "London"}))
+    assert payload.data == {"cod": 200, "name": "London"}
+    assert upstream.calls == 3
+
+
+def test_exhausted_retries_count_one_breaker_failure(monkeypatch):
+    monkeypatch.setattr(weather_resilience, "fetch_response", StubUpstream(failures=10))
+    monkeypatch.setattr(weather_resilience, "BACKOFF_BASE", 0.001)
+    breaker = CircuitBreaker(2, 60)
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(fetcher(breaker, retries=2).fetch("weather", {"q": "London"}))
+    assert (breaker.state(), breaker.consecutive_failures) == ("closed", 1)
+
+
+def test_retries_take_quota(monkeypatch):
+    upstream = StubUpstream(failures=10)
+    monkeypatch.setattr(weather_resilience, "fetch_response", upstream)
+    monkeypatch.setattr(weather_resilience, "BACKOFF_BASE", 0.001)
+
+    async def scenario():
+        quota = scheduler(3)
+        with pytest.raises(UpstreamUnavailable):
+            await fetcher(CircuitBreaker(100, 60)).fetch(
+                "weather", {"q": "London"}, acquire=quota.acquire, permit=quota.try_acquire
+            )
+        return quota.stats()["granted"]
+
+    # The first request and two retries, not the five retries allowed
+    assert asyncio.run(scenario()) == 3
+    assert upstream.calls == 3
+
+
+def test_retry_succeeds_within_quota(monkeypatch):
+    upstream = StubUpstream(failures=1)
+    monkeypatch.setattr(weather_resilience, "fetch_response", upstream)
+    monkeypatch.setattr(weather_resilience, "BACKOFF_BASE", 0.001)
+
+    async def scenario():
+        quota = scheduler(3)
+        payload = await fetcher(CircuitBreaker(100, 60)).fetch(
+            "weather", {"q": "London"}, acquire=quota.acquire, permit=quota.try_acquire
+        )
+        return payload.data, quota.stats()["granted"]
+
+    assert asyncio.run(scenario()) == ({"cod": 200, "name": "London"}, 2)
+
+
+def test_open_breaker_takes_no_quota(monkeypatch):
+    upstream = StubUpstream(failures=0)
+    monkeypatch.setattr(weather_resilience, "fetch_response", upstream)
+
+    async def scenario():
+        quota = scheduler(3)
+        with pytest.raises(UpstreamUnavailable):
+            await fetcher(open_breaker(60)).fetch("weather", {"q": "London"}, acquire=quota.acquire)
+        return quota.stats()["granted"]
+
+    assert asyncio.run(scenario()) == 0
+    assert upstream.calls == 0
+
+
+def test_probe_denied_quota_frees_the_probe(monkeypatch):
+    monkeypatch.setattr(weather_resilience, "fetch_response", StubUpstream(failures=0))
+
+    async def scenario():
+        breaker = open_breaker(0.01)
+        await asyncio.sleep(0.02)
+        quota = scheduler(1)
+        await quota.acquire()
+        with pytest.raises(QuotaExceeded):
+            await fetcher(breaker).fetch("weather", {"q": "London"}, acquire=quota.acquire)
+        return breaker
+
+    breaker = asyncio.run(scenario())
+    # Still half open, with the probe slot free for the next call
+    assert breaker.state() == "half_open"
+    breaker.check()
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+from fastmcp import Client
+from fastmcp.exceptions import ToolError
+
+from mcp_server import server
+
+
+def test_input_schemas_declare_draft_7():
+    async def scenario():
+        async with Client(server.mcp) as client:
+            return await client.list_tools()
+
+    for tool in asyncio.run(scenario()):
+        assert tool.inputSchema["$schema"] == server.INPUT_SCHEMA_DIALECT
+
+
+def test_arguments_are_validated_before_the_tool_runs():
+    async def scenario():
+        async with Client(server.mcp) as client:
+            await client.call_tool("get_current_temperature", {"city": 42})
+
+    with pytest.raises(ToolError, match="Input validation error"):
+        asyncio.run(scenario())
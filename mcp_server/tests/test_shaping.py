@@ -0,0 +1,84 @@
+import pytest
+
+from mcp_server.weather_codec import Payload
+from mcp_server.weather_shaping import check_forecast_shape, shape_forecast
+
+DAY = 86400
+
+
+def slot(dt: int, temp: float, condition: int = 800, description: str = "clear sky", **extra) -> dict:
+    return {
+        "dt": dt,
+        "main": {"temp": temp, "temp_min": temp - 1, "temp_max": temp + 1, "humidity": 50},
+        "weather": [{"id": condition, "description": description}],
+        "pop": 0.0,
+        **extra,
+    }
+
+
+def forecast(*slots, timezone: int = 0) -> dict:
+    return {"cod": "200", "city": {"id": 1, "name": "Lisbon", "timezone": timezone}, "list": list(slots)}
+
+
+def shape(data: dict, mode: str = "raw", fields: list[str] | None = None) -> dict:
+    return shape_forecast(Payload.from_data(data), mode, fields).data
+
+
+def test_compact_pivots_slots_into_columns():
+    shaped = shape(forecast(slot(0, 10), slot(10800, 12, 500, "light rain")), "compact")
+    assert shaped["dt"] == [0, 10800]
+    assert shaped["temp"] == [10, 12]
+    assert shaped["condition"] == [800, 500]
+    assert shaped["conditions"] == {800: "clear sky", 500: "light rain"}
+    assert shaped["city"]["name"] == "Lisbon"
+
+
+def test_daily_aggregates_per_local_day():
+    data = forecast(
+        slot(0, 10),
+        slot(10800, 14, 500, "light rain", rain={"3h": 1.5}, pop=0.6),
+        slot(DAY, 20),
+    )
+    days = shape(data, "daily")["days"]
+    assert [day["date"] for day in days] == ["1970-01-01", "1970-01-02"]
+    first = days[0]
+    assert (first["temp_min"], first["temp_max"], first["temp_mean"]) == (9, 15, 12)
+    assert (first["precip_mm"], first["pop_max"], first["slots"]) == (1.5, 0.6, 2)
+
+
+def test_daily_skips_missing_temperatures():
+    sparse = {"dt": 10800, "main": {"temp": None, "temp_min": None, "humidity": 40}, "weather": [], "pop": None}
+    no_main = {"dt": DAY, "weather": [{"id": 800, "description": "clear sky"}]}
+    days = shape(forecast(slot(0, 10), sparse, no_main), "daily")["days"]
+    first = days[0]
+    assert (first["temp_min"], first["temp_max"], first["temp_mean"]) == (9, 11, 10)
+    assert (first["pop_max"], first["slots"]) == (0.0, 2)
+    assert (days[1]["temp_min"], days[1]["temp_max"], days[1]["temp_mean"]) == (None, None, None)
+
+
+def test_daily_uses_the_city_timezone():
+    # 23:00 UTC is already the next day three hours east of UTC
+    data = forecast(slot(DAY - 3600, 10), timezone=3 * 3600)
+    assert shape(data, "daily")["days"][0]["date"] == "1970-01-02"
+
+
+def test_fields_project_dotted_paths():
+    shaped = shape(forecast(slot(0, 10)), fields=["main.temp", "weather.0.description", "wind.speed"])
+    assert shaped["list"] == [{"main.temp": 10, "weather.0.description": "clear sky", "wind.speed": None}]
+
+
+def test_shapes_are_built_once_per_payload():
+    payload = Payload.from_data(forecast(slot(0, 10)))
+    assert shape_forecast(payload, "daily") is shape_forecast(payload, "daily")
+    assert shape_forecast(payload) is payload
+
+
+def test_upstream_errors_pass_through():
+    error = {"cod": "404", "message": "city not found"}
+    assert shape(error, "daily") == error
+
+
+@pytest.mark.parametrize("mode, fields", [("hourly", None), ("daily", ["main.temp"])])
+def test_invalid_shapes_are_rejected(mode, fields):
+    with pytest.raises(ValueError):
+        check_forecast_shape(mode, fields)
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from mcp_server.weather_singleflight import SingleFlight
+
+
+class UpstreamDown(Exception):
+    pass
+
+
+def test_error_reaches_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            raise UpstreamDown("down")
+
+        waiters = [asyncio.create_task(flights.do("london", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(isinstance(result, UpstreamDown) for result in results)
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 2}
+
+
+def test_cancelled_waiter_leaves_the_fetch_running():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "payload"
+
+        first = asyncio.create_task(flights.do("london", fetch))
+        second = asyncio.create_task(flights.do("london", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "payload"
+
+
+def test_finished_flight_is_forgotten():
+    async def scenario():
+        flights = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        first = await flights.do("london", fetch)
+        second = await flights.do("london", fetch)
+        return first, second, flights.in_flight("london")
+
+    assert asyncio.run(scenario()) == (1, 2, False)
+
+
+def test_cancel_all_stops_background_flights():
+    async def scenario():
+        flights = SingleFlight()
+        stopped = []
+
+        async def refresh():
+            try:
+                await asyncio.sleep(60)
+            finally:
+                stopped.append(True)
+
+        task = flights.start("london", refresh)
+        await asyncio.sleep(0)
+        await flights.cancel_all()
+        return task, stopped, flights.in_flight("london")
+
+    task, stopped, in_flight = asyncio.run(scenario())
+    assert task.cancelled() and stopped == [True]
+    assert not in_flight
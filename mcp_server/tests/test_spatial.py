@@ -0,0 +1,60 @@
+import pytest
+
+from mcp_server.weather_spatial import SpatialIndex, check_radius, distance_km
+
+
+def index(*points) -> SpatialIndex:
+    spatial = SpatialIndex(grid_km=1, tolerance_km=2)
+    for key, lat, lon in points:
+        spatial.add(key, lat, lon)
+    return spatial
+
+
+def keys(found) -> list:
+    return [key for _, key in found]
+
+
+def test_points_across_a_cell_boundary_are_found():
+    # 0.1 degree cells: the point and the query sit in neighbouring rows and columns
+    spatial = index((("a",), 0.0999, 0.0999))
+    assert keys(spatial.within(0.1001, 0.1001, 1)) == [("a",)]
+    assert keys(spatial.within(-0.0001, 0.0999, 12)) == [("a",)]
+
+
+def test_lookup_wraps_the_antimeridian():
+    spatial = index((("fiji",), -17.0, 179.999))
+    assert keys(spatial.within(-17.0, -179.999, 1)) == [("fiji",)]
+
+
+def test_radius_over_a_pole_covers_every_meridian():
+    spatial = index((("near",), 89.95, 10.0))
+    assert keys(spatial.within(89.95, -170.0, 20)) == [("near",)]
+
+
+def test_results_are_nearest_first_and_within_the_radius():
+    spatial = index((("far",), 0.0, 0.05), (("near",), 0.0, 0.01), (("out",), 0.0, 0.5))
+    found = spatial.within(0.0, 0.0, 10)
+    assert keys(found) == [("near",), ("far",)]
+    assert found[0][0] == pytest.approx(distance_km(0, 0, 0, 0.01))
+
+
+def test_moved_and_discarded_points_leave_their_cells():
+    spatial = index((("a",), 10.0, 10.0))
+    spatial.add(("a",), 20.0, 20.0)
+    assert spatial.within(10.0, 10.0, 5) == []
+    spatial.prune(lambda key: False)
+    assert len(spatial) == 0 and spatial.within(20.0, 20.0, 5) == []
+
+
+def test_nearby_coordinates_share_a_grid_cell():
+    spatial = SpatialIndex(grid_km=1, tolerance_km=2)
+    assert spatial.quantize(38.7223, -9.1393) == spatial.quantize(38.7225, -9.1395)
+    snapped = spatial.quantize(38.7223, -9.1393)
+    assert distance_km(38.7223, -9.1393, *snapped) < 1
+
+
+def test_radius_is_bounded():
+    with pytest.raises(ValueError):
+        check_radius(0)
+    with pytest.raises(ValueError):
+        check_radius(500)
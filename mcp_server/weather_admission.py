@@ -0,0 +1,248 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from fastmcp.server.dependencies import get_http_request
+from fastmcp.server.middleware import Middleware
+from fastmcp.tools.tool import ToolResult
+from mcp.types import TextContent
+
+from .weather_codec import dumps_text
+from .weather_metrics import ADMISSION_REJECTIONS, ADMISSION_WAIT, REGISTRY, Metric
+from .weather_quota import TokenBucket
+from .weather_tracing import span
+
+# Weight of the latest call in the moving average of slot hold times
+SERVICE_TIME_WEIGHT = 0.2
+# Idle per-client rate buckets are dropped beyond this many clients
+MAX_TRACKED_CLIENTS = 1024
+
+
+class Overloaded(Exception):
+    def __init__(self, cod: int, reason: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.cod = cod
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Admit tool calls against a global in-flight limit and per-client caps.
+
+    A client (MCP session, or remote address when there is none) may have at
+    most ``client_max_in_flight`` calls running or queued and, when
+    ``client_rate`` is set, start that many per second with bursts up to
+    ``client_burst``. Calls over a client cap are rejected at once, so a
+    flooding client only ever holds its own share of the server. Calls over
+    ``max_in_flight`` queue in arrival order for at most ``max_wait``
+    seconds; one whose estimated wait is already longer, or that finds the
+    queue full, is shed immediately instead of timing out later.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_wait: float,
+                 client_max_in_flight: int, client_rate: float, client_burst: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.client_max_in_flight = client_max_in_flight
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.in_flight = 0
+        self.service_time = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+        # client -> calls running or queued
+        self._clients: dict[str, int] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self.admitted = 0
+        self.queued = 0
+
+    def waiting(self) -> int:
+        return sum(1 for future in self._waiters if not future.done())
+
+    def estimated_wait(self) -> float:
+        return (self.waiting() + 1) * self.service_time / self.max_in_flight
+
+    def _retry_after(self) -> float:
+        # Never invite an immediate retry while overloaded
+        return max(1.0, self.estimated_wait())
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_CLIENTS:
+                # A refilled bucket carries no state worth keeping
+                for name in [name for name, kept in self._buckets.items()
+                             if kept.wait_time() == 0 and kept.tokens >= kept.capacity]:
+                    del self._buckets[name]
+            bucket = self._buckets[client] = TokenBucket(self.client_burst, self.client_burst / self.client_rate)
+        return bucket
+
+    def _check_client(self, client: str):
+        if self.client_max_in_flight and self._clients.get(client, 0) >= self.client_max_in_flight:
+            raise Overloaded(
+                429, "client_concurrency",
+                f"Too many concurrent calls from this client (limit {self.client_max_in_flight})",
+                max(1.0, self.service_time),
+            )
+        if self.client_rate > 0:
+            bucket = self._bucket(client)
+            wait = bucket.wait_time()
+            if wait > 0:
+                raise Overloaded(
+                    429, "client_rate", f"Call rate limit of {self.client_rate:g}/s exceeded for this client", wait
+                )
+            bucket.take()
+
+    async def _acquire_slot(self):
+        if not self.max_in_flight or (self.in_flight < self.max_in_flight and not self.waiting()):
+            self.in_flight += 1
+            return
+        if self.waiting() >= self.max_queue:
+            raise Overloaded(503, "queue_full", "Server overloaded; admission queue full", self._retry_after())
+        estimated = self.estimated_wait()
+        if estimated > self.max_wait:
+            raise Overloaded(503, "deadline", "Server overloaded; call would not start in time", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except BaseException as error:
+            if future.done() and not future.cancelled():
+                # Granted just as the wait was abandoned; pass the slot on
+                self._release_slot()
+            if isinstance(error, asyncio.TimeoutError):
+                raise Overloaded(
+                    503, "deadline", "Server overloaded; call did not start in time", self._retry_after()
+                ) from None
+            raise
+
+    def _release_slot(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _leave(self, client: str):
+        remaining = self._clients[client] - 1
+        if remaining:
+            self._clients[client] = remaining
+        else:
+            del self._clients[client]
+
+    async def acquire(self, client: str):
+        """Wait for a slot, or raise Overloaded; every successful acquire needs a ``release``."""
+        started = time.perf_counter()
+        self._check_client(client)
+        self._clients[client] = self._clients.get(client, 0) + 1
+        try:
+            await self._acquire_slot()
+        except BaseException:
+            self._leave(client)
+            raise
+        finally:
+            ADMISSION_WAIT.observe((), time.perf_counter() - started)
+        self.admitted += 1
+
+    def release(self, client: str, held: float):
+        """Free ``client``'s slot after it was held for ``held`` seconds."""
+        self.service_time += SERVICE_TIME_WEIGHT * (held - self.service_time)
+        self._release_slot()
+        self._leave(client)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting(),
+            "clients": len(self._clients),
+            "service_time": round(self.service_time, 4),
+            "admitted": self.admitted,
+            "queued": self.queued,
+        }
+
+
+def client_id() -> str:
+    """MCP session id when the transport has one, otherwise the remote address."""
+    try:
+        request = get_http_request()
+    except RuntimeError:
+        return "local"
+    session = request.headers.get("mcp-session-id")
+    if session:
+        return f"session:{session}"
+    return f"addr:{request.client.host}" if request.client else "unknown"
+
+
+def overloaded_result(error: Overloaded) -> ToolResult:
+    # Shaped like the server's other error bodies, so agents back off the same way
+    body = {"cod": error.cod, "message": str(error), "retry_after": round(error.retry_after, 1), "reason": error.reason}
+    return ToolResult(content=[TextContent(type="text", text=dumps_text(body))])
+
+
+class AdmissionMiddleware(Middleware):
+    """Run every tool call through an AdmissionController; shed calls get an error body at once."""
+
+    def __init__(self, controller: AdmissionController):
+        self.controller = controller
+        REGISTRY.register_collector(self._collect_metrics)
+
+    async def on_call_tool(self, context, call_next):
+        client = client_id()
+        try:
+            with span("admission"):
+                await self.controller.acquire(client)
+        except Overloaded as error:
+            ADMISSION_REJECTIONS.inc((error.reason,))
+            return overloaded_result(error)
+        started = time.perf_counter()
+        try:
+            return await call_next(context)
+        finally:
+            self.controller.release(client, time.perf_counter() - started)
+
+    def _collect_metrics(self) -> list[Metric]:
+        controller = self.controller
+        stats = controller.stats()
+        in_flight = Metric("openweather_admission_in_flight", "gauge", "Tool calls holding an admission slot")
+        in_flight.set((), stats["in_flight"])
+        waiting = Metric("openweather_admission_waiting", "gauge", "Tool calls queued for an admission slot")
+        waiting.set((), stats["waiting"])
+        clients = Metric("openweather_admission_clients", "gauge", "Clients with calls running or queued")
+        clients.set((), stats["clients"])
+        limits = Metric("openweather_admission_limit", "gauge", "Configured admission limits (0 = disabled)", ("limit",))
+        for limit, value in (
+            ("max_in_flight", controller.max_in_flight),
+            ("queue_size", controller.max_queue),
+            ("max_wait_seconds", controller.max_wait),
+            ("client_max_in_flight", controller.client_max_in_flight),
+            ("client_rate_per_second", controller.client_rate),
+            ("client_burst", controller.client_burst),
+        ):
+            limits.set((limit,), value)
+        return [in_flight, waiting, clients, limits]
+
+
+def admission_from_env() -> AdmissionController | None:
+    """Admission controller, or None when every limit is disabled."""
+    controller = AdmissionController(
+        max_in_flight=int(os.getenv("OPENWEATHER_MAX_IN_FLIGHT", "64")),
+        max_queue=int(os.getenv("OPENWEATHER_ADMISSION_QUEUE_SIZE", "256")),
+        max_wait=float(os.getenv("OPENWEATHER_ADMISSION_MAX_WAIT", "2")),
+        client_max_in_flight=int(os.getenv("OPENWEATHER_CLIENT_MAX_IN_FLIGHT", "8")),
+        client_rate=float(os.getenv("OPENWEATHER_CLIENT_RATE_PER_SECOND", "0")),
+        client_burst=int(os.getenv("OPENWEATHER_CLIENT_BURST", "20")),
+    )
+    if controller.client_rate > 0 and controller.client_burst < 1:
+        # The rate bucket holds client_burst tokens; an empty one would never admit a call
+        raise ValueError(
+            f"Invalid OPENWEATHER_CLIENT_BURST {controller.client_burst}; "
+            "expected at least 1 when OPENWEATHER_CLIENT_RATE_PER_SECOND is set"
+        )
+    if controller.max_in_flight <= 0 and controller.client_max_in_flight <= 0 and controller.client_rate <= 0:
+        return None
+    return controller
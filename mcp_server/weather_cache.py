@@ -0,0 +1,120 @@
+import os
+import time
+from collections import OrderedDict
+
+from .weather_geocoding import normalize_name
+
+
+def location_key(params: dict) -> str:
+    if "id" in params:
+        return f"id:{params['id']}"
+    if "lat" in params and "lon" in params:
+        return f"{float(params['lat']):.4f},{float(params['lon']):.4f}"
+    return normalize_name(str(params.get("q", "")))
+
+
+def cache_key(endpoint: str, params: dict) -> tuple:
+    """Canonical (endpoint, location, units, lang) key; the API key is never part of it."""
+    return (
+        endpoint,
+        location_key(params),
+        params.get("units", "standard"),
+        params.get("lang", "en"),
+    )
+
+
+class TTLCache:
+    """Bounded LRU cache with a per-endpoint TTL and a stale-while-revalidate window.
+
+    Entries past their TTL but still inside the stale window are returned as
+    stale so the caller can answer immediately and refresh in the background.
+    """
+
+    def __init__(self, maxsize: int, ttls: dict, default_ttl: float, stale_ttl: float):
+        self.maxsize = maxsize
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, key: tuple) -> float:
+        return self.ttls.get(key[0], self.default_ttl)
+
+    def get(self, key: tuple):
+        """Return (value, is_fresh), or None when the key is missing or too stale to serve."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        now = time.monotonic()
+        if now < expires_at:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, True
+        if now < expires_at + self.stale_ttl:
+            self._entries.move_to_end(key)
+            self.stale_hits += 1
+            return value, False
+        # Too stale to serve normally, but kept as a last resort until evicted
+        self.misses += 1
+        return None
+
+    def last_known(self, key: tuple):
+        """Return the cached value regardless of age, or None."""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def is_fresh(self, key: tuple) -> bool:
+        """Check freshness without touching LRU order or the hit/miss counters."""
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() < entry[1]
+
+    def expires_in(self, key: tuple) -> float | None:
+        """Seconds until the entry expires (negative once stale), or None when missing."""
+        entry = self._entries.get(key)
+        return entry[1] - time.monotonic() if entry is not None else None
+
+    def set(self, key: tuple, value, ttl: float | None = None):
+        if ttl is None:
+            ttl = self.ttl_for(key)
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
+
+
+def cache_from_env() -> TTLCache:
+    return TTLCache(
+        maxsize=int(os.getenv("OPENWEATHER_CACHE_SIZE", "1024")),
+        ttls={
+            # OpenWeather refreshes current conditions ~every 10 min, forecasts every 3 h
+            "weather": float(os.getenv("OPENWEATHER_CACHE_TTL_WEATHER", "600")),
+            "forecast": float(os.getenv("OPENWEATHER_CACHE_TTL_FORECAST", "3600")),
+        },
+        default_ttl=float(os.getenv("OPENWEATHER_CACHE_TTL_WEATHER", "600")),
+        stale_ttl=float(os.getenv("OPENWEATHER_CACHE_STALE_TTL", "300")),
+    )
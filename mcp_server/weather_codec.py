@@ -0,0 +1,74 @@
+import json
+
+try:
+    # Optional: several times faster than the stdlib for OpenWeather-sized bodies
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(body: bytes | str):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def dumps(value) -> bytes:
+    """Compact UTF-8 JSON; dict keys may be ints (condition ids)."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps_text(value) -> str:
+    return dumps(value).decode()
+
+
+class Payload:
+    """A JSON response held as encoded bytes, decoded only when its data is needed.
+
+    A cache hit served as is goes out as ``text`` without building a dict.
+    Values derived from the payload (unit variants, decoded forecast slots,
+    compact shapes) are computed once and kept with it, so they are served
+    pre-encoded too for as long as the payload stays cached. Payloads are
+    shared, so ``data`` must not be mutated.
+    """
+
+    __slots__ = ("_body", "_data", "_text", "_derived")
+
+    def __init__(self, body: bytes | None = None, data=None):
+        self._body = body
+        self._data = data
+        self._text = None
+        self._derived = None
+
+    @classmethod
+    def from_data(cls, data) -> "Payload":
+        return cls(data=data)
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = dumps(self._data)
+        return self._body
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = loads(self._body)
+        return self._data
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.body.decode()
+        return self._text
+
+    def derived(self, fn, *args):
+        """``fn(self, *args)``, computed on first use and memoized on the payload."""
+        if self._derived is None:
+            self._derived = {}
+        key = (fn, args)
+        if key not in self._derived:
+            self._derived[key] = fn(self, *args)
+        return self._derived[key]
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_stored_at ON entries (stored_at);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    holder INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class DiskCache:
+    """SQLite (WAL) response cache shared by every server process on the host.
+
+    Values are encoded JSON bodies, stored and returned as bytes. Uses
+    wall-clock time so expiry agrees across processes. Lookups and writes are
+    single-row statements on the cache's connection; expiry sweeps, size
+    eviction and WAL/vacuum compaction run separately through ``compact()``.
+    The methods block (up to the busy timeout while other processes write),
+    so callers on the event loop go through ``run``, which executes them one
+    at a time on the cache's own thread.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttls: dict, default_ttl: float, stale_ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = self._connect()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+
+    async def run(self, method, *args):
+        """Await ``method(*args)`` (a method of this cache) on the cache's thread, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None, check_same_thread=False)
+        # auto_vacuum only takes effect on a fresh database, before the first table exists
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    @staticmethod
+    def _encode_key(key: tuple) -> str:
+        return json.dumps(list(key), ensure_ascii=False, separators=(",", ":"))
+
+    def ttl_for(self, key: tuple) -> float:
+        return self.ttls.get(key[0], self.default_ttl)
+
+    def get(self, key: tuple):
+        """Return (value, is_fresh, seconds_left), or None when missing or too stale to serve."""
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM entries WHERE key = ?", (self._encode_key(key),)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        value, expires_at = row
+        seconds_left = expires_at - time.time()
+        if seconds_left > 0:
+            self.hits += 1
+            return value, True, seconds_left
+        if seconds_left > -self.stale_ttl:
+            self.stale_hits += 1
+            return value, False, seconds_left
+        self.misses += 1
+        return None
+
+    def expires_in(self, key: tuple) -> float | None:
+        """Seconds until the entry expires (negative once stale), or None when missing."""
+        row = self._conn.execute(
+            "SELECT expires_at FROM entries WHERE key = ?", (self._encode_key(key),)
+        ).fetchone()
+        return row[0] - time.time() if row is not None else None
+
+    def last_known(self, key: tuple):
+        """Return the stored value regardless of age, or None."""
+        row = self._conn.execute(
+            "SELECT value FROM entries WHERE key = ?", (self._encode_key(key),)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, key: tuple, body: bytes):
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (self._encode_key(key), body, len(body), now, now + self.ttl_for(key)),
+        )
+
+    def claim(self, key: tuple, seconds: float) -> bool:
+        """Take the fetch lease for ``key`` unless another process holds an unexpired one."""
+        now = time.time()
+        cursor = self._conn.execute(
+            """
+            INSERT INTO leases (key, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+            WHERE leases.expires_at < ?
+            """,
+            (self._encode_key(key), os.getpid(), now + seconds, now),
+        )
+        return cursor.rowcount == 1
+
+    def leased(self, key: tuple) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM leases WHERE key = ? AND expires_at >= ?", (self._encode_key(key), time.time())
+        ).fetchone() is not None
+
+    def release(self, key: tuple):
+        self._conn.execute(
+            "DELETE FROM leases WHERE key = ? AND holder = ?", (self._encode_key(key), os.getpid())
+        )
+
+    def compact(self) -> int:
+        """Drop unservable entries, evict oldest writes over ``max_bytes`` and shrink the files.
+
+        Opens its own connection so it can run in a worker thread.
+        """
+        conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        try:
+            removed = conn.execute(
+                "DELETE FROM entries WHERE expires_at < ?", (time.time() - self.stale_ttl,)
+            ).rowcount
+            removed += conn.execute(
+                """
+                DELETE FROM entries WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY stored_at DESC) AS running
+                        FROM entries
+                    ) WHERE running > ?
+                )
+                """,
+                (self.max_bytes,),
+            ).rowcount
+            # Leases left behind by processes that died mid-fetch
+            conn.execute("DELETE FROM leases WHERE expires_at < ?", (time.time(),))
+            # Frees one page per step. The pragma returns no columns, so execute() and
+            # fetchall() stop after the first step; executescript() steps it to the end
+            conn.executescript("PRAGMA incremental_vacuum")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        self.evictions += removed
+        return removed
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._conn.close()
+
+    def counters(self) -> dict:
+        """Lookup and eviction counts, without touching the database."""
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def stats(self) -> dict:
+        size, count = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries"
+        ).fetchone()
+        return {"path": self.path, "entries": count, "bytes": size, "max_bytes": self.max_bytes, **self.counters()}
+
+
+def disk_cache_from_env() -> DiskCache | None:
+    path = os.getenv("OPENWEATHER_DISK_CACHE")
+    if not path:
+        return None
+    return DiskCache(
+        path=path,
+        max_bytes=int(float(os.getenv("OPENWEATHER_DISK_CACHE_MAX_MB", "64")) * 1024 * 1024),
+        ttls={
+            "weather": float(os.getenv("OPENWEATHER_CACHE_TTL_WEATHER", "600")),
+            "forecast": float(os.getenv("OPENWEATHER_CACHE_TTL_FORECAST", "3600")),
+        },
+        default_ttl=float(os.getenv("OPENWEATHER_CACHE_TTL_WEATHER", "600")),
+        stale_ttl=float(os.getenv("OPENWEATHER_CACHE_STALE_TTL", "300")),
+    )
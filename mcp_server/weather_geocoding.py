@@ -0,0 +1,163 @@
+import csv
+import difflib
+import gzip
+import json
+import os
+import unicodedata
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+
+BUNDLED_CITY_LIST = Path(__file__).parent / "data" / "cities.csv"
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name: str) -> str:
+    """Accent- and case-fold a place name: "  São  Paulo " -> "sao paulo"."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    cleaned = "".join(char if char.isalnum() else " " for char in stripped.casefold())
+    return " ".join(cleaned.split())
+
+
+def split_country(query: str) -> tuple[str, str | None]:
+    """Split OpenWeather-style "City,CC" queries; anything else is returned as a bare name."""
+    parts = [part.strip() for part in query.split(",")]
+    if len(parts) == 2 and len(parts[1]) == 2 and parts[1].isalpha():
+        return parts[0], parts[1].upper()
+    return query, None
+
+
+class CityIndex:
+    """Array-backed city index with a sorted name table for exact and prefix lookups.
+
+    City attributes live in parallel typed arrays; every name and alternate
+    name is a row in one sorted key list pointing back at its city.
+    """
+
+    def __init__(self, cities):
+        self.ids = array("q")
+        self.lats = array("d")
+        self.lons = array("d")
+        self.populations = array("q")
+        self.names: list[str] = []
+        self.countries: list[str] = []
+
+        keyed = []
+        for city in cities:
+            index = len(self.ids)
+            self.ids.append(int(city["id"]))
+            self.lats.append(float(city["lat"]))
+            self.lons.append(float(city["lon"]))
+            self.populations.append(int(city.get("population") or 0))
+            self.names.append(city["name"])
+            self.countries.append(city.get("country", ""))
+            for name in {city["name"], *city.get("alt_names", ())}:
+                key = normalize_name(name)
+                if key:
+                    keyed.append((key, index))
+
+        keyed.sort()
+        self._keys = [key for key, _ in keyed]
+        self._key_cities = array("q", (index for _, index in keyed))
+        self._unique_keys = sorted(set(self._keys))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def city(self, index: int) -> dict:
+        return {
+            "id": self.ids[index],
+            "name": self.names[index],
+            "country": self.countries[index],
+            "lat": self.lats[index],
+            "lon": self.lons[index],
+        }
+
+    def _matches(self, key: str, prefix: bool = False) -> list[int]:
+        start = bisect_left(self._keys, key)
+        matches = []
+        for position in range(start, len(self._keys)):
+            candidate = self._keys[position]
+            if candidate != key and not (prefix and candidate.startswith(key)):
+                break
+            matches.append(self._key_cities[position])
+        return matches
+
+    def _rank(self, indexes, country: str | None) -> list[int]:
+        if country:
+            indexes = [index for index in indexes if self.countries[index] == country]
+        unique = dict.fromkeys(indexes)
+        return sorted(unique, key=lambda index: -self.populations[index])
+
+    def _fuzzy_candidates(self, key: str) -> list[str]:
+        # Only names starting with the query's first letter are scored: a slice
+        # of the sorted key table, instead of every name of a 200k-city list
+        start = bisect_left(self._unique_keys, key[0])
+        end = bisect_left(self._unique_keys, chr(ord(key[0]) + 1), start)
+        return self._unique_keys[start:end]
+
+    def lookup(self, query: str) -> dict | None:
+        """Exact (folded) match; the most populous city wins unless ",CC" narrows it.
+
+        None when several cities match and neither the country nor population
+        tells them apart (OpenWeather's bulk list has no population), so the
+        name is left for OpenWeather to resolve instead of picking by file order.
+        """
+        name, country = split_country(query)
+        ranked = self._rank(self._matches(normalize_name(name)), country)
+        if not ranked:
+            return None
+        if len(ranked) > 1 and self.populations[ranked[0]] <= self.populations[ranked[1]]:
+            return None
+        return self.city(ranked[0])
+
+    def search(self, query: str, limit: int = 5) -> list[dict]:
+        """Exact, then prefix, then fuzzy candidates, most populous first within each tier.
+
+        Fuzzy matches are only looked for among names with the query's first letter.
+        """
+        name, country = split_country(query)
+        key = normalize_name(name)
+        if not key:
+            return []
+        found = self._rank(self._matches(key), country)
+        if len(found) < limit:
+            found += self._rank(self._matches(key, prefix=True), country)
+        if len(found) < limit:
+            for close in difflib.get_close_matches(key, self._fuzzy_candidates(key), n=limit, cutoff=0.75):
+                found += self._rank(self._matches(close), country)
+        return [self.city(index) for index in dict.fromkeys(found)][:limit]
+
+
+def _read_city_list(path: Path):
+    if path.suffix == ".csv":
+        with path.open(encoding="utf-8", newline="") as handle:
+            for row in csv.DictReader(handle):
+                row["alt_names"] = [alt for alt in row.get("alt_names", "").split("|") if alt]
+                yield row
+        return
+
+    # OpenWeather bulk format: city.list.json(.gz) from bulk.openweathermap.org
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as handle:
+        for entry in json.load(handle):
+            yield {
+                "id": entry["id"],
+                "name": entry["name"],
+                "country": entry.get("country", ""),
+                "lat": entry["coord"]["lat"],
+                "lon": entry["coord"]["lon"],
+            }
+
+
+_index: CityIndex | None = None
+
+
+def get_city_index() -> CityIndex:
+    global _index
+    if _index is None:
+        path = Path(os.getenv("OPENWEATHER_CITY_LIST") or BUNDLED_CITY_LIST)
+        _index = CityIndex(_read_city_list(path))
+    return _index
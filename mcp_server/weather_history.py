@@ -0,0 +1,314 @@
+import asyncio
+import math
+import mmap
+import os
+import struct
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import NamedTuple
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends from several processes are not serialized
+    fcntl = None
+
+from .weather_localization import CANONICAL_UNITS, convert_temperature
+
+MAGIC = b"OWTS"
+VERSION = 1
+# magic, version, column count, capacity, rows written
+HEADER = struct.Struct("<4sHHII")
+DAY_SECONDS = 86400
+# Enough buckets to show a trend without flooding the model's context
+MAX_BUCKETS = 48
+
+
+class Schema(NamedTuple):
+    """Columns of one kind of partition, as (name, array typecode); 8-byte columns come first to stay aligned."""
+
+    suffix: str
+    columns: tuple[tuple[str, str], ...]
+    capacity: int
+
+
+# One row per distinct observation; current weather changes at most every few minutes upstream
+OBSERVATIONS = Schema("obs", (("t", "d"), ("temp", "f"), ("humidity", "f"), ("pressure", "f"), ("wind", "f")), 1440)
+# Forecast slots, partitioned by the day they forecast rather than the day they were fetched
+FORECASTS = Schema("fc", (("issued", "d"), ("t", "d"), ("temp", "f"), ("pop", "f")), 4096)
+
+
+def _offsets(schema: Schema) -> dict[str, tuple[int, str]]:
+    offsets, position = {}, HEADER.size
+    for name, code in schema.columns:
+        offsets[name] = (position, code)
+        position += schema.capacity * array(code).itemsize
+    return offsets
+
+
+def _size(schema: Schema) -> int:
+    name, code = schema.columns[-1]
+    return _offsets(schema)[name][0] + schema.capacity * array(code).itemsize
+
+
+def _day(t: float) -> str:
+    return datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y%m%d")
+
+
+def _number(value) -> float:
+    return float(value) if isinstance(value, (int, float)) else math.nan
+
+
+class HistoryStore:
+    """Append-only columnar time series of observations and forecast snapshots, on disk.
+
+    Each location gets a directory with one file per UTC day and schema:
+    a fixed header followed by one fixed-capacity column per field, written
+    in place through mmap and read back as arrays. A row's values are written
+    before the header's row count, so readers never see a partial row.
+    Partitions older than ``retention_days`` are deleted once a day.
+    Callers on the event loop append through ``record_in_background``, which
+    queues the write (file lock, mmap, sweep) on the store's own thread, and
+    query through ``run``, so a query sees every append queued before it.
+    """
+
+    def __init__(self, root: str, retention_days: int):
+        self.root = root
+        self.retention_days = retention_days
+        self.rows = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self._swept_day = None
+        os.makedirs(root, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history")
+
+    def _directory(self, location: str) -> str:
+        return os.path.join(self.root, quote(location, safe=""))
+
+    def _path(self, location: str, day: str, schema: Schema) -> str:
+        return os.path.join(self._directory(location), f"{day}.{schema.suffix}")
+
+    def _append(self, location: str, schema: Schema, rows: list[tuple]):
+        """Append ``rows`` (in column order) to the partitions of their day; observations only move forward."""
+        t_index = [name for name, _ in schema.columns].index("t")
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(_day(row[t_index]), []).append(row)
+        offsets = _offsets(schema)
+        os.makedirs(self._directory(location), exist_ok=True)
+        for day, day_rows in by_day.items():
+            path = self._path(location, day, schema)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, _size(schema))
+                    os.pwrite(fd, HEADER.pack(MAGIC, VERSION, len(schema.columns), schema.capacity, 0), 0)
+                with mmap.mmap(fd, 0) as mapped:
+                    self._write_rows(mapped, schema, offsets, day_rows)
+            finally:
+                os.close(fd)
+
+    def _write_rows(self, mapped: mmap.mmap, schema: Schema, offsets: dict, rows: list[tuple]):
+        count = HEADER.unpack_from(mapped)[4]
+        last = None
+        if schema is OBSERVATIONS and count:
+            # The same observation comes back until upstream has a newer one
+            offset, code = offsets["t"]
+            last = struct.unpack_from(code, mapped, offset + (count - 1) * array(code).itemsize)[0]
+        for position, row in enumerate(rows):
+            if last is not None and row[0] <= last:
+                self.duplicates += 1
+                continue
+            if count >= schema.capacity:
+                self.dropped += len(rows) - position
+                break
+            for name, value in zip(offsets, row):
+                offset, code = offsets[name]
+                struct.pack_into(code, mapped, offset + count * array(code).itemsize, value)
+            count += 1
+            self.rows += 1
+            if schema is OBSERVATIONS:
+                last = row[0]
+        mapped[:HEADER.size] = HEADER.pack(MAGIC, VERSION, len(schema.columns), schema.capacity, count)
+
+    def record(self, endpoint: str, location: str, data: dict, now: float | None = None):
+        """Append a current-weather observation or a forecast snapshot, in canonical units."""
+        now = time.time() if now is None else now
+        if endpoint == "weather" and isinstance(data.get("dt"), (int, float)):
+            main = data.get("main", {})
+            self._append(location, OBSERVATIONS, [(
+                float(data["dt"]),
+                _number(main.get("temp")),
+                _number(main.get("humidity")),
+                _number(main.get("pressure")),
+                _number(data.get("wind", {}).get("speed")),
+            )])
+        elif endpoint == "forecast" and data.get("list"):
+            self._append(location, FORECASTS, [
+                (now, float(slot["dt"]), _number(slot.get("main", {}).get("temp")), _number(slot.get("pop")))
+                for slot in data["list"] if isinstance(slot.get("dt"), (int, float))
+            ])
+        self._sweep(now)
+
+    async def run(self, method, *args):
+        """Await ``method(*args)`` (a method of this store) on the store's thread, after queued appends."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method, *args)
+
+    def record_in_background(self, endpoint: str, location: str, data: dict):
+        """Queue ``record`` on the store's thread and return at once; errors are dropped."""
+        self._executor.submit(self._record_quietly, endpoint, location, data, time.time())
+
+    def _record_quietly(self, endpoint: str, location: str, data: dict, now: float):
+        try:
+            self.record(endpoint, location, data, now)
+        except OSError:
+            # Like the disk cache, history is best effort and never fails a call
+            pass
+
+    def close(self):
+        """Finish queued appends."""
+        self._executor.shutdown(wait=True)
+
+    def _sweep(self, now: float):
+        today = _day(now)
+        if today == self._swept_day:
+            return
+        self._swept_day = today
+        cutoff = _day(now - self.retention_days * DAY_SECONDS)
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            for partition in os.scandir(entry.path):
+                if partition.name.split(".", 1)[0] < cutoff:
+                    try:
+                        os.remove(partition.path)
+                    except FileNotFoundError:
+                        pass  # another process swept it first
+            try:
+                os.rmdir(entry.path)
+            except OSError:
+                pass  # still holds partitions
+
+    def read(self, location: str, schema: Schema, start: float, end: float, columns: tuple[str, ...]) -> dict[str, array]:
+        """The requested columns of every row whose ``t`` is in [start, end], concatenated across day partitions."""
+        offsets = _offsets(schema)
+        result = {name: array(offsets[name][1]) for name in columns}
+        day = start - start % DAY_SECONDS
+        while day <= end:
+            path = self._path(location, _day(day), schema)
+            day += DAY_SECONDS
+            try:
+                with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    magic, version, _, capacity, count = HEADER.unpack_from(mapped)
+                    if magic != MAGIC or version != VERSION or capacity != schema.capacity:
+                        continue
+                    chunk = {}
+                    for name in set(columns) | {"t"}:
+                        offset, code = offsets[name]
+                        chunk[name] = array(code, mapped[offset:offset + count * array(code).itemsize])
+            except (FileNotFoundError, ValueError):
+                # Missing day, or an empty file another process has only just created
+                continue
+            times = chunk["t"]
+            if times and start <= min(times) and max(times) <= end:
+                # Whole days inside the window need no per-row filtering
+                for name in columns:
+                    result[name].extend(chunk[name])
+                continue
+            keep = [index for index, t in enumerate(times) if start <= t <= end]
+            for name in columns:
+                column = chunk[name]
+                result[name].extend(column[index] for index in keep)
+        return result
+
+    def temperature_history(self, location: str, hours: float, units: str = CANONICAL_UNITS,
+                            now: float | None = None) -> dict:
+        """Observed temperatures over the last ``hours``, downsampled to at most MAX_BUCKETS buckets.
+
+        Each bucket carries the min/mean/max of its observations and the
+        temperature forecast for it by the latest snapshot covering it, so
+        gaps between observations still show the expected course.
+        """
+        now = time.time() if now is None else now
+        bucket = max(3600, math.ceil(hours * 3600 / MAX_BUCKETS / 3600) * 3600)
+        start = now - hours * 3600
+        first = start - start % bucket
+        observed = self.read(location, OBSERVATIONS, start, now, ("t", "temp", "humidity"))
+        forecast = self.read(location, FORECASTS, first, now, ("issued", "t", "temp"))
+
+        buckets = {}
+        for t, temp, humidity in zip(observed["t"], observed["temp"], observed["humidity"]):
+            if not math.isnan(temp):
+                buckets.setdefault(int((t - first) // bucket), []).append((temp, humidity))
+        expected, issued_at = {}, {}
+        for issued, t, temp in zip(forecast["issued"], forecast["t"], forecast["temp"]):
+            if math.isnan(temp):
+                continue
+            index = int((t - first) // bucket)
+            # The latest snapshot covering a bucket stands for it; older ones are superseded
+            if issued > issued_at.get(index, -math.inf):
+                issued_at[index], expected[index] = issued, [temp]
+            elif issued == issued_at[index]:
+                expected[index].append(temp)
+
+        def temperature(value):
+            return None if value is None else convert_temperature(round(value, 2), units)
+
+        series = {"dt": [], "temp_min": [], "temp_mean": [], "temp_max": [], "humidity_mean": [],
+                  "observations": [], "forecast_temp": []}
+        for index in sorted(buckets.keys() | expected.keys()):
+            rows = buckets.get(index, [])
+            temps = [temp for temp, _ in rows]
+            humidity = [value for _, value in rows if not math.isnan(value)]
+            forecast_temps = expected.get(index, [])
+            series["dt"].append(int(first + index * bucket))
+            series["temp_min"].append(temperature(min(temps)) if temps else None)
+            series["temp_mean"].append(temperature(sum(temps) / len(temps)) if temps else None)
+            series["temp_max"].append(temperature(max(temps)) if temps else None)
+            series["humidity_mean"].append(round(sum(humidity) / len(humidity), 1) if humidity else None)
+            series["observations"].append(len(rows))
+            series["forecast_temp"].append(
+                temperature(sum(forecast_temps) / len(forecast_temps)) if forecast_temps else None
+            )
+
+        return {
+            "hours": hours,
+            "bucket_minutes": bucket // 60,
+            "units": units,
+            "observed": len(observed["t"]),
+            "trend_per_hour": _trend(observed["t"], observed["temp"], units),
+            **series,
+        }
+
+    def stats(self) -> dict:
+        return {"rows": self.rows, "duplicates": self.duplicates, "dropped": self.dropped}
+
+
+def _trend(times: array, temps: array, units: str) -> float | None:
+    """Least-squares slope of the observations, in degrees per hour."""
+    points = [(t / 3600, temp) for t, temp in zip(times, temps) if not math.isnan(temp)]
+    if len(points) < 2:
+        return None
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_temp = sum(temp for _, temp in points) / len(points)
+    spread = sum((t - mean_t) ** 2 for t, _ in points)
+    if spread == 0:
+        return None
+    slope = sum((t - mean_t) * (temp - mean_temp) for t, temp in points) / spread
+    # A difference, so Kelvin matches Celsius and only Fahrenheit rescales
+    return round(slope * 9 / 5 if units == "imperial" else slope, 2)
+
+
+def history_root_from_env() -> str | None:
+    return os.getenv("OPENWEATHER_HISTORY_DIR") or None
+
+
+def history_store_from_env() -> HistoryStore | None:
+    root = history_root_from_env()
+    if root is None:
+        return None
+    return HistoryStore(root, retention_days=int(os.getenv("OPENWEATHER_HISTORY_RETENTION_DAYS", "30")))
@@ -0,0 +1,112 @@
+import csv
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from .weather_codec import Payload
+
+CONDITIONS = Path(__file__).parent / "data" / "conditions.csv"
+
+UNITS = ("metric", "imperial", "standard")
+# Upstream is always asked for metric; the other unit systems are derived from it
+CANONICAL_UNITS = "metric"
+# Language of the canonical response; other languages in the condition table are translated from it
+CANONICAL_LANG = "pt_br"
+
+TEMPERATURE_FIELDS = ("temp", "feels_like", "temp_min", "temp_max")
+WIND_FIELDS = ("speed", "gust")
+MPH_PER_METER_PER_SECOND = 2.236936
+LANG_PATTERN = re.compile(r"[a-z]{2}(_[a-z]{2})?")
+
+
+@lru_cache(maxsize=1)
+def condition_descriptions() -> dict[str, dict[int, str]]:
+    """Language -> OpenWeather condition id -> description, from the bundled table."""
+    with CONDITIONS.open(encoding="utf-8", newline="") as handle:
+        rows = list(csv.DictReader(handle))
+    languages = [column for column in rows[0] if column not in ("id", "main")]
+    return {lang: {int(row["id"]): row[lang] for row in rows} for lang in languages}
+
+
+def upstream_lang(lang: str) -> str:
+    """Language to request upstream: the canonical one whenever ``lang`` can be translated locally."""
+    return CANONICAL_LANG if lang in condition_descriptions() else lang
+
+
+def check_variant(units: str, lang: str):
+    if units not in UNITS:
+        raise ValueError(f"Unknown units {units!r}; expected one of {', '.join(UNITS)}")
+    if not LANG_PATTERN.fullmatch(lang):
+        raise ValueError(f"Invalid lang {lang!r}; expected an OpenWeather language code such as en or pt_br")
+
+
+def _temperature(celsius, units: str):
+    if units == "imperial":
+        return round(celsius * 9 / 5 + 32, 2)
+    return round(celsius + 273.15, 2)
+
+
+def convert_temperature(celsius, units: str):
+    return celsius if units == CANONICAL_UNITS else _temperature(celsius, units)
+
+
+def _convert_main(main: dict, units: str) -> dict:
+    converted = dict(main)
+    for field in TEMPERATURE_FIELDS:
+        if isinstance(main.get(field), (int, float)):
+            converted[field] = _temperature(main[field], units)
+    # temp_kf is a difference, so only the scale changes
+    if units == "imperial" and isinstance(main.get("temp_kf"), (int, float)):
+        converted["temp_kf"] = round(main["temp_kf"] * 9 / 5, 2)
+    return converted
+
+
+def _convert_wind(wind: dict) -> dict:
+    converted = dict(wind)
+    for field in WIND_FIELDS:
+        if isinstance(wind.get(field), (int, float)):
+            converted[field] = round(wind[field] * MPH_PER_METER_PER_SECOND, 2)
+    return converted
+
+
+def _translate(conditions: list, descriptions: dict[int, str]) -> list:
+    return [
+        {**condition, "description": descriptions.get(condition.get("id"), condition.get("description"))}
+        for condition in conditions
+    ]
+
+
+def _localize_item(item: dict, units: str, descriptions: dict[int, str] | None) -> dict:
+    item = dict(item)
+    if units != CANONICAL_UNITS and isinstance(item.get("main"), dict):
+        item["main"] = _convert_main(item["main"], units)
+    if units == "imperial" and isinstance(item.get("wind"), dict):
+        item["wind"] = _convert_wind(item["wind"])
+    if descriptions is not None and isinstance(item.get("weather"), list):
+        item["weather"] = _translate(item["weather"], descriptions)
+    return item
+
+
+def localize(data: dict, units: str, lang: str) -> dict:
+    """Derive the ``units``/``lang`` variant of a canonical /weather or /forecast response.
+
+    The canonical variant is returned as is; others are shallow copies with
+    only the converted parts rebuilt. Error bodies pass through.
+    """
+    descriptions = condition_descriptions()[lang] if lang != upstream_lang(lang) else None
+    if units == CANONICAL_UNITS and descriptions is None:
+        return data
+    if isinstance(data.get("list"), list):
+        return {**data, "list": [_localize_item(item, units, descriptions) for item in data["list"]]}
+    return _localize_item(data, units, descriptions)
+
+
+def _variant(payload: Payload, units: str, lang: str) -> Payload:
+    return Payload.from_data(localize(payload.data, units, lang))
+
+
+def localize_payload(payload: Payload, units: str, lang: str) -> Payload:
+    """``localize`` for a payload; each variant is built once and kept with the cached payload."""
+    if units == CANONICAL_UNITS and lang == upstream_lang(lang):
+        return payload
+    return payload.derived(_variant, units, lang)
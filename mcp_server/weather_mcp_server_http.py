@@ -1,39 +1,10 @@
-import os
-import dotenv
-import requests
-from fastmcp import FastMCP
+import sys
+from pathlib import Path
 
-mcp = FastMCP("OpenWeatherMCP")
+sys.path.append(str(Path(__file__).parent.parent))
 
-dotenv.load_dotenv()
-
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_KEY")
-OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/"
-
-@mcp.tool()
-async def buscar_temperatura_atual(city: str) -> dict:
-    params = {
-        "q": city,
-        "appid": OPENWEATHER_API_KEY,
-        "units": "metric",
-        "lang": "pt_br"
-    }
-
-    response = requests.get(url=f"{OPENWEATHER_URL}weather", params=params)
-    return response.json()
-
-@mcp.tool()
-async def buscar_previsao_tempo(city: str) -> dict:
-    params = {
-        "q": city,
-        "appid": OPENWEATHER_API_KEY,
-        "units": "metric",
-        "lang": "pt_br"
-    }
-
-    response = requests.get(url=f"{OPENWEATHER_URL}forecast", params=params)
-    return response.json()
+from mcp_server.server import main
 
 if __name__ == "__main__":
     # HTTP transport rodando na porta 8000
-    mcp.run(transport="http", port=8000, host="0.0.0.0")
\ No newline at end of file
+    main(["--transport", "http", "--port", "8000", "--host", "0.0.0.0", *sys.argv[1:]])
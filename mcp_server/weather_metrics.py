@@ -0,0 +1,262 @@
+import asyncio
+import os
+import sys
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from fastmcp.exceptions import NotFoundError
+from fastmcp.server.middleware import Middleware
+
+# Seconds; spans cache hits (sub-millisecond) to slow upstream calls
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# With --workers, each worker dumps its metrics this often for whichever worker answers /metrics
+WORKER_DUMP_SECONDS = 5.0
+WORKER_DUMP_STALE = 3 * WORKER_DUMP_SECONDS
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        # One slot per bound plus the +Inf overflow; made cumulative on render
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """A named counter, gauge or histogram holding one value per label tuple.
+
+    Updates are a dict lookup and an addition, so the hot path stays in the
+    microsecond range; all formatting happens when the metrics are rendered.
+    """
+
+    def __init__(self, name: str, kind: str, help: str, labels: tuple = (), buckets: tuple = DURATION_BUCKETS):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.values: dict[tuple, float | Histogram] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, labels: tuple, value: float):
+        self.values[labels] = value
+
+    def observe(self, labels: tuple, value: float):
+        histogram = self.values.get(labels)
+        if histogram is None:
+            histogram = self.values[labels] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def _label_text(self, values: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labels, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.values.items()):
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{self._label_text(labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), value.counts):
+                cumulative += count
+                le = f'le="{bound if bound == "+Inf" else _number(bound)}"'
+                lines.append(f"{self.name}_bucket{self._label_text(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {_number(value.sum)}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {value.count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+        self._collectors = []
+
+    def metric(self, name: str, kind: str, help: str, labels: tuple = (), buckets: tuple = DURATION_BUCKETS) -> Metric:
+        metric = Metric(name, kind, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Add a callable returning extra Metric objects built at render time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+TOOL_CALLS = REGISTRY.metric(
+    "openweather_tool_calls_total", "counter", "MCP tool calls by outcome", ("tool", "outcome"))
+TOOL_DURATION = REGISTRY.metric(
+    "openweather_tool_duration_seconds", "histogram", "MCP tool call latency, including serialization", ("tool",))
+TOOL_IN_FLIGHT = REGISTRY.metric(
+    "openweather_tool_in_flight", "gauge", "MCP tool calls currently running", ("tool",))
+TOOL_RESPONSE_BYTES = REGISTRY.metric(
+    "openweather_tool_response_bytes", "histogram", "Serialized tool response size", ("tool",), BYTES_BUCKETS)
+UPSTREAM_DURATION = REGISTRY.metric(
+    "openweather_upstream_duration_seconds", "histogram", "OpenWeather HTTP call latency", ("endpoint",))
+UPSTREAM_RESPONSES = REGISTRY.metric(
+    "openweather_upstream_responses_total", "counter",
+    "OpenWeather HTTP calls by status (\"error\" when no response arrived)", ("endpoint", "status"))
+UPSTREAM_IN_FLIGHT = REGISTRY.metric(
+    "openweather_upstream_in_flight", "gauge", "OpenWeather HTTP calls currently running")
+UPSTREAM_ATTEMPTS = REGISTRY.metric(
+    "openweather_upstream_attempts_total", "counter", "OpenWeather requests by kind (first, retry, hedge)", ("kind",))
+HEDGE_WINS = REGISTRY.metric(
+    "openweather_upstream_hedge_wins_total", "counter", "Hedged requests that answered before the original")
+CIRCUIT_REJECTIONS = REGISTRY.metric(
+    "openweather_circuit_rejections_total", "counter", "Calls failed fast while the circuit breaker was open")
+QUOTA_WAIT = REGISTRY.metric(
+    "openweather_quota_wait_seconds", "histogram", "Time spent waiting for the upstream call scheduler", ("priority",))
+ADMISSION_WAIT = REGISTRY.metric(
+    "openweather_admission_wait_seconds", "histogram", "Time tool calls spent waiting for admission")
+ADMISSION_REJECTIONS = REGISTRY.metric(
+    "openweather_admission_rejections_total", "counter", "Tool calls shed or rejected by admission control", ("reason",))
+
+
+
+def _collect_process_metrics() -> list[Metric]:
+    cpu = Metric("process_cpu_seconds_total", "counter", "User and system CPU time spent by this process")
+    cpu.set((), time.process_time())
+    return [cpu]
+
+
+REGISTRY.register_collector(_collect_process_metrics)
+
+
+def response_size(result) -> int:
+    return sum(len(block.text.encode()) for block in result.content if getattr(block, "text", None))
+
+
+class ToolMetricsMiddleware(Middleware):
+    """Record latency, in-flight count, outcome and response size of every tool call."""
+
+    async def on_call_tool(self, context, call_next):
+        tool = name = context.message.name
+        TOOL_IN_FLIGHT.inc((name,))
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await call_next(context)
+            outcome = "ok"
+        except NotFoundError:
+            # Keep arbitrary names sent by clients out of the label set
+            tool = "unknown"
+            raise
+        finally:
+            TOOL_IN_FLIGHT.dec((name,))
+            if tool != name and not TOOL_IN_FLIGHT.values[(name,)]:
+                del TOOL_IN_FLIGHT.values[(name,)]
+            TOOL_DURATION.observe((tool,), time.perf_counter() - started)
+            TOOL_CALLS.inc((tool, outcome))
+        TOOL_RESPONSE_BYTES.observe((tool,), response_size(result))
+        return result
+
+
+def write_metrics(path: str | None):
+    text = REGISTRY.render()
+    if not path:
+        # stdout carries the stdio protocol
+        sys.stderr.write(text)
+        sys.stderr.flush()
+        return
+    target = Path(path)
+    partial = target.with_name(target.name + ".tmp")
+    partial.write_text(text, encoding="utf-8")
+    # Atomic, so a scraper reading the file (node_exporter textfile) never sees half a dump
+    partial.replace(target)
+
+
+async def dump_periodically(interval: float, path: str | None):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write_metrics(path)
+        except OSError:
+            pass
+
+
+def _with_worker(sample: str, worker: str) -> str:
+    end = min(index for index in (sample.find("{"), sample.find(" ")) if index >= 0)
+    if sample[end] == "{":
+        return f'{sample[:end + 1]}worker="{worker}",{sample[end + 1:]}'
+    return f'{sample[:end]}{{worker="{worker}"}}{sample[end:]}'
+
+
+def merge_worker_metrics(texts: dict[str, str]) -> str:
+    """Join the expositions of several workers into one, each sample labelled with its worker."""
+    families: dict[str, list] = {}
+    for worker, text in texts.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                family = families.setdefault(line.split(" ", 3)[2], [line, None, []])
+            elif line.startswith("# TYPE "):
+                family[1] = line
+            elif line and family is not None:
+                family[2].append(_with_worker(line, worker))
+    return "\n".join(line for help, kind, samples in families.values() for line in (help, kind, *samples)) + "\n"
+
+
+def render_workers(directory: str) -> str:
+    """This worker's metrics merged with the latest dumps the other workers left in ``directory``."""
+    own = str(os.getpid())
+    texts = {own: REGISTRY.render()}
+    now = time.time()
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        entries = []
+    for entry in entries:
+        worker, _, suffix = entry.name.partition(".")
+        if suffix != "prom" or worker == own:
+            continue
+        try:
+            # A dump that stopped being refreshed belongs to a worker that is gone
+            if now - entry.stat().st_mtime > WORKER_DUMP_STALE:
+                continue
+            texts[worker] = Path(entry.path).read_text(encoding="utf-8")
+        except OSError:
+            continue
+    return merge_worker_metrics(texts)
+
+
+def metrics_dump_from_env() -> tuple[float, str | None]:
+    """(interval seconds, file path or None for stderr); interval 0 disables the dump."""
+    return (
+        float(os.getenv("OPENWEATHER_METRICS_DUMP_INTERVAL", "0")),
+        os.getenv("OPENWEATHER_METRICS_DUMP_FILE") or None,
+    )
@@ -0,0 +1,271 @@
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Lower value is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"OpenWeather call quota exhausted; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_seconds: float):
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 when one is available now)."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class LocalQuota:
+    """Token buckets held in this process; a grant needs a token from every bucket."""
+
+    blocking = False
+
+    def __init__(self, buckets: list[TokenBucket]):
+        self.buckets = buckets
+
+    def wait_time(self) -> float:
+        return max((bucket.wait_time() for bucket in self.buckets), default=0.0)
+
+    def try_take(self) -> float:
+        """Take a token from every bucket if each has one; returns 0, or the seconds until they will."""
+        wait = self.wait_time()
+        if wait == 0:
+            for bucket in self.buckets:
+                bucket.take()
+        return wait
+
+    def drain(self):
+        for bucket in self.buckets:
+            bucket.drain()
+
+
+class SharedQuota(LocalQuota):
+    """Token buckets whose balances live in a SQLite file shared by every process using it.
+
+    ``try_take`` checks and takes from every bucket in one immediate
+    transaction, so processes cannot both see the last token and take it.
+    The statements block while another process holds the file, so the
+    scheduler runs them through ``run``, one at a time on the quota's own
+    thread. The in-process buckets mirror the last balances seen, for stats.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, buckets: list[TokenBucket]):
+        super().__init__(buckets)
+        self._names = [f"per_{bucket.capacity / bucket.rate:g}s" for bucket in buckets]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS quota_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        # Wall-clock time so every process refills the same balance alike
+        for name, bucket in zip(self._names, buckets):
+            self._conn.execute(
+                "INSERT OR IGNORE INTO quota_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (name, bucket.capacity, time.time()),
+            )
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quota")
+
+    async def run(self, method):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, method)
+
+    def _balances(self) -> tuple[list[float], float]:
+        now = time.time()
+        balances = []
+        for name, bucket in zip(self._names, self.buckets):
+            tokens, updated = self._conn.execute(
+                "SELECT tokens, updated FROM quota_buckets WHERE name = ?", (name,)
+            ).fetchone()
+            balances.append(min(bucket.capacity, tokens + max(0.0, now - updated) * bucket.rate))
+        return balances, now
+
+    def _mirror(self, balances: list[float]):
+        for bucket, tokens in zip(self.buckets, balances):
+            bucket.tokens = tokens
+
+    def _wait(self, balances: list[float]) -> float:
+        return max(
+            (0.0 if tokens >= 1 else (1 - tokens) / bucket.rate for bucket, tokens in zip(self.buckets, balances)),
+            default=0.0,
+        )
+
+    def _update(self, change) -> float:
+        """Apply ``change(balances) -> (balances, result)`` to every bucket in one transaction."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            balances, now = self._balances()
+            balances, result = change(balances)
+            for name, tokens in zip(self._names, balances):
+                self._conn.execute(
+                    "UPDATE quota_buckets SET tokens = ?, updated = ? WHERE name = ?", (tokens, now, name)
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._mirror(balances)
+        return result
+
+    def wait_time(self) -> float:
+        balances, _ = self._balances()
+        self._mirror(balances)
+        return self._wait(balances)
+
+    def try_take(self) -> float:
+        def take(balances):
+            wait = self._wait(balances)
+            return ([tokens - 1 for tokens in balances] if wait == 0 else balances), wait
+
+        return self._update(take)
+
+    def drain(self):
+        self._update(lambda balances: ([min(tokens, 0.0) for tokens in balances], None))
+
+
+class UpstreamScheduler:
+    """Grant upstream calls against every token bucket, queueing briefly by priority.
+
+    A request that cannot be granted within ``max_wait`` seconds, or that
+    finds the queue full, fails immediately with QuotaExceeded instead of
+    piling up behind an exhausted quota.
+    """
+
+    def __init__(self, quota: LocalQuota, max_queue: int, max_wait: float):
+        self.quota = quota
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._queue = []
+        self._sequence = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+        self.granted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    async def _call(self, method):
+        return await self.quota.run(method) if self.quota.blocking else method()
+
+    def _estimated_wait(self, priority: int, wait: float) -> float:
+        ahead = sum(1 for queued_priority, _, future in self._queue
+                    if queued_priority <= priority and not future.done())
+        slowest_rate = min(bucket.rate for bucket in self.quota.buckets)
+        return wait + ahead / slowest_rate
+
+    async def acquire(self, priority: int = INTERACTIVE):
+        if not self.quota.buckets:
+            return
+        if not self._queue:
+            wait = await self._call(self.quota.try_take)
+            if wait == 0:
+                self.granted += 1
+                return
+        else:
+            wait = await self._call(self.quota.wait_time)
+
+        estimated = self._estimated_wait(priority, wait)
+        if len(self._queue) >= self.max_queue or estimated > self.max_wait:
+            self.rejected += 1
+            raise QuotaExceeded(estimated)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+        self.queued += 1
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QuotaExceeded(await self._call(self.quota.wait_time)) from None
+
+    async def try_acquire(self) -> bool:
+        """Grant a call only if a token is free right now and nobody is queued (for optional calls)."""
+        if not self.quota.buckets:
+            return True
+        if self._queue or await self._call(self.quota.try_take) > 0:
+            return False
+        self.granted += 1
+        return True
+
+    async def _dispatch(self):
+        try:
+            while self._queue:
+                if self._queue[0][2].done():
+                    # The waiter timed out or was cancelled
+                    heapq.heappop(self._queue)
+                    continue
+                wait = await self._call(self.quota.try_take)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                self.granted += 1
+                # The head may have given up while the token was taken; it goes to the next live waiter
+                while self._queue:
+                    _, _, future = heapq.heappop(self._queue)
+                    if not future.done():
+                        future.set_result(None)
+                        break
+        finally:
+            self._dispatcher = None
+
+    async def throttle(self):
+        """Empty the buckets after OpenWeather itself answered 429."""
+        await self._call(self.quota.drain)
+
+    def stats(self) -> dict:
+        return {
+            "buckets": [
+                {"capacity": bucket.capacity, "per_second": bucket.rate, "tokens": round(bucket.tokens, 2)}
+                for bucket in self.quota.buckets
+            ],
+            "waiting": sum(1 for _, _, future in self._queue if not future.done()),
+            "granted": self.granted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
+
+
+def scheduler_from_env() -> UpstreamScheduler:
+    buckets = []
+    per_minute = int(os.getenv("OPENWEATHER_RATE_PER_MINUTE", "60"))
+    per_day = int(os.getenv("OPENWEATHER_RATE_PER_DAY", "0"))
+    shared_path = os.getenv("OPENWEATHER_QUOTA_DB")
+    if per_minute > 0:
+        buckets.append(TokenBucket(per_minute, 60))
+    if per_day > 0:
+        buckets.append(TokenBucket(per_day, 86400))
+    return UpstreamScheduler(
+        SharedQuota(shared_path, buckets) if shared_path and buckets else LocalQuota(buckets),
+        max_queue=int(os.getenv("OPENWEATHER_QUEUE_SIZE", "100")),
+        max_wait=float(os.getenv("OPENWEATHER_QUEUE_MAX_WAIT", "5")),
+    )
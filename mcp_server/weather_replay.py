@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import os
+import struct
+import time
+import zlib
+from collections import Counter
+
+from .weather_codec import dumps, loads
+
+# Each record is a little-endian uint32 length followed by a zlib-compressed
+# frame: one JSON metadata line, then the response body as received
+LENGTH = struct.Struct("<I")
+# Never written to an archive
+SECRET_PARAMS = ("appid",)
+
+
+def request_key(endpoint: str, params: dict) -> str:
+    """Endpoint and sorted parameters, without the API key: what a replay is matched on."""
+    public = {key: str(value) for key, value in params.items() if key not in SECRET_PARAMS and value is not None}
+    return endpoint + "?" + "&".join(f"{key}={public[key]}" for key in sorted(public))
+
+
+def read_archive(path: str):
+    """Yield (metadata, body) for every complete record of an archive."""
+    with open(path, "rb") as handle:
+        while True:
+            header = handle.read(LENGTH.size)
+            if len(header) < LENGTH.size:
+                return
+            (size,) = LENGTH.unpack(header)
+            frame = handle.read(size)
+            if len(frame) < size:
+                # Torn last record of a process killed mid-write
+                return
+            meta, _, body = zlib.decompress(frame).partition(b"\n")
+            yield loads(meta), body
+
+
+class ArchiveWriter:
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def append(self, meta: dict, body: bytes):
+        frame = zlib.compress(dumps(meta) + b"\n" + body)
+        # One write per record on an O_APPEND descriptor, so processes
+        # recording into the same archive never interleave records
+        os.write(self._fd, LENGTH.pack(len(frame)) + frame)
+
+    def close(self):
+        os.close(self._fd)
+
+
+class RecordingProvider:
+    """Pass requests to ``inner`` and append each response and its latency to an archive.
+
+    Transport errors are not recorded.
+    """
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.writer = ArchiveWriter(path)
+        self.recorded = 0
+
+    async def fetch(self, endpoint: str, params: dict) -> tuple[int, bytes]:
+        started_at = time.time()
+        started = time.perf_counter()
+        status, body = await self.inner.fetch(endpoint, params)
+        meta = {
+            "t": round(started_at, 3),
+            "key": request_key(endpoint, params),
+            "status": status,
+            "elapsed": round(time.perf_counter() - started, 4),
+        }
+        self.writer.append(meta, body)
+        self.recorded += 1
+        return status, body
+
+    async def close(self):
+        await self.inner.close()
+        self.writer.close()
+
+
+class ReplayProvider:
+    """Serve the responses of an archive without network access or quota.
+
+    Requests are matched on endpoint and parameters. Repeated requests for
+    one key get its recordings in recorded order, starting over after the
+    last. ``speed`` paces answers: 1 reproduces the recorded latencies, 10
+    is ten times faster, 0 answers at once. Requests never recorded get an
+    OpenWeather-style 404.
+    """
+
+    def __init__(self, path: str, speed: float):
+        self.path = path
+        self.speed = speed
+        self._recordings: dict[str, list[tuple[int, float, bytes]]] = {}
+        for meta, body in read_archive(path):
+            self._recordings.setdefault(meta["key"], []).append((meta["status"], meta["elapsed"], body))
+        self._next: dict[str, int] = {}
+        self.served = 0
+        self.unmatched = 0
+
+    async def fetch(self, endpoint: str, params: dict) -> tuple[int, bytes]:
+        key = request_key(endpoint, params)
+        recordings = self._recordings.get(key)
+        if not recordings:
+            self.unmatched += 1
+            return 404, dumps({"cod": "404", "message": f"no recorded response for {key}"})
+        index = self._next.get(key, 0)
+        self._next[key] = (index + 1) % len(recordings)
+        status, elapsed, body = recordings[index]
+        if self.speed > 0:
+            await asyncio.sleep(elapsed / self.speed)
+        self.served += 1
+        return status, body
+
+    async def close(self):
+        pass
+
+
+def summarize(path: str) -> dict:
+    records = size = 0
+    endpoints = Counter()
+    statuses = Counter()
+    keys = set()
+    latencies = []
+    first = last = None
+    for meta, body in read_archive(path):
+        records += 1
+        endpoints[meta["key"].split("?", 1)[0]] += 1
+        keys.add(meta["key"])
+        statuses[meta["status"]] += 1
+        latencies.append(meta["elapsed"])
+        first = meta["t"] if first is None else first
+        last = meta["t"]
+        size += len(body)
+    latencies.sort()
+    return {
+        "records": records,
+        "distinct_requests": len(keys),
+        "endpoints": dict(endpoints),
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "span_s": round(last - first, 1) if records else 0.0,
+        "body_bytes": size,
+        "archive_bytes": os.path.getsize(path),
+        "latency_ms": {
+            "p50": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+        } if latencies else {},
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="mcp_server.weather_replay", description="Summarize an upstream archive")
+    parser.add_argument("archive")
+    args = parser.parse_args(argv)
+    for name, value in summarize(args.archive).items():
+        print(f"{name:<18} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+
+import httpx
+
+from .weather_codec import Payload
+from .weather_metrics import CIRCUIT_REJECTIONS, HEDGE_WINS, UPSTREAM_ATTEMPTS
+from .weather_tracing import span
+from .weather_upstream import fetch_response
+
+# Hedge delays are only derived once this many latencies have been seen
+MIN_LATENCY_SAMPLES = 20
+MIN_HEDGE_DELAY = 0.05
+BACKOFF_BASE = 0.2
+
+
+class UpstreamUnavailable(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RetryableStatus(Exception):
+    """A 5xx answer: safe to retry, since every OpenWeather call is a GET."""
+
+    def __init__(self, status: int, body: Payload):
+        super().__init__(f"OpenWeather answered {status}")
+        self.status = status
+        self.body = body
+
+
+RETRYABLE = (httpx.TransportError, TimeoutError, RetryableStatus)
+
+
+class LatencyTracker:
+    """Recent successful attempt latencies per endpoint, for hedge delays."""
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._samples: dict[str, deque] = {}
+
+    def record(self, endpoint: str, seconds: float):
+        samples = self._samples.get(endpoint)
+        if samples is None:
+            samples = self._samples[endpoint] = deque(maxlen=self.size)
+        samples.append(seconds)
+
+    def quantile(self, endpoint: str, q: float) -> float | None:
+        samples = self._samples.get(endpoint)
+        if samples is None or len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Open after ``failures`` failed fetches in a row; after ``cooldown`` let one probe through.
+
+    While open, calls fail immediately instead of waiting out timeouts
+    against an upstream that is down.
+    """
+
+    def __init__(self, failures: int, cooldown: float):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+        self.opened = 0
+
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def check(self):
+        state = self.state()
+        if state == "closed":
+            return
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return
+        CIRCUIT_REJECTIONS.inc()
+        raise UpstreamUnavailable("OpenWeather is failing; circuit breaker open", self.retry_after())
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 1.0
+        return max(1.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def failure(self):
+        self.consecutive_failures += 1
+        if self._probing or self.consecutive_failures >= self.failures:
+            if self.opened_at is None or self._probing:
+                self.opened += 1
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def abandon(self):
+        """The call was cancelled; it says nothing about upstream health."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state(),
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+        }
+
+
+class ResilientFetcher:
+    """Bound the latency of an OpenWeather call.
+
+    Each attempt has its own timeout and the whole call a total deadline.
+    If an attempt outlives the endpoint's recent ``hedge_quantile`` latency,
+    a second identical request is raced against it. Timeouts, transport
+    errors and 5xx answers are retried with jittered exponential backoff
+    while the deadline allows; 4xx answers are returned as they are. Every
+    request takes quota: the first through ``acquire``, retries and hedges
+    only when ``permit`` grants a token, so they never exceed the quota.
+    """
+
+    def __init__(self, attempt_timeout: float, deadline: float, retries: int, hedge_quantile: float,
+                 breaker: CircuitBreaker):
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.hedge_quantile = hedge_quantile
+        self.breaker = breaker
+        self.latencies = LatencyTracker()
+
+    def hedge_delay(self, endpoint: str) -> float | None:
+        if self.hedge_quantile <= 0:
+            return None
+        delay = self.latencies.quantile(endpoint, self.hedge_quantile)
+        return None if delay is None else max(MIN_HEDGE_DELAY, delay)
+
+    async def _attempt(self, endpoint: str, params: dict, kind: str) -> Payload:
+        UPSTREAM_ATTEMPTS.inc((kind,))
+        started = time.perf_counter()
+        with span(f"upstream {endpoint}", "client", attempt=kind) as attempt:
+            status, body = await fetch_response(endpoint, params)
+            attempt.set("http.status_code", status)
+        if status >= 500:
+            raise RetryableStatus(status, body)
+        self.latencies.record(endpoint, time.perf_counter() - started)
+        return body
+
+    async def _hedged_attempt(self, endpoint: str, params: dict, kind: str, timeout: float, hedge_permit) -> Payload:
+        pending = {asyncio.create_task(self._attempt(endpoint, params, kind))}
+        hedge = None
+        try:
+            async with asyncio.timeout(timeout):
+                delay = self.hedge_delay(endpoint) if hedge_permit is not None else None
+                if delay is not None and delay < timeout:
+                    done, _ = await asyncio.wait(pending, timeout=delay)
+                    if not done and await hedge_permit():
+                        hedge = asyncio.create_task(self._attempt(endpoint, params, "hedge"))
+                        pending.add(hedge)
+                error = None
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if task is hedge:
+                                HEDGE_WINS.inc()
+                            return task.result()
+                        error = task.exception()
+                raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def fetch(self, endpoint: str, params: dict, acquire=None, permit=None, hedge: bool = False) -> Payload:
+        """GET ``endpoint``.
+
+        ``await acquire()`` waits for quota for the first request (raising when
+        there is none); ``await permit()`` is True when a retry, or a hedge if
+        ``hedge`` is set, may take a token now.
+        """
+        # Before taking quota, so an open circuit does not spend tokens
+        self.breaker.check()
+        if acquire is not None:
+            try:
+                await acquire()
+            except BaseException:
+                # No quota says nothing about upstream health, but the probe slot must be freed
+                self.breaker.abandon()
+                raise
+        hedge_permit = permit if hedge else None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        kind = "first"
+        for attempt in range(self.retries + 1):
+            remaining = deadline - loop.time()
+            try:
+                data = await self._hedged_attempt(
+                    endpoint, params, kind, min(self.attempt_timeout, remaining), hedge_permit
+                )
+            except RETRYABLE as error:
+                backoff = random.uniform(0, BACKOFF_BASE * 2 ** attempt)
+                if (
+                    attempt == self.retries
+                    or deadline - loop.time() <= backoff
+                    or (permit is not None and not await permit())
+                ):
+                    self.breaker.failure()
+                    raise UpstreamUnavailable(
+                        f"OpenWeather request failed ({str(error) or type(error).__name__})", self.breaker.retry_after()
+                    ) from error
+                await asyncio.sleep(backoff)
+                kind = "retry"
+                continue
+            except BaseException:
+                self.breaker.abandon()
+                raise
+            self.breaker.success()
+            return data
+
+
+def fetcher_from_env() -> ResilientFetcher:
+    return ResilientFetcher(
+        attempt_timeout=float(os.getenv("OPENWEATHER_ATTEMPT_TIMEOUT", "3")),
+        deadline=float(os.getenv("OPENWEATHER_DEADLINE", "8")),
+        retries=int(os.getenv("OPENWEATHER_RETRIES", "2")),
+        hedge_quantile=float(os.getenv("OPENWEATHER_HEDGE_QUANTILE", "0.95")),
+        breaker=CircuitBreaker(
+            failures=int(os.getenv("OPENWEATHER_BREAKER_FAILURES", "5")),
+            cooldown=float(os.getenv("OPENWEATHER_BREAKER_COOLDOWN", "30")),
+        ),
+    )
@@ -0,0 +1,595 @@
+import asyncio
+import os
+import random
+import sqlite3
+import time
+
+from .weather_cache import TTLCache, cache_from_env, cache_key
+from .weather_codec import Payload
+from .weather_disk_cache import DiskCache, disk_cache_from_env
+from .weather_geocoding import get_city_index
+from .weather_history import HistoryStore, history_store_from_env
+from .weather_metrics import QUOTA_WAIT, REGISTRY, Metric
+from .weather_quota import BACKGROUND, INTERACTIVE, QuotaExceeded, UpstreamScheduler, scheduler_from_env
+from .weather_singleflight import SingleFlight
+from .weather_spatial import SpatialIndex, distance_km, spatial_index_from_env
+from .weather_tracing import span, untraced
+from .weather_resilience import ResilientFetcher, UpstreamUnavailable, fetcher_from_env
+from .weather_upstream import close_provider
+from .weather_warmer import WARM_ENDPOINTS, CacheWarmer
+
+# OpenWeather's /group endpoint accepts at most 20 city ids per call
+GROUP_MAX_IDS = 20
+# How long another process may hold a location's fetch lease before it is
+# presumed dead (covers quota wait plus connect and read timeouts)
+FETCH_LEASE_SECONDS = 15.0
+LEASE_POLL_SECONDS = 0.025
+
+_cache: TTLCache | None = None
+_disk_cache: DiskCache | None = None
+_disk_cache_loaded = False
+_compactor: asyncio.Task | None = None
+_scheduler: UpstreamScheduler | None = None
+_fetcher: ResilientFetcher | None = None
+_flights = SingleFlight()
+_warmer: CacheWarmer | None = None
+_warmer_task: asyncio.Task | None = None
+_spatial: SpatialIndex | None = None
+_history: HistoryStore | None = None
+_history_loaded = False
+# Normalized location -> OpenWeather city id, learned from successful responses
+_city_ids: dict[str, int] = {}
+
+
+def get_cache() -> TTLCache:
+    global _cache
+    if _cache is None:
+        _cache = cache_from_env()
+    return _cache
+
+
+def get_spatial_index() -> SpatialIndex:
+    global _spatial
+    if _spatial is None:
+        _spatial = spatial_index_from_env()
+    return _spatial
+
+
+def get_disk_cache() -> DiskCache | None:
+    """Shared on-disk cache, or None unless OPENWEATHER_DISK_CACHE is set."""
+    global _disk_cache, _disk_cache_loaded, _compactor
+    if not _disk_cache_loaded:
+        _disk_cache = disk_cache_from_env()
+        _disk_cache_loaded = True
+        if _disk_cache is not None:
+            _compactor = asyncio.get_running_loop().create_task(_compact_periodically(_disk_cache))
+    return _disk_cache
+
+
+def get_history_store() -> HistoryStore | None:
+    """Local observation history, or None unless OPENWEATHER_HISTORY_DIR is set."""
+    global _history, _history_loaded
+    if not _history_loaded:
+        _history = history_store_from_env()
+        _history_loaded = True
+    return _history
+
+
+def get_scheduler() -> UpstreamScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = scheduler_from_env()
+    return _scheduler
+
+
+def get_fetcher() -> ResilientFetcher:
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = fetcher_from_env()
+    return _fetcher
+
+
+def is_success(data: dict) -> bool:
+    # /weather answers cod=200 (int), /forecast answers cod="200" (str)
+    return str(data.get("cod")) == "200"
+
+
+def resolve_params(params: dict) -> dict:
+    """Swap a free-text ``q`` for the city id from the local index when it is known.
+
+    Unknown names are left for OpenWeather to resolve.
+    """
+    if "q" not in params:
+        return params
+    city = get_city_index().lookup(params["q"])
+    if city is None:
+        return params
+    resolved = {key: value for key, value in params.items() if key != "q"}
+    resolved["id"] = city["id"]
+    return resolved
+
+
+def _remember_city_id(key: tuple, payload: Payload):
+    if key[1].startswith("id:"):
+        # Already resolved through the local index; no need to decode the payload
+        return
+    data = payload.data
+    city_id = data.get("id") if key[0] == "weather" else data.get("city", {}).get("id")
+    if city_id:
+        _city_ids[key[1]] = city_id
+
+
+def _index_observation(key: tuple, payload: Payload):
+    if key[0] != "weather":
+        return
+    coord = payload.data.get("coord")
+    if isinstance(coord, dict) and "lat" in coord and "lon" in coord:
+        index = get_spatial_index()
+        index.add(key, coord["lat"], coord["lon"])
+        cache = get_cache()
+        if len(index) > 2 * cache.maxsize:
+            # Points of entries evicted from memory are otherwise only dropped when a lookup meets them
+            index.prune(lambda key: cache.last_known(key) is not None)
+
+
+def _history_location(key: tuple, data: dict) -> str:
+    # By city id where upstream names one, so a city asked for by name, id or coordinates shares one series
+    city_id = data.get("id") if key[0] == "weather" else data.get("city", {}).get("id")
+    return f"id:{city_id}" if city_id else key[1]
+
+
+def _record_history(key: tuple, payload: Payload):
+    history = get_history_store()
+    if history is None or key[0] not in ("weather", "forecast"):
+        return
+    history.record_in_background(key[0], _history_location(key, payload.data), payload.data)
+
+
+async def _on_disk(disk: DiskCache, method, *args, default=None):
+    # Off the event loop, since SQLite waits out other processes' writes;
+    # the disk tier is best effort, so a locked or broken file never fails a call
+    try:
+        return await disk.run(method, *args)
+    except sqlite3.Error:
+        return default
+
+
+async def _store(key: tuple, payload: Payload):
+    get_cache().set(key, payload)
+    _remember_city_id(key, payload)
+    _index_observation(key, payload)
+    _record_history(key, payload)
+    disk = get_disk_cache()
+    if disk is not None:
+        await _on_disk(disk, disk.set, key, payload.body)
+
+
+async def _load_from_disk(key: tuple):
+    disk = get_disk_cache()
+    if disk is None:
+        return None
+    cached = await _on_disk(disk, disk.get, key)
+    if cached is None:
+        return None
+    body, fresh, seconds_left = cached
+    payload = Payload(body)
+    if fresh:
+        # Promote into memory for the rest of the entry's lifetime, not a full TTL
+        get_cache().set(key, payload, ttl=seconds_left)
+        _remember_city_id(key, payload)
+        _index_observation(key, payload)
+    return payload, fresh
+
+
+async def _has_fresh(key: tuple) -> bool:
+    if get_cache().is_fresh(key):
+        return True
+    cached = await _load_from_disk(key)
+    return cached is not None and cached[1]
+
+
+async def _last_known(key: tuple) -> Payload | None:
+    payload = get_cache().last_known(key)
+    disk = get_disk_cache()
+    if payload is None and disk is not None:
+        body = await _on_disk(disk, disk.last_known, key)
+        if body is not None:
+            payload = Payload(body)
+    return payload
+
+
+def unavailable_error(error: QuotaExceeded | UpstreamUnavailable) -> Payload:
+    # Shaped like OpenWeather's own error bodies so callers handle both alike
+    cod = 429 if isinstance(error, QuotaExceeded) else 503
+    return Payload.from_data({"cod": cod, "message": str(error), "retry_after": round(error.retry_after, 1)})
+
+
+async def _acquire(priority: int):
+    started = time.perf_counter()
+    try:
+        with span("quota.wait"):
+            await get_scheduler().acquire(priority)
+    finally:
+        QUOTA_WAIT.observe(("interactive" if priority == INTERACTIVE else "background",), time.perf_counter() - started)
+
+
+async def _wait_for_other_process(disk: DiskCache, key: tuple) -> Payload | None:
+    """Wait out another process's fetch of ``key`` and pick its result up from the disk cache."""
+    deadline = time.monotonic() + FETCH_LEASE_SECONDS
+    with span("lease.wait"):
+        while time.monotonic() < deadline:
+            leased = await _on_disk(disk, disk.leased, key)
+            if leased is None:
+                return None
+            if not leased:
+                break
+            await asyncio.sleep(LEASE_POLL_SECONDS)
+    cached = await _load_from_disk(key)
+    return cached[0] if cached is not None and cached[1] else None
+
+
+async def _fetch_and_store(key: tuple, endpoint: str, params: dict, priority: int = INTERACTIVE) -> Payload:
+    # Processes sharing the disk cache (HTTP workers, stdio servers) coalesce
+    # through a lease, as concurrent calls within one process do through _flights
+    disk = get_disk_cache()
+    # A broken lease table must not stop the fetch, so errors count as claimed
+    if disk is not None and not await _on_disk(disk, disk.claim, key, FETCH_LEASE_SECONDS, default=True):
+        payload = await _wait_for_other_process(disk, key)
+        if payload is not None:
+            return payload
+    try:
+        # Only interactive calls may spend an extra token on a hedged request
+        payload = await get_fetcher().fetch(
+            endpoint,
+            params,
+            acquire=lambda: _acquire(priority),
+            permit=get_scheduler().try_acquire,
+            hedge=priority == INTERACTIVE,
+        )
+        if is_success(payload.data):
+            await _store(key, payload)
+        elif str(payload.data.get("cod")) == "429":
+            await get_scheduler().throttle()
+        return payload
+    finally:
+        if disk is not None:
+            await _on_disk(disk, disk.release, key)
+
+
+async def get_weather_data(endpoint: str, params: dict) -> Payload:
+    """Serve from the memory or disk cache, revalidating stale entries in the background.
+
+    Cached responses are returned as the encoded payload they were stored as.
+    """
+    params = resolve_params(params)
+    key = cache_key(endpoint, params)
+    if _warmer is not None:
+        _warmer.record(key, endpoint, params)
+    with span("cache", endpoint=endpoint) as lookup:
+        cached = get_cache().get(key)
+        if cached is None:
+            cached = await _load_from_disk(key)
+        lookup.set("cache.result", "miss" if cached is None else "hit" if cached[1] else "stale")
+    if cached is not None:
+        payload, fresh = cached
+        if not fresh:
+            # A failed refresh keeps serving the stale entry until it ages out;
+            # it outlives this call, so it is not part of the call's trace
+            with untraced():
+                _flights.start(key, lambda: _fetch_and_store(key, endpoint, params, BACKGROUND))
+        return payload
+    try:
+        # Identical concurrent misses share one upstream call; a call that
+        # joins another's shows its wait as the self time of this span
+        with span("fetch", endpoint=endpoint):
+            return await _flights.do(key, lambda: _fetch_and_store(key, endpoint, params))
+    except (QuotaExceeded, UpstreamUnavailable) as error:
+        payload = await _last_known(key)
+        if payload is not None:
+            return Payload.from_data({**payload.data, "stale": True})
+        return unavailable_error(error)
+
+
+def resolved_key(endpoint: str, params: dict) -> tuple:
+    """Cache key of a request, after city names are resolved to ids."""
+    return cache_key(endpoint, resolve_params(params))
+
+
+async def get_fresh_weather_data(endpoint: str, params: dict) -> Payload:
+    """Like get_weather_data, but waits for a refresh instead of answering with a stale entry.
+
+    For background consumers (subscriptions), so fetches run at background priority.
+    """
+    params = resolve_params(params)
+    key = cache_key(endpoint, params)
+    if await _has_fresh(key):
+        return get_cache().last_known(key)
+    return await _flights.do(key, lambda: _fetch_and_store(key, endpoint, params, BACKGROUND))
+
+
+async def _prefetch_group(cities: list[str], params: dict):
+    """Fill the cache for cities with known ids through /group, 20 ids per call.
+
+    Any city the group call does not cover is simply left to the per-city path.
+    """
+    keys_by_id = {}
+    for city in cities:
+        city_params = resolve_params({**params, "q": city})
+        key = cache_key("weather", city_params)
+        city_id = city_params.get("id") or _city_ids.get(key[1])
+        if city_id and not _flights.in_flight(key) and not await _has_fresh(key):
+            keys_by_id.setdefault(city_id, []).append(key)
+
+    ids = list(keys_by_id)
+    for start in range(0, len(ids), GROUP_MAX_IDS):
+        chunk = ids[start:start + GROUP_MAX_IDS]
+        group_params = {k: v for k, v in params.items() if k != "q"}
+        group_params["id"] = ",".join(str(city_id) for city_id in chunk)
+        try:
+            data = (await get_fetcher().fetch(
+                "group", group_params, acquire=lambda: _acquire(INTERACTIVE), permit=get_scheduler().try_acquire
+            )).data
+        except Exception:
+            continue
+        for item in data.get("list", []):
+            # Group items are /weather payloads without the status field
+            item.setdefault("cod", 200)
+            for key in keys_by_id.get(item.get("id"), []):
+                await _store(key, Payload.from_data(item))
+
+
+async def get_weather_data_many(endpoint: str, cities: list[str], params: dict) -> dict:
+    """Fetch several cities with bounded concurrency, returning partial results.
+
+    ``params`` holds the shared query parameters (appid, units, lang). Results
+    are payloads, as returned by get_weather_data.
+    """
+    unique_cities = list(dict.fromkeys(cities))
+    if endpoint == "weather":
+        await _prefetch_group(unique_cities, params)
+
+    semaphore = asyncio.Semaphore(int(os.getenv("OPENWEATHER_BATCH_CONCURRENCY", "8")))
+
+    async def fetch_city(city: str) -> Payload:
+        async with semaphore:
+            return await get_weather_data(endpoint, {**params, "q": city})
+
+    outcomes = await asyncio.gather(
+        *(fetch_city(city) for city in unique_cities), return_exceptions=True
+    )
+
+    results = {}
+    errors = {}
+    for city, outcome in zip(unique_cities, outcomes):
+        if isinstance(outcome, BaseException):
+            errors[city] = str(outcome) or type(outcome).__name__
+        elif not is_success(outcome.data):
+            errors[city] = outcome.data.get("message", f"upstream error {outcome.data.get('cod')}")
+        else:
+            results[city] = outcome
+    return {"results": results, "errors": errors}
+
+
+def _fresh_observations(lat: float, lon: float, radius_km: float, params: dict):
+    """(distance_km, payload) of fresh cached observations within ``radius_km``, nearest first.
+
+    Only observations cached for the units and language of ``params`` count.
+    Points whose entry has left the memory cache are dropped from the index.
+    """
+    index = get_spatial_index()
+    cache = get_cache()
+    variant = cache_key("weather", params)[2:]
+    for distance, key in index.within(lat, lon, radius_km):
+        if key[2:] != variant:
+            continue
+        payload = cache.last_known(key)
+        if payload is None:
+            index.discard(key)
+        elif cache.is_fresh(key):
+            yield distance, payload
+
+
+async def get_weather_at(lat: float, lon: float, params: dict) -> Payload:
+    """Current weather at a coordinate, answered by a fresh cached observation within tolerance when there is one.
+
+    Otherwise the coordinate is snapped to the spatial grid, so nearby
+    misses share one cache entry and one upstream call.
+    """
+    index = get_spatial_index()
+    for _, payload in _fresh_observations(lat, lon, index.tolerance_km, params):
+        index.hits += 1
+        return payload
+    index.misses += 1
+    grid_lat, grid_lon = index.quantize(lat, lon)
+    return await get_weather_data("weather", {**params, "lat": grid_lat, "lon": grid_lon})
+
+
+async def get_weather_nearby(lat: float, lon: float, radius_km: float, limit: int, params: dict) -> list:
+    """(distance_km, payload) of up to ``limit`` locations within ``radius_km``, nearest first, from the cache.
+
+    A location cached under several keys (name, id, coordinates) is listed
+    once. With nothing cached in range, the weather at the point itself is
+    fetched, so the answer is never empty.
+    """
+    found = []
+    seen = set()
+    for distance, payload in _fresh_observations(lat, lon, radius_km, params):
+        location = payload.data.get("id") or id(payload)
+        if location not in seen:
+            seen.add(location)
+            found.append((distance, payload))
+            if len(found) >= limit:
+                break
+    if found:
+        get_spatial_index().hits += 1
+        return found
+    payload = await get_weather_at(lat, lon, params)
+    # An error body comes back as the only entry
+    coord = payload.data.get("coord", {})
+    return [(distance_km(lat, lon, coord.get("lat", lat), coord.get("lon", lon)), payload)]
+
+
+async def get_temperature_history(params: dict, hours: float, units: str) -> Payload:
+    """Temperature history of a city from the local store, in ``units``.
+
+    The current observation is looked up first (usually from the cache), so
+    the series runs up to now and an unknown city answers with upstream's error.
+    """
+    history = get_history_store()
+    if history is None:
+        raise ValueError("Temperature history is not recorded; set OPENWEATHER_HISTORY_DIR to enable it")
+    if not 0 < hours <= history.retention_days * 24:
+        raise ValueError(f"Invalid hours {hours}; expected more than 0 and at most {history.retention_days * 24}")
+    current = await get_weather_data("weather", params)
+    if not is_success(current.data):
+        return current
+    location = _history_location(resolved_key("weather", params), current.data)
+    with span("history.query", hours=hours):
+        series = await history.run(history.temperature_history, location, hours, units)
+    return Payload.from_data({"city": {"id": current.data.get("id"), "name": current.data.get("name")}, **series})
+
+
+def find_cities(query: str, limit: int = 5) -> list[dict]:
+    return get_city_index().search(query, limit)
+
+
+async def cache_stats() -> dict:
+    stats = {**get_cache().stats(), "singleflight": _flights.stats()}
+    disk = get_disk_cache()
+    if disk is not None:
+        stats["disk"] = await _on_disk(disk, disk.stats, default=disk.counters())
+    if _warmer is not None:
+        stats["warmer"] = _warmer.stats()
+    stats["spatial"] = get_spatial_index().stats()
+    if _history is not None:
+        stats["history"] = _history.stats()
+    return stats
+
+
+def quota_stats() -> dict:
+    return get_scheduler().stats()
+
+
+def _collect_metrics() -> list[Metric]:
+    layers = {"memory": get_cache().stats()}
+    if _disk_cache is not None:
+        # Scrapes stay off SQLite; the counters are this process's own
+        layers["disk"] = _disk_cache.counters()
+    lookups = Metric("openweather_cache_lookups_total", "counter", "Cache lookups by layer and result", ("layer", "result"))
+    hit_ratio = Metric("openweather_cache_hit_ratio", "gauge", "Fresh and stale hits over all lookups", ("layer",))
+    evictions = Metric("openweather_cache_evictions_total", "counter", "Entries evicted to stay within size", ("layer",))
+    for layer, stats in layers.items():
+        for result, counter in (("hit", "hits"), ("stale_hit", "stale_hits"), ("miss", "misses")):
+            lookups.set((layer, result), stats[counter])
+        total = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        hit_ratio.set((layer,), (stats["hits"] + stats["stale_hits"]) / total if total else 0.0)
+        evictions.set((layer,), stats["evictions"])
+
+    flights = _flights.stats()
+    coalesced = Metric("openweather_singleflight_coalesced_total", "counter", "Requests that joined an in-flight fetch")
+    coalesced.set((), flights["coalesced"])
+
+    quota = get_scheduler().stats()
+    decisions = Metric("openweather_quota_decisions_total", "counter", "Upstream call scheduler decisions", ("decision",))
+    for decision in ("granted", "queued", "rejected"):
+        decisions.set((decision,), quota[decision])
+    waiting = Metric("openweather_quota_waiting", "gauge", "Upstream calls queued for quota")
+    waiting.set((), quota["waiting"])
+    metrics = [lookups, hit_ratio, evictions, coalesced, decisions, waiting]
+
+    if _fetcher is not None:
+        circuit = Metric("openweather_circuit_open", "gauge", "1 while the circuit breaker fails calls fast")
+        circuit.set((), int(_fetcher.breaker.state() == "open"))
+        metrics.append(circuit)
+
+    if _spatial is not None:
+        spatial = Metric("openweather_spatial_lookups_total", "counter", "Coordinate lookups by result", ("result",))
+        spatial.set(("hit",), _spatial.hits)
+        spatial.set(("miss",), _spatial.misses)
+        points = Metric("openweather_spatial_points", "gauge", "Cached observations in the spatial index")
+        points.set((), len(_spatial))
+        metrics += [spatial, points]
+
+    if _history is not None:
+        rows = Metric("openweather_history_rows_total", "counter", "Rows appended to the history store")
+        rows.set((), _history.rows)
+        metrics.append(rows)
+
+    if _warmer is not None:
+        refreshes = Metric("openweather_warmer_refreshes_total", "counter", "Refreshes started by the cache warmer")
+        refreshes.set((), _warmer.refreshes)
+        metrics.append(refreshes)
+    return metrics
+
+
+REGISTRY.register_collector(_collect_metrics)
+
+
+async def _compact_periodically(disk: DiskCache):
+    interval = float(os.getenv("OPENWEATHER_DISK_CACHE_COMPACT_INTERVAL", "300"))
+    while True:
+        # Jitter keeps processes sharing the file from compacting in lockstep
+        await asyncio.sleep(interval * random.uniform(0.5, 1.5))
+        try:
+            await disk.run(disk.compact)
+        except sqlite3.Error:
+            pass
+
+
+async def expires_in(key: tuple) -> float | None:
+    """Seconds left on the freshest copy of ``key`` in memory or on disk."""
+    remaining = get_cache().expires_in(key)
+    disk = get_disk_cache()
+    if disk is None:
+        return remaining
+    disk_remaining = await _on_disk(disk, disk.expires_in, key)
+    if disk_remaining is not None and (remaining is None or disk_remaining > remaining):
+        # Another process refreshed it; take its copy instead of fetching again
+        await _load_from_disk(key)
+        return disk_remaining
+    return remaining
+
+
+async def _warm_periodically(warmer: CacheWarmer):
+    while True:
+        await asyncio.sleep(warmer.interval)
+        remaining = {key: await expires_in(key) for key in warmer.hot_keys()}
+        for key, endpoint, params in warmer.due(remaining.get):
+            if not _flights.in_flight(key):
+                _flights.start(key, lambda key=key, endpoint=endpoint, params=params: _fetch_and_store(
+                    key, endpoint, params, BACKGROUND
+                ))
+
+
+def start_warmer(warmer: CacheWarmer, make_params):
+    """Keep the warmer's hot set fresh; ``make_params(q=city)`` builds request params for pinned cities."""
+    global _warmer, _warmer_task
+    for city in warmer.cities:
+        params = resolve_params(make_params(q=city))
+        for endpoint in WARM_ENDPOINTS:
+            warmer.pin(cache_key(endpoint, params), endpoint, params)
+    _warmer = warmer
+    _warmer_task = asyncio.get_running_loop().create_task(_warm_periodically(warmer))
+
+
+async def shutdown():
+    """Stop background work and release the upstream provider, disk cache and history store."""
+    global _disk_cache, _disk_cache_loaded, _compactor, _warmer, _warmer_task, _history, _history_loaded
+    if _warmer_task is not None:
+        _warmer_task.cancel()
+        _warmer_task = None
+        _warmer = None
+    if _compactor is not None:
+        _compactor.cancel()
+        _compactor = None
+    # Refreshes still running would otherwise reopen the disk cache after it is closed
+    await _flights.cancel_all()
+    await close_provider()
+    if _disk_cache is not None:
+        _disk_cache.close()
+    _disk_cache = None
+    _disk_cache_loaded = False
+    if _history is not None:
+        _history.close()
+    _history = None
+    _history_loaded = False
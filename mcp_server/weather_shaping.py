@@ -0,0 +1,161 @@
+from collections import Counter
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from .weather_codec import Payload
+
+FORECAST_MODES = ("raw", "compact", "daily")
+
+
+def _city_summary(forecast: dict) -> dict:
+    city = forecast.get("city", {})
+    return {
+        key: city[key]
+        for key in ("id", "name", "country", "coord", "timezone")
+        if key in city
+    }
+
+
+def _precipitation(slot: dict) -> float:
+    return slot.get("rain", {}).get("3h", 0.0) + slot.get("snow", {}).get("3h", 0.0)
+
+
+class Slot(NamedTuple):
+    """One 3-hour forecast slot, reduced to what the compact and daily shapes use."""
+
+    dt: int
+    temp: float | None
+    temp_min: float | None
+    temp_max: float | None
+    humidity: int | None
+    condition: int | None
+    description: str | None
+    pop: float
+    precip: float
+
+
+def decode_slots(forecast: Payload) -> tuple[Slot, ...]:
+    """Decode the 3-hour slots into typed tuples, in a single pass."""
+    slots = []
+    for slot in forecast.data.get("list", []):
+        main = slot.get("main", {})
+        weather = slot["weather"][0] if slot.get("weather") else {}
+        temp = main.get("temp")
+        temp_min, temp_max = main.get("temp_min"), main.get("temp_max")
+        slots.append(Slot(
+            dt=slot.get("dt"),
+            temp=temp,
+            temp_min=temp if temp_min is None else temp_min,
+            temp_max=temp if temp_max is None else temp_max,
+            humidity=main.get("humidity"),
+            condition=weather.get("id"),
+            description=weather.get("description"),
+            pop=slot.get("pop") or 0.0,
+            precip=_precipitation(slot),
+        ))
+    return tuple(slots)
+
+
+def _descriptions(slots: tuple[Slot, ...]) -> dict:
+    descriptions = {}
+    for slot in slots:
+        if slot.condition is not None:
+            descriptions.setdefault(slot.condition, slot.description)
+    return descriptions
+
+
+def compact_forecast(forecast: Payload) -> dict:
+    slots = forecast.derived(decode_slots)
+    return {
+        "city": _city_summary(forecast.data),
+        "dt": [slot.dt for slot in slots],
+        "temp": [slot.temp for slot in slots],
+        "humidity": [slot.humidity for slot in slots],
+        "condition": [slot.condition for slot in slots],
+        "conditions": _descriptions(slots),
+    }
+
+
+def daily_forecast(forecast: Payload) -> dict:
+    """Aggregate the slots into per-day min/max/mean/precipitation, in the city's local time."""
+    slots = forecast.derived(decode_slots)
+    descriptions = _descriptions(slots)
+    offset = forecast.data.get("city", {}).get("timezone", 0)
+
+    days = {}
+    for slot in slots:
+        date = datetime.fromtimestamp(slot.dt + offset, tz=timezone.utc).date().isoformat()
+        days.setdefault(date, []).append(slot)
+
+    daily = []
+    for date, day in days.items():
+        # Sparse forecasts can miss a temperature in some slots; those are left out
+        temps = [slot.temp for slot in day if slot.temp is not None]
+        lows = [slot.temp_min for slot in day if slot.temp_min is not None]
+        highs = [slot.temp_max for slot in day if slot.temp_max is not None]
+        humidity = [slot.humidity for slot in day if slot.humidity is not None]
+        condition = Counter(slot.condition for slot in day).most_common(1)[0][0]
+        daily.append({
+            "date": date,
+            "temp_min": min(lows) if lows else None,
+            "temp_max": max(highs) if highs else None,
+            "temp_mean": round(sum(temps) / len(temps), 2) if temps else None,
+            "humidity_mean": round(sum(humidity) / len(humidity), 1) if humidity else None,
+            "precip_mm": round(sum(slot.precip for slot in day), 2),
+            "pop_max": max(slot.pop for slot in day),
+            "condition": condition,
+            "description": descriptions.get(condition),
+            "slots": len(day),
+        })
+    return {"city": _city_summary(forecast.data), "days": daily}
+
+
+def _lookup(value, path: list[str]):
+    for part in path:
+        if isinstance(value, list):
+            if not part.isdigit() or int(part) >= len(value):
+                return None
+            value = value[int(part)]
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+    return value
+
+
+def project_forecast(forecast: dict, fields: list[str]) -> dict:
+    """Keep only the dotted ``fields`` (e.g. ``main.temp``, ``weather.0.description``) of each slot."""
+    paths = [(field, field.split(".")) for field in fields]
+    return {
+        "city": _city_summary(forecast),
+        "list": [
+            {field: _lookup(slot, path) for field, path in paths}
+            for slot in forecast.get("list", [])
+        ],
+    }
+
+
+def check_forecast_shape(mode: str, fields: list[str] | None):
+    if mode not in FORECAST_MODES:
+        raise ValueError(f"Unknown forecast mode {mode!r}; expected one of {', '.join(FORECAST_MODES)}")
+    if fields and mode != "raw":
+        raise ValueError("fields can only be combined with mode='raw'")
+
+
+def _shaped(forecast: Payload, shape) -> Payload:
+    return Payload.from_data(shape(forecast))
+
+
+def shape_forecast(forecast: Payload, mode: str = "raw", fields: list[str] | None = None) -> Payload:
+    """Shape a /forecast payload; compact and daily shapes are kept with the payload once built."""
+    check_forecast_shape(mode, fields)
+    if mode == "raw" and not fields:
+        return forecast
+    # Upstream errors ({"cod": "404", ...}) are passed through untouched
+    if "list" not in forecast.data:
+        return forecast
+    if mode == "compact":
+        return forecast.derived(_shaped, compact_forecast)
+    if mode == "daily":
+        return forecast.derived(_shaped, daily_forecast)
+    return Payload.from_data(project_forecast(forecast.data, fields))
@@ -0,0 +1,53 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key onto one in-flight task.
+
+    The shared task is shielded, so a cancelled caller never cancels the fetch
+    other callers are waiting on. Results and errors are handed to every waiter
+    and forgotten as soon as the task finishes; nothing is cached here.
+    """
+
+    def __init__(self):
+        self._flights: dict[object, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def in_flight(self, key) -> bool:
+        return key in self._flights
+
+    def start(self, key, factory) -> asyncio.Task:
+        task = self._flights.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        self.leaders += 1
+        task = asyncio.create_task(factory())
+        self._flights[key] = task
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return task
+
+    async def do(self, key, factory):
+        return await asyncio.shield(self.start(key, factory))
+
+    async def cancel_all(self):
+        """Cancel every task still in flight and wait until they have stopped."""
+        tasks = list(self._flights.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _finish(self, key, task: asyncio.Task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Mark the exception retrieved; waiters (if any) already received it
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
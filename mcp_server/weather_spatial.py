@@ -0,0 +1,136 @@
+import math
+import os
+
+EARTH_RADIUS_KM = 6371.0
+# Length of a degree of latitude, and of longitude at the equator
+KM_PER_DEGREE = 111.32
+# Bucket size of the index; a query scans only the buckets overlapping its radius
+CELL_DEGREES = 0.1
+COLUMNS = round(360 / CELL_DEGREES)
+MAX_RADIUS_KM = 200.0
+
+
+def check_coordinates(lat: float, lon: float):
+    if not -90 <= lat <= 90:
+        raise ValueError(f"Invalid latitude {lat}; expected -90 to 90")
+    if not -180 <= lon <= 180:
+        raise ValueError(f"Invalid longitude {lon}; expected -180 to 180")
+
+
+def check_radius(radius_km: float):
+    if not 0 < radius_km <= MAX_RADIUS_KM:
+        raise ValueError(f"Invalid radius {radius_km}; expected more than 0 and at most {MAX_RADIUS_KM:g} km")
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle (haversine) distance."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _lon_degrees(km: float, lat: float) -> float:
+    # Meridians converge; the floor keeps spans finite at the poles
+    return km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+
+
+def _wrap(lon: float) -> float:
+    return (lon + 180) % 360 - 180
+
+
+def _cell(lat: float, lon: float) -> tuple[int, int]:
+    return math.floor(lat / CELL_DEGREES), math.floor(_wrap(lon) / CELL_DEGREES) % COLUMNS
+
+
+class SpatialIndex:
+    """Locations of cached current-weather observations, bucketed on a degree grid.
+
+    Each point names the cache key holding its observation; whether that
+    entry is still fresh is for the caller to check. ``quantize`` snaps
+    request coordinates to the centre of a ``grid_km`` cell, so coordinates a
+    few hundred metres apart share one cache entry, and ``tolerance_km`` is
+    how far a cached observation may be from a point and still answer for it.
+    """
+
+    def __init__(self, grid_km: float, tolerance_km: float):
+        self.grid_km = grid_km
+        self.tolerance_km = tolerance_km
+        self._cells: dict[tuple[int, int], dict[tuple, tuple[float, float]]] = {}
+        self._points: dict[tuple, tuple[int, int]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._points)
+
+    def quantize(self, lat: float, lon: float) -> tuple[float, float]:
+        if self.grid_km <= 0:
+            return round(lat, 4), round(lon, 4)
+        lat_step = self.grid_km / KM_PER_DEGREE
+        snapped_lat = min(90.0, max(-90.0, (math.floor(lat / lat_step) + 0.5) * lat_step))
+        # Columns narrow towards the poles so cells stay about grid_km wide
+        lon_step = min(360.0, _lon_degrees(self.grid_km, snapped_lat))
+        snapped_lon = _wrap((math.floor(lon / lon_step) + 0.5) * lon_step)
+        return round(snapped_lat, 4), round(snapped_lon, 4)
+
+    def add(self, key: tuple, lat: float, lon: float):
+        self.discard(key)
+        cell = _cell(lat, lon)
+        self._cells.setdefault(cell, {})[key] = (lat, lon)
+        self._points[key] = cell
+
+    def discard(self, key: tuple):
+        cell = self._points.pop(key, None)
+        if cell is not None:
+            bucket = self._cells[cell]
+            del bucket[key]
+            if not bucket:
+                del self._cells[cell]
+
+    def prune(self, keep):
+        """Drop the points whose key fails ``keep(key)``."""
+        for key in [key for key in self._points if not keep(key)]:
+            self.discard(key)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> list[tuple[float, tuple]]:
+        """(distance_km, key) of every point within ``radius_km``, nearest first."""
+        lat_span = radius_km / KM_PER_DEGREE
+        first_row = math.floor((lat - lat_span) / CELL_DEGREES)
+        last_row = math.floor((lat + lat_span) / CELL_DEGREES)
+        if abs(lat) + lat_span >= 90:
+            # The circle covers a pole, and with it every meridian
+            first_column, columns = 0, COLUMNS
+        else:
+            lon_span = _lon_degrees(radius_km, abs(lat) + lat_span)
+            first_column = math.floor((lon - lon_span) / CELL_DEGREES)
+            columns = min(COLUMNS, math.floor((lon + lon_span) / CELL_DEGREES) - first_column + 1)
+
+        found = []
+        for row in range(first_row, last_row + 1):
+            for offset in range(columns):
+                bucket = self._cells.get((row, (first_column + offset) % COLUMNS))
+                if not bucket:
+                    continue
+                for key, (point_lat, point_lon) in bucket.items():
+                    distance = distance_km(lat, lon, point_lat, point_lon)
+                    if distance <= radius_km:
+                        found.append((distance, key))
+        found.sort()
+        return found
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "points": len(self._points),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def spatial_index_from_env() -> SpatialIndex:
+    return SpatialIndex(
+        grid_km=float(os.getenv("OPENWEATHER_SPATIAL_GRID_KM", "1")),
+        tolerance_km=float(os.getenv("OPENWEATHER_SPATIAL_TOLERANCE_KM", "2")),
+    )
@@ -0,0 +1,125 @@
+import asyncio
+import random
+
+from .weather_metrics import REGISTRY, Metric
+
+# Floor between polls of one location, whatever the cache says
+MIN_POLL_SECONDS = 5.0
+# Wait before polling again a location that has nothing cached (errors, quota)
+RETRY_SECONDS = 60.0
+
+
+class SubscriptionHub:
+    """Share one poller per subscribed location among every session watching it.
+
+    Sessions subscribe to resource URIs. URIs naming the same location (two
+    spellings of one city) share a poller, which fetches once per cache
+    lifetime of the entry and notifies the subscribed sessions only when the
+    payload actually changed. Sessions that can no longer be notified are
+    dropped, and so are the subscriptions of sessions that close.
+    """
+
+    def __init__(self):
+        self._pollers: dict[tuple, asyncio.Task] = {}
+        # location -> session -> subscribed URIs
+        self._watchers: dict[tuple, dict[object, set]] = {}
+        self.polls = 0
+        self.notifications = 0
+
+    def subscribe(self, location: tuple, session, uri, fetch, expires_in):
+        """Watch ``location`` for ``session``; ``fetch()`` returns the encoded payload or None when unavailable."""
+        self._watchers.setdefault(location, {}).setdefault(session, set()).add(uri)
+        if location not in self._pollers:
+            self._pollers[location] = asyncio.create_task(self._poll(location, fetch, expires_in))
+
+    def unsubscribe(self, location: tuple, session, uri):
+        watchers = self._watchers.get(location)
+        if watchers is None:
+            return
+        uris = watchers.get(session, set())
+        uris.discard(uri)
+        if not uris:
+            watchers.pop(session, None)
+        if not watchers:
+            self._stop(location)
+
+    def _stop(self, location: tuple):
+        del self._watchers[location]
+        self._pollers.pop(location).cancel()
+
+    def drop_session(self, session):
+        """Stop watching anything for ``session``, e.g. once it has closed."""
+        for location in list(self._watchers):
+            watchers = self._watchers[location]
+            watchers.pop(session, None)
+            if not watchers:
+                self._stop(location)
+
+    async def _notify(self, location: tuple):
+        for session, uris in list(self._watchers.get(location, {}).items()):
+            try:
+                for uri in uris:
+                    await session.send_resource_updated(uri)
+                    self.notifications += 1
+            except Exception:
+                # Closed transport or vanished client
+                self.drop_session(session)
+
+    async def _next_poll(self, expires_in) -> float:
+        remaining = await expires_in()
+        wait = RETRY_SECONDS if remaining is None else remaining
+        # Just after expiry, so the poll fetches the next update instead of the cached one
+        return max(MIN_POLL_SECONDS, wait) + random.uniform(0, MIN_POLL_SECONDS)
+
+    async def _poll(self, location: tuple, fetch, expires_in):
+        last = None
+        while True:
+            self.polls += 1
+            try:
+                data = await fetch()
+            except Exception:
+                data = None
+            if data is not None:
+                if last is not None and data != last:
+                    await self._notify(location)
+                last = data
+            await asyncio.sleep(await self._next_poll(expires_in))
+
+    def close(self):
+        for poller in self._pollers.values():
+            poller.cancel()
+        self._pollers.clear()
+        self._watchers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "locations": len(self._pollers),
+            "sessions": len({session for watchers in self._watchers.values() for session in watchers}),
+            "polls": self.polls,
+            "notifications": self.notifications,
+        }
+
+
+_hub: SubscriptionHub | None = None
+
+
+def get_hub() -> SubscriptionHub:
+    global _hub
+    if _hub is None:
+        _hub = SubscriptionHub()
+    return _hub
+
+
+def _collect_metrics() -> list[Metric]:
+    if _hub is None:
+        return []
+    stats = _hub.stats()
+    locations = Metric("openweather_subscription_locations", "gauge", "Locations with an active subscription poller")
+    locations.set((), stats["locations"])
+    notifications = Metric(
+        "openweather_subscription_notifications_total", "counter", "resources/updated notifications sent")
+    notifications.set((), stats["notifications"])
+    return [locations, notifications]
+
+
+REGISTRY.register_collector(_collect_metrics)
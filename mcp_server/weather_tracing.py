@@ -0,0 +1,402 @@
+import argparse
+import atexit
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastmcp.server.middleware import Middleware
+from mcp.server.lowlevel.server import request_ctx
+
+SERVER_SERVICE = "openweather-mcp-server"
+# W3C trace context, carried in the _meta of MCP requests
+TRACEPARENT_KEY = "traceparent"
+TRACEPARENT = re.compile(r"00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+KINDS = {"internal": 1, "server": 2, "client": 3}
+FLUSH_INTERVAL = 1.0
+MAX_BUFFERED = 10000
+
+
+class Span:
+    __slots__ = ("tracer", "name", "kind", "trace_id", "span_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, tracer, name: str, kind: str, trace_id: str, parent_id: str | None, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes
+        self.error = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def finish(self, error: BaseException | None = None):
+        if self.end is None:
+            self.end = time.time_ns()
+            if error is not None:
+                self.error = f"{type(error).__name__}: {error}"
+            self.tracer.exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": self.tracer.service,
+            "start": self.start,
+            "end": self.end,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NullSpan:
+    """Stands in for a span while tracing is off or the trace is not sampled."""
+
+    traceparent = None
+
+    def set(self, key: str, value):
+        pass
+
+    def finish(self, error: BaseException | None = None):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+# NULL_SPAN while inside a trace that is not sampled, so its children are not either
+_current: ContextVar[Span | _NullSpan | None] = ContextVar("openweather_span", default=None)
+
+
+class FileExporter:
+    """Append spans to a JSON-lines file, one line per span.
+
+    Every flush is a single write on an O_APPEND descriptor, so clients and
+    servers (including several workers) can trace into the same file and
+    the summary sees whole traces.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def send(self, spans: list[Span]):
+        os.write(self._fd, "".join(json.dumps(span.to_dict(), ensure_ascii=False) + "\n" for span in spans).encode())
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpExporter:
+    """POST spans to an OTLP/HTTP collector as JSON (``{endpoint}/v1/traces``)."""
+
+    def __init__(self, endpoint: str, service: str):
+        import httpx
+
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service = service
+        self._client = httpx.Client(timeout=5.0)
+
+    def _span(self, span: Span) -> dict:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": KINDS[span.kind],
+            "startTimeUnixNano": str(span.start),
+            "endTimeUnixNano": str(span.end),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def send(self, spans: list[Span]):
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [self._span(span) for span in spans]}],
+        }]}
+        self._client.post(self.url, json=body).raise_for_status()
+
+
+class BatchExporter:
+    """Buffer finished spans and hand them to the sinks from a background thread.
+
+    Ending a span is a list append, so tracing never blocks the event loop
+    on disk or network I/O. Spans are dropped, not queued without bound,
+    when the sinks fall behind.
+    """
+
+    def __init__(self, sinks: list):
+        self.sinks = sinks
+        self._buffer: list[Span] = []
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        threading.Thread(target=self._run, name="span-exporter", daemon=True).start()
+        atexit.register(self.flush)
+
+    def export(self, span: Span):
+        with self._lock:
+            if len(self._buffer) >= MAX_BUFFERED:
+                self.dropped += 1
+                return
+            self._buffer.append(span)
+
+    def flush(self):
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        if not spans:
+            return
+        for sink in self.sinks:
+            try:
+                sink.send(spans)
+            except Exception:
+                # A collector being down must not take the traced process with it
+                self.failed += len(spans)
+        self.exported += len(spans)
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+
+class Tracer:
+    """Start spans for ``service``, sampling ``sample_rate`` of new traces.
+
+    Spans continuing a remote trace follow the caller's sampling decision.
+    """
+
+    def __init__(self, service: str, exporter: BatchExporter, sample_rate: float):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def start(self, name: str, kind: str = "internal", traceparent: str | None = None, attributes: dict | None = None):
+        parent = _current.get()
+        if traceparent is not None:
+            match = TRACEPARENT.fullmatch(traceparent)
+            if match is not None:
+                if not int(match.group(3), 16) & 1:
+                    return NULL_SPAN
+                return Span(self, name, kind, match.group(1), match.group(2), attributes or {})
+        if parent is NULL_SPAN:
+            return NULL_SPAN
+        if parent is not None:
+            return Span(self, name, kind, parent.trace_id, parent.span_id, attributes or {})
+        if random.random() >= self.sample_rate:
+            return NULL_SPAN
+        return Span(self, name, kind, f"{random.getrandbits(128):032x}", None, attributes or {})
+
+
+def tracer_from_env(service: str) -> Tracer | None:
+    """Tracer exporting to OPENWEATHER_TRACE_FILE and/or OPENWEATHER_TRACE_OTLP_ENDPOINT, or None when neither is set."""
+    sinks = []
+    path = os.getenv("OPENWEATHER_TRACE_FILE")
+    if path:
+        sinks.append(FileExporter(path))
+    endpoint = os.getenv("OPENWEATHER_TRACE_OTLP_ENDPOINT")
+    if endpoint:
+        sinks.append(OtlpExporter(endpoint, service))
+    if not sinks:
+        return None
+    return Tracer(service, BatchExporter(sinks), float(os.getenv("OPENWEATHER_TRACE_SAMPLE", "1")))
+
+
+_tracer: Tracer | None = None
+_tracer_loaded = False
+
+
+def configure(service: str) -> Tracer | None:
+    """Set up tracing for this process under ``service``; the server does so on first use."""
+    global _tracer, _tracer_loaded
+    _tracer = tracer_from_env(service)
+    _tracer_loaded = True
+    return _tracer
+
+
+def get_tracer() -> Tracer | None:
+    if not _tracer_loaded:
+        configure(SERVER_SERVICE)
+    return _tracer
+
+
+def start_span(name: str, kind: str = "internal", traceparent: str | None = None, **attributes):
+    """A span that is not made current; the caller finishes it."""
+    tracer = get_tracer()
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.start(name, kind, traceparent, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", traceparent: str | None = None, **attributes):
+    """Trace the block as a child of the current span (or of ``traceparent``) and make it current."""
+    if get_tracer() is None:
+        yield NULL_SPAN
+        return
+    started = start_span(name, kind, traceparent, **attributes)
+    token = _current.set(started)
+    try:
+        yield started
+    except BaseException as error:
+        started.finish(error)
+        raise
+    finally:
+        _current.reset(token)
+        started.finish()
+
+
+@contextmanager
+def untraced():
+    """Keep work started in the block (background tasks) out of the current trace."""
+    token = _current.set(NULL_SPAN)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def _request_traceparent() -> str | None:
+    try:
+        meta = request_ctx.get().meta
+    except LookupError:
+        return None
+    return getattr(meta, TRACEPARENT_KEY, None) if meta is not None else None
+
+
+class TracingMiddleware(Middleware):
+    """Trace every tool call, continuing the caller's trace when its request carries a ``traceparent``."""
+
+    async def on_call_tool(self, context, call_next):
+        if get_tracer() is None:
+            return await call_next(context)
+        name = context.message.name
+        with span(f"tools/call {name}", "server", _request_traceparent(), **{"mcp.tool": name}):
+            return await call_next(context)
+
+
+def read_spans(path: str) -> list[dict]:
+    spans = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                # Torn last line of a process killed mid-write
+                continue
+    return spans
+
+
+def _self_time(span: dict, children: list[dict]) -> int:
+    """Duration not covered by any child, so concurrent children are not counted twice."""
+    covered = 0
+    reach = span["start"]
+    for child in sorted(children, key=lambda child: child["start"]):
+        start, end = max(child["start"], reach), min(child["end"], span["end"])
+        if end > start:
+            covered += end - start
+            reach = end
+    return span["end"] - span["start"] - covered
+
+
+def _category(span: dict) -> str:
+    # "tools/call get_weather_forecast" and "upstream forecast" group by their first word
+    return span["name"].split(" ", 1)[0]
+
+
+def summarize(spans: list[dict]) -> list[dict]:
+    """Per trace: root span, duration, and time per span category excluding children, slowest first."""
+    children = defaultdict(list)
+    ids = {span["span_id"] for span in spans}
+    for span in spans:
+        if span["parent_id"] in ids:
+            children[span["parent_id"]].append(span)
+
+    traces = defaultdict(lambda: {"root": None, "categories": defaultdict(int), "spans": 0})
+    for span in spans:
+        trace = traces[span["trace_id"]]
+        trace["spans"] += 1
+        trace["categories"][_category(span)] += _self_time(span, children[span["span_id"]])
+        root = trace["root"]
+        if span["parent_id"] not in ids and (root is None or span["start"] < root["start"]):
+            trace["root"] = span
+
+    summaries = []
+    for trace_id, trace in traces.items():
+        root = trace["root"]
+        summaries.append({
+            "trace_id": trace_id,
+            "root": root["name"],
+            "service": root["service"],
+            "attributes": root["attributes"],
+            "duration_ms": (root["end"] - root["start"]) / 1e6,
+            "spans": trace["spans"],
+            "categories": {name: nanos / 1e6 for name, nanos in trace["categories"].items()},
+        })
+    summaries.sort(key=lambda summary: -summary["duration_ms"])
+    return summaries
+
+
+def _print_breakdown(categories: dict, total: float, indent: str):
+    for name, millis in sorted(categories.items(), key=lambda item: -item[1]):
+        share = 100 * millis / total if total else 0.0
+        print(f"{indent}{name:<16} {millis:10.1f} ms  {share:5.1f}%")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="mcp_server.weather_tracing", description="Summarize where time goes in the traces of a span file"
+    )
+    parser.add_argument("file", help="OPENWEATHER_TRACE_FILE of the traced client and/or server")
+    parser.add_argument("--top", type=int, default=10, help="Slowest traces to show (default: %(default)s)")
+    parser.add_argument("--root", help="Only traces whose root span name starts with this, e.g. agent.turn")
+    args = parser.parse_args(argv)
+
+    summaries = summarize(read_spans(args.file))
+    if args.root:
+        summaries = [summary for summary in summaries if summary["root"].startswith(args.root)]
+    for summary in summaries[:args.top]:
+        label = summary["attributes"].get("question") or summary["attributes"].get("mcp.tool", "")
+        print(f"{summary['trace_id'][:16]}  {summary['root']}  {summary['duration_ms']:.1f} ms  "
+              f"{summary['spans']} spans  {label}")
+        _print_breakdown(summary["categories"], summary["duration_ms"], "    ")
+
+    totals = defaultdict(float)
+    for summary in summaries:
+        for name, millis in summary["categories"].items():
+            totals[name] += millis
+    total = sum(summary["duration_ms"] for summary in summaries)
+    print(f"\nAll {len(summaries)} traces, {total:.1f} ms")
+    _print_breakdown(totals, total, "    ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import os
+import time
+
+from .weather_codec import Payload, loads
+from .weather_metrics import UPSTREAM_DURATION, UPSTREAM_IN_FLIGHT, UPSTREAM_RESPONSES
+from .weather_replay import RecordingProvider, ReplayProvider
+
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/"
+
+PROVIDERS = ("live", "record", "replay")
+
+_client = None
+_provider = None
+
+
+def _http2_available() -> bool:
+    # httpx only negotiates HTTP/2 when the optional "h2" package is installed
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_client():
+    """Return the process-wide pooled keep-alive httpx.AsyncClient, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        # Imported here so a freshly spawned server can answer initialize sooner
+        import httpx
+
+        # Read at first use so values from .env (loaded by the server) apply
+        pool_size = int(os.getenv("OPENWEATHER_POOL_SIZE", "20"))
+        connect_timeout = float(os.getenv("OPENWEATHER_CONNECT_TIMEOUT", "3"))
+        read_timeout = float(os.getenv("OPENWEATHER_READ_TIMEOUT", "10"))
+        _client = httpx.AsyncClient(
+            base_url=os.getenv("OPENWEATHER_URL", OPENWEATHER_URL),
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=float(os.getenv("OPENWEATHER_KEEPALIVE_EXPIRY", "30")),
+            ),
+            timeout=httpx.Timeout(
+                connect=connect_timeout,
+                read=read_timeout,
+                write=read_timeout,
+                pool=connect_timeout,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class LiveProvider:
+    """OpenWeather itself, through the pooled HTTP client."""
+
+    async def fetch(self, endpoint: str, params: dict) -> tuple[int, bytes]:
+        response = await get_client().get(endpoint, params=params)
+        return response.status_code, response.content
+
+    async def close(self):
+        await close_client()
+
+
+def provider_from_env():
+    """Live OpenWeather, live with recording to OPENWEATHER_ARCHIVE, or a replay of that archive."""
+    provider = os.getenv("OPENWEATHER_PROVIDER", "live")
+    archive = os.getenv("OPENWEATHER_ARCHIVE", "openweather.archive")
+    if provider == "record":
+        return RecordingProvider(LiveProvider(), archive)
+    if provider == "replay":
+        return ReplayProvider(archive, speed=float(os.getenv("OPENWEATHER_REPLAY_SPEED", "1")))
+    if provider != "live":
+        raise ValueError(f"Unknown OPENWEATHER_PROVIDER {provider!r}; expected one of {', '.join(PROVIDERS)}")
+    return LiveProvider()
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        _provider = provider_from_env()
+    return _provider
+
+
+async def close_provider():
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
+
+
+async def fetch_response(endpoint: str, params: dict) -> tuple[int, Payload]:
+    """One GET through the upstream provider; returns (HTTP status, body)."""
+    UPSTREAM_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status = "error"
+    try:
+        status_code, body = await get_provider().fetch(endpoint, params)
+        status = str(status_code)
+        try:
+            # Decoded once here; the bytes are kept for caching and serving as they are
+            return status_code, Payload(body, loads(body))
+        except ValueError:
+            # Proxies and load balancers answer 502/504 with HTML
+            return status_code, Payload.from_data(
+                {"cod": status_code, "message": body[:200].decode("utf-8", "replace")}
+            )
+    finally:
+        UPSTREAM_IN_FLIGHT.dec()
+        UPSTREAM_DURATION.observe((endpoint,), time.perf_counter() - started)
+        UPSTREAM_RESPONSES.inc((endpoint, status))
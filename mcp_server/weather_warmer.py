@@ -0,0 +1,105 @@
+import os
+import random
+import time
+from collections import Counter
+
+# Both endpoints are kept warm for configured cities
+WARM_ENDPOINTS = ("weather", "forecast")
+
+
+class CacheWarmer:
+    """Pick the locations worth keeping fresh and say when each is due for a refresh.
+
+    Hot keys are the pinned (configured) cities plus the ``top`` most
+    requested locations, with request counts halved every ``window`` seconds
+    so the learned set follows recent traffic. A key is due once its cached
+    copy has less than a random share of ``lead`` seconds left, redrawn every
+    cycle, so refreshes of keys stored together spread out instead of
+    bursting against the quota. Fetching is left to the caller.
+    """
+
+    def __init__(self, cities: list[str], top: int, lead: float, window: float):
+        self.cities = cities
+        self.top = top
+        self.lead = lead
+        self.window = window
+        self.interval = min(5.0, lead / 4)
+        self._pinned: dict[tuple, tuple[str, dict]] = {}
+        self._counts = Counter()
+        self._requests: dict[tuple, tuple[str, dict]] = {}
+        self._window_started = time.monotonic()
+        self._offsets: dict[tuple, float] = {}
+        self._next_try: dict[tuple, float] = {}
+        self.refreshes = 0
+
+    def pin(self, key: tuple, endpoint: str, params: dict):
+        self._pinned[key] = (endpoint, params)
+
+    def record(self, key: tuple, endpoint: str, params: dict):
+        if self.top:
+            self._counts[key] += 1
+            self._requests[key] = (endpoint, params)
+
+    def _decay(self, now: float):
+        if now - self._window_started < self.window:
+            return
+        self._window_started = now
+        for key in list(self._counts):
+            self._counts[key] //= 2
+            if not self._counts[key]:
+                del self._counts[key]
+                del self._requests[key]
+        self._next_try = {key: at for key, at in self._next_try.items() if at > now}
+        self._offsets = {
+            key: offset for key, offset in self._offsets.items() if key in self._counts or key in self._pinned
+        }
+
+    def hot_keys(self) -> dict[tuple, tuple[str, dict]]:
+        hot = dict(self._pinned)
+        for key, _ in self._counts.most_common(self.top):
+            hot.setdefault(key, self._requests[key])
+        return hot
+
+    def due(self, expires_in) -> list[tuple[tuple, str, dict]]:
+        """Hot keys to refresh now; ``expires_in(key)`` gives seconds left, or None when not cached."""
+        now = time.monotonic()
+        self._decay(now)
+        due = []
+        for key, (endpoint, params) in self.hot_keys().items():
+            if now < self._next_try.get(key, 0.0):
+                continue
+            offset = self._offsets.get(key)
+            if offset is None:
+                offset = self._offsets[key] = random.uniform(0.25, 1.0) * self.lead
+            remaining = expires_in(key)
+            if remaining is not None and remaining > offset:
+                continue
+            due.append((key, endpoint, params))
+            del self._offsets[key]
+            # A refresh that fails (unknown city, quota) is retried a lead later, not every tick
+            self._next_try[key] = now + self.lead
+            self.refreshes += 1
+        return due
+
+    def stats(self) -> dict:
+        return {
+            "pinned": len(self._pinned),
+            "learned": min(self.top, len(self._counts)),
+            "tracked": len(self._counts),
+            "refreshes": self.refreshes,
+        }
+
+
+def warmer_from_env() -> CacheWarmer | None:
+    """Cache warmer, or None unless OPENWEATHER_WARM_CITIES or OPENWEATHER_WARM_TOP is set."""
+    # ";"-separated, since a city may carry a country code after a comma
+    cities = [city.strip() for city in os.getenv("OPENWEATHER_WARM_CITIES", "").split(";") if city.strip()]
+    top = int(os.getenv("OPENWEATHER_WARM_TOP", "0"))
+    if not cities and top <= 0:
+        return None
+    return CacheWarmer(
+        cities,
+        top=max(top, 0),
+        lead=float(os.getenv("OPENWEATHER_WARM_LEAD", "60")),
+        window=float(os.getenv("OPENWEATHER_WARM_WINDOW", "600")),
+    )